@@ -9,7 +9,7 @@ import PyFBA
 from PyFBA import log_and_message
 
 
-def measure_growth(reactions, modeldata, media, biomass_equation, verbose=False):
+def measure_growth(reactions, modeldata, media, biomass_equation, verbose=False, snapshot_dir=None):
     """
     Run the FBA and return the fluxes through each reaction
     :param biomass_equation: the biomass equation
@@ -21,6 +21,8 @@ def measure_growth(reactions, modeldata, media, biomass_equation, verbose=False)
     :param media: the media object
     :type media: set[PyFBA.metabolism.Compound]
     :param verbose: more output
+    :param snapshot_dir: a directory to save the linear programming problem in, and reload it from next time
+    :type snapshot_dir: str
     :return: a dict of the reactions and their fluxes
     :rtype: dict[str, float]
     """
@@ -33,7 +35,8 @@ def measure_growth(reactions, modeldata, media, biomass_equation, verbose=False)
     for r in todelete:
         reactions.remove(r)
 
-    return PyFBA.fba.run_fba(modeldata, reactions, media, biomass_equation, verbose=verbose)
+    return PyFBA.fba.run_fba(modeldata, reactions, media, biomass_equation, verbose=verbose,
+                             snapshot_dir=snapshot_dir)
 
 
 def run_the_fba():
@@ -48,6 +51,8 @@ def run_the_fba():
     parser.add_argument('-t', '--type', default='gramnegative',
                         help=f'organism type for the model (currently allowed are {orgtypes}). Default=gramnegative')
     parser.add_argument('-b', '--biomass', help='biomass equation to use. Default is the same as --type option')
+    parser.add_argument('-s', '--snapshots',
+                        help='directory to save the linear programming problem in, so we can reload it next time')
     parser.add_argument('-v', '--verbose', help='verbose output', action='store_true')
     args = parser.parse_args(sys.argv[2:])
 
@@ -77,7 +82,8 @@ def run_the_fba():
     media = PyFBA.parse.find_media_file(args.media, modeldata, args.verbose)
 
     status, value, growth = measure_growth(reactions=rxns, modeldata=modeldata, media=media,
-                                           biomass_equation=biomass_equation, verbose=args.verbose)
+                                           biomass_equation=biomass_equation, verbose=args.verbose,
+                                           snapshot_dir=args.snapshots)
 
     print("The FBA ran and finished with ")
     print(f"Status\t{status}")
@@ -58,6 +58,11 @@ def run_eqn(why, md, r2r, med, bme, verbose=False):
 def gap_create(reactions, media, model_data, orgtype='gramnegative',  flux_fraction = 0, verbose=False):
     """
     Iteratively remove reactions until we don't have any more to test
+
+    We load the model once and knock each reaction out by setting its bounds to zero (see PyFBA.fba.KnockoutScreen).
+    A reaction that carries no flux in the current solution can be removed without solving again, because that
+    solution does not need it.
+
     :param reactions: list of reactins to test
     :type reactions: set[str]
     :param media: The media to test growth on
@@ -76,7 +81,11 @@ def gap_create(reactions, media, model_data, orgtype='gramnegative',  flux_fract
     biomass_equation = PyFBA.metabolism.biomass_equation(orgtype)
 
     original_reactions = copy.deepcopy(reactions)
-    initial_value, initial_growth = run_eqn("Initial", model_data, reactions, media, biomass_equation, verbose=verbose)
+    screen = PyFBA.fba.KnockoutScreen(model_data, reactions, media, biomass_equation, workers=0, verbose=verbose)
+    current = screen.wild_type
+    initial_value, initial_growth = current.value, current.growth
+    log_and_message(f"FBA run Initial has a biomass flux value of {initial_value:.2f} --> Growth: {initial_growth}",
+                    stderr=verbose)
     if not initial_growth:
         log_and_message(f"The initial set of {len(reactions)} reactions doesn't grow on your media (flux: {initial_value})",
                         stderr = True)
@@ -87,20 +96,32 @@ def gap_create(reactions, media, model_data, orgtype='gramnegative',  flux_fract
     for r in original_reactions:
         reactions.remove(r)
         c += 1
-        value, growth = run_eqn(f"Reaction {c}: {r} ", model_data, reactions, media, biomass_equation, verbose=verbose)
+        if abs(screen.flux(current, r)) <= PyFBA.fba.knockouts.ZERO_FLUX:
+            # the current solution does not use this reaction, so we still grow without it
+            screen.model.knockout({r})
+            log_and_message(f"Reaction {c}/{num} ({r}) carries no flux. {r} not required", stderr=verbose)
+            continue
+        result = screen.model.run(reactions)
+        value, growth = result.value, result.growth
+        log_and_message(f"FBA run Reaction {c}: {r} has a biomass flux value of {value:.2f} --> Growth: {growth}",
+                        stderr=verbose)
         if flux_fraction > 0:
             if value/initial_value >= flux_fraction:
                 # this is growth
                 log_and_message(f"Reaction {c}/{num} ({r}) Flux: {value:.2f} Flux fraction {value/initial_value:.3f} {r} NOT required", stderr=verbose)
+                current = result
             else:
                 log_and_message(f"Reaction {c}/{num} ({r}) Flux: {value:.2f} Flux fraction {value/initial_value:.3f} {r} REQUIRED", stderr=verbose)
                 reactions.add(r)
+                screen.model.restore({r})
         else:
             if growth:
                 log_and_message(f"Reaction {c}/{num} ({r}) Flux: {value:.2f} {r} not required", stderr=verbose)
+                current = result
             else:
                 log_and_message(f"Reaction {c}/{num} ({r}) is required for growth", stderr=verbose)
                 reactions.add(r)
+                screen.model.restore({r})
     log_and_message(f"After testing all the reactions, {len(reactions)} are required", stderr=verbose)
     return reactions
 
@@ -1,8 +1,37 @@
-from .external_reactions import uptake_and_secretion_reactions, remove_uptake_and_secretion_reactions
+from .external_reactions import uptake_and_secretion_reactions, remove_uptake_and_secretion_reactions, \
+    boundary_template, boundary_templates
 from .create_stoichiometric_matrix import create_stoichiometric_matrix
-from .bounds import reaction_bounds, compound_bounds
+from .dead_ends import DeadEndPresolve
+from .bounds import reaction_bounds, compound_bounds, calculate_reaction_bounds, reaction_bounds_array, \
+    media_bounds_delta, uptake_secretion_index
 from .run_fba import run_fba
+from .batch import run_fba_batch
+from . import feasibility
+from . import reachability
 from .fluxes import reaction_fluxes
+from .warm_start import WarmStartModel
+from .universal_matrix import UniversalMatrix
+from . import universal_matrix
+from . import lp_snapshot
+from .model_cache import ModelCache
+from . import model_cache
+from .run_context import FBAContext
+from .result import FBAResult
+from .interning import InternTable
+from . import interning
+from .executor import FBAExecutor, ModelDescription
+from .flux_variability import flux_variability
+from .knockouts import KnockoutScreen, single_knockouts, double_knockouts
+from . import knockouts
+from .gene_knockouts import GeneReactionIndex, GeneKnockoutScreen, gene_knockouts
 
-__all__ = ['uptake_and_secretion_reactions', 'remove_uptake_and_secretion_reactions', 'create_stoichiometric_matrix',
-           'reaction_bounds', 'compound_bounds', 'run_fba', 'reaction_fluxes']
+__all__ = ['uptake_and_secretion_reactions', 'remove_uptake_and_secretion_reactions', 'boundary_template',
+           'boundary_templates', 'create_stoichiometric_matrix', 'DeadEndPresolve',
+           'reaction_bounds', 'compound_bounds', 'calculate_reaction_bounds', 'reaction_bounds_array',
+           'media_bounds_delta', 'uptake_secretion_index', 'run_fba', 'run_fba_batch', 'feasibility', 'reachability',
+           'reaction_fluxes',
+           'WarmStartModel', 'lp_snapshot', 'UniversalMatrix', 'universal_matrix',
+           'ModelCache', 'model_cache', 'FBAContext', 'FBAResult', 'InternTable', 'interning',
+           'FBAExecutor', 'ModelDescription', 'flux_variability',
+           'KnockoutScreen', 'single_knockouts', 'double_knockouts', 'knockouts',
+           'GeneReactionIndex', 'GeneKnockoutScreen', 'gene_knockouts']
@@ -0,0 +1,84 @@
+"""
+Run the same model on many media.
+
+calculate_precision_recall, and screens of growth on (say) a hundred Biolog media, run the same reactions and biomass
+equation once for each medium. The only part of the model that changes from one medium to the next is the bounds of
+the uptake and secretion reactions, so rather than building the model again for each medium we build it once, with
+the compounds from every medium, and then just change those bounds (see PyFBA.fba.WarmStartModel.set_media). Each
+solve starts from the solution on the previous medium. e.g.
+
+    results = PyFBA.fba.run_fba_batch(modeldata, reactions, [lb, mops_glucose, mops_citrate], biomass)
+    growth = [r.growth for r in results]
+
+Each result is an FBAResult, in the same order as the media.
+"""
+
+import PyFBA
+from PyFBA import log_and_message
+
+
+def run_fba_batch(modeldata, reactions_to_run, media_list, biomass_equation, uptake_secretion=None, verbose=False,
+                  session=None, backend=None, options=None, feasibility=False, reachability=False):
+    """
+    Run an fba for one set of reactions on each of several media.
+
+    The model includes an uptake and secretion reaction for every external compound in any of the media. A compound
+    that is not in the current medium can only be secreted, and since nothing else uses it, it does not change the
+    answer, so the results are the same as calling run_fba for each medium.
+
+    :param modeldata: the model seed object that includes compounds and reactions
+    :type modeldata: PyFBA.model_seed.ModelData
+    :param reactions_to_run: the reactions to run
+    :type reactions_to_run: set
+    :param media_list: the media to test. Each medium is a set of compound.Compound objects
+    :type media_list: list of set
+    :param biomass_equation: The biomass_equation equation
+    :type biomass_equation: PyFBA.metabolism.Reaction
+    :param uptake_secretion: A hash of uptake and secretion reactions that should be added to the model.
+    Calculated if not provided.
+    :type uptake_secretion: dict of Reaction
+    :param verbose: Print more output
+    :type verbose: bool
+    :param session: the linear programming session to run the fbas in. We use a new session if not provided
+    :type session: PyFBA.lp.LPBackend
+    :param backend: the linear programming backend to use for the new session (e.g. glpk or highs)
+    :type backend: str
+    :param options: the solver options, e.g. to limit the time that each solve can take
+    :type options: PyFBA.lp.SolverOptions
+    :param feasibility: only find out whether the model grows on each medium. See PyFBA.fba.feasibility
+    :type feasibility: bool
+    :param reachability: do not solve on the media where a compound that the biomass equation needs can not be made.
+    See PyFBA.fba.reachability
+    :type reachability: bool
+    :return: the result for each medium, in the same order as the media
+    :rtype: list of PyFBA.fba.FBAResult
+    """
+
+    media_list = list(media_list)
+    if not media_list:
+        return []
+
+    all_media = set()
+    for media in media_list:
+        all_media.update(media)
+
+    model = PyFBA.fba.WarmStartModel(modeldata, reactions_to_run, all_media, biomass_equation, uptake_secretion,
+                                     session=session, backend=backend, verbose=verbose)
+    results = []
+    try:
+        for media in media_list:
+            if reachability and PyFBA.fba.reachability.unreachable_biomass(modeldata, reactions_to_run, media,
+                                                                           biomass_equation, uptake_secretion):
+                results.append(PyFBA.fba.reachability.no_growth(feasibility))
+                continue
+            model.set_media(media)
+            results.append(model.run(options=options, feasibility=feasibility))
+    finally:
+        # as with calculate_precision_recall, we do not leave the uptake and secretion reactions in modeldata
+        if not uptake_secretion:
+            for r in model.uptake_secretion:
+                modeldata.reactions.pop(r, None)
+
+    log_and_message(f"Ran {len(media_list)} media on one model of {len(model.cp)} compounds and {len(model.rc)} "
+                    f"reactions. {sum(1 for r in results if r.growth)} grew", stderr=verbose)
+    return results
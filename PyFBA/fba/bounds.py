@@ -1,13 +1,22 @@
 import sys
 
+import numpy as np
+
 from PyFBA import lp, log_and_message
 
+"""
+The direction of a reaction as a small integer, so that we can calculate the bounds of many reactions at once. Anything
+else (e.g. None) is UNKNOWN_DIRECTION
+"""
+DIRECTION_CODES = {'=': 0, '>': 1, '<': 2}
+UNKNOWN_DIRECTION = 3
+
 
-def reaction_bounds(reactions, reactions_with_upsr, media, lower=-1000.0, mid=0.0, upper=1000.0, verbose=False):
+def calculate_reaction_bounds(reactions, reactions_with_upsr, media, lower=-1000.0, mid=0.0, upper=1000.0,
+                              verbose=False):
     """
-    Set the bounds for each reaction. We set the reactions to run between
-    either lower/mid, mid/upper, or lower/upper depending on whether the
-    reaction runs <=, =>, or <=> respectively.
+    Calculate the bounds for each reaction, without loading them into the solver. We set the reactions to run between
+    either lower/mid, mid/upper, or lower/upper depending on whether the reaction runs <=, =>, or <=> respectively.
 
     :param reactions: The dict of all reactions we know about
     :type reactions: dict of metabolism.Reaction
@@ -99,16 +108,47 @@ def reaction_bounds(reactions, reactions_with_upsr, media, lower=-1000.0, mid=0.
         sys.stderr.write("In parsing the bounds we found {} media uptake ".format(media_uptake_secretion_count) +
                          "and secretion reactions and {} other u/s reactions\n".format(other_uptake_secretion_count))
 
+    return rbvals
+
+
+def reaction_bounds(reactions, reactions_with_upsr, media, lower=-1000.0, mid=0.0, upper=1000.0, verbose=False,
+                    session=None):
+    """
+    Set the bounds for each reaction. We set the reactions to run between
+    either lower/mid, mid/upper, or lower/upper depending on whether the
+    reaction runs <=, =>, or <=> respectively.
+
+    :param reactions: The dict of all reactions we know about
+    :type reactions: dict of metabolism.Reaction
+    :param reactions_with_upsr: The sorted list of reactions to run
+    :type reactions_with_upsr: set
+    :param media: The media compounds
+    :type media: set
+    :param lower: The default lower bound
+    :type lower: float
+    :param mid: The default mid value (typically 0)
+    :type mid: float
+    :param upper: The default upper bound
+    :type upper: float
+    :param session: the linear programming session to set the bounds in. We use the default session if not provided
+    :type session: PyFBA.lp.LPBackend
+    :return: A dict of the reaction ID and the tuple of bounds
+    :rtype: dict
+    """
+
+    rbvals = calculate_reaction_bounds(reactions, reactions_with_upsr, media, lower, mid, upper, verbose)
     rbounds = [rbvals[r] for r in reactions_with_upsr]
     for r in reactions_with_upsr:
         if r in reactions:
             reactions[r].lower_bound, reactions[r].upper_bound = rbvals[r]
 
-    lp.col_bounds(rbounds)
+    if session is None:
+        session = lp.default_session()
+    session.col_bounds(rbounds)
     return rbvals
 
 
-def compound_bounds(cp, lower=0, upper=0):
+def compound_bounds(cp, lower=0, upper=0, session=None):
     """
     Impose constraints on the compounds. These constraints limit what
     the variation of each compound can be and is essentially 0 for
@@ -121,10 +161,168 @@ def compound_bounds(cp, lower=0, upper=0):
         cp: the list of compound ids
         lower: the default lower value
         upper: the default upper value
+        session: the linear programming session to set the bounds in (optional)
     """
 
     cbounds = [(lower, upper) for c in cp]
     cbvals = {c: (lower, upper) for c in cp}
 
-    lp.row_bounds(cbounds)
+    if session is None:
+        session = lp.default_session()
+    session.row_bounds(cbounds)
     return cbvals
+
+
+def direction_code(direction):
+    """
+    The code for a reaction direction
+
+    :param direction: the direction, =, >, or <
+    :type direction: str
+    :return: the code (see DIRECTION_CODES)
+    :rtype: int
+    """
+    return DIRECTION_CODES.get(direction, UNKNOWN_DIRECTION)
+
+
+def bounds_from_directions(codes, fixed_lower=None, fixed_upper=None, lower=-1000.0, mid=0.0, upper=1000.0):
+    """
+    Calculate the bounds for many reactions at once from their direction codes. This follows the same rules as
+    calculate_reaction_bounds: a reaction runs between lower/upper if it runs <=> or <=, between mid/upper if it runs
+    =>, and reactions with both bounds already set keep them.
+
+    :param codes: the direction code of each reaction
+    :type codes: numpy.ndarray
+    :param fixed_lower: (optional) the lower bound already set on each reaction, or nan if it is not set
+    :type fixed_lower: numpy.ndarray
+    :param fixed_upper: (optional) the upper bound already set on each reaction, or nan if it is not set
+    :type fixed_upper: numpy.ndarray
+    :param lower: The default lower bound
+    :type lower: float
+    :param mid: The default mid value (typically 0)
+    :type mid: float
+    :param upper: The default upper bound
+    :type upper: float
+    :return: the lower and upper bounds of each reaction
+    :rtype: (numpy.ndarray, numpy.ndarray)
+    """
+
+    # indexed by the direction codes: =, >, <, and unknown
+    lower_by_code = np.array([lower, mid, lower, mid], dtype=float)
+    upper_by_code = np.array([upper, upper, upper, upper], dtype=float)
+    lb = lower_by_code[codes]
+    ub = upper_by_code[codes]
+    if fixed_lower is not None and fixed_upper is not None:
+        known = ~(np.isnan(fixed_lower) | np.isnan(fixed_upper))
+        lb = np.where(known, fixed_lower, lb)
+        ub = np.where(known, fixed_upper, ub)
+    return lb, ub
+
+
+def reaction_bounds_array(modeldata, reactions_with_upsr, media, lower=-1000.0, mid=0.0, upper=1000.0, verbose=False,
+                          reactions=None):
+    """
+    Calculate the bounds for each reaction as two numpy arrays, without loading them into the solver. The bounds for
+    all the reactions in the universal matrix come from one slice of its direction codes, and we only calculate the
+    bounds of the other reactions (the uptake and secretion reactions, the biomass equation, and any reactions that
+    have been added or replaced since the matrix was compiled) one at a time with calculate_reaction_bounds.
+
+    :param modeldata: the model seed object that includes compounds and reactions
+    :type modeldata: PyFBA.model_seed.ModelData
+    :param reactions_with_upsr: The sorted list of reactions to run
+    :type reactions_with_upsr: list
+    :param media: The media compounds
+    :type media: set
+    :param lower: The default lower bound
+    :type lower: float
+    :param mid: The default mid value (typically 0)
+    :type mid: float
+    :param upper: The default upper bound
+    :type upper: float
+    :param verbose: more output
+    :type verbose: bool
+    :param reactions: (optional) the reactions to use instead of modeldata.reactions, e.g. the reactions of an
+    PyFBA.fba.FBAContext that include the uptake and secretion reactions
+    :type reactions: dict of metabolism.Reaction
+    :return: the lower and upper bounds of each reaction, in the same order as reactions_with_upsr
+    :rtype: (numpy.ndarray, numpy.ndarray)
+    """
+
+    if reactions is None:
+        reactions = modeldata.reactions
+    um = modeldata.universal_matrix()
+
+    # this is um.is_current for every reaction, without the function calls
+    objects = um.compiled_reactions()
+    cols = [um.rxnindex.get(r, -1) for r in reactions_with_upsr]
+    current = np.array([k >= 0 and objects[k] is reactions.get(r) for k, r in zip(cols, reactions_with_upsr)],
+                       dtype=bool)
+    cols = np.array(cols, dtype=np.int64)[current]
+    others = [r for r, c in zip(reactions_with_upsr, current.tolist()) if not c]
+
+    lb = np.empty(len(reactions_with_upsr))
+    ub = np.empty(len(reactions_with_upsr))
+    if len(cols):
+        codes = um.directions[cols]
+        # the directions are compiled, but the bounds are read from the reactions because they may have been changed
+        fixed_lower, fixed_upper = um.fixed_bounds(cols)
+        lb[current], ub[current] = bounds_from_directions(codes, fixed_lower, fixed_upper, lower, mid, upper)
+        unknown = int(np.count_nonzero(codes == UNKNOWN_DIRECTION))
+        if unknown:
+            log_and_message(f"We did not understand the direction of {unknown} reactions, so they only run forwards",
+                            stderr=verbose)
+    if others:
+        rbvals = calculate_reaction_bounds(reactions, others, media, lower, mid, upper, verbose)
+        lb[~current] = [rbvals[r][0] for r in others]
+        ub[~current] = [rbvals[r][1] for r in others]
+    return lb, ub
+
+
+def uptake_secretion_index(uptake_secretion):
+    """
+    Index the uptake and secretion reactions by the compound that they take up or secrete
+
+    :param uptake_secretion: the uptake and secretion reactions
+    :type uptake_secretion: dict of str and metabolism.Reaction
+    :return: a dict of compound and the list of uptake and secretion reaction ids for that compound
+    :rtype: dict
+    """
+
+    index = {}
+    for r, rxn in uptake_secretion.items():
+        for c in rxn.left_compounds:
+            index.setdefault(c, []).append(r)
+    return index
+
+
+def media_bounds_delta(uptake_secretion_by_compound, old_media, new_media, lower=-1000.0, mid=0.0, upper=1000.0):
+    """
+    The bounds of the uptake and secretion reactions that change when we change the media. Only the compounds that
+    move in to or out of the media change, so this is much less work than calculating all the bounds again.
+
+    A compound in the media can be taken up and secreted (lower, upper), and any other external compound can only be
+    secreted (mid, upper).
+
+    :param uptake_secretion_by_compound: the uptake and secretion reactions for each compound (see
+    uptake_secretion_index)
+    :type uptake_secretion_by_compound: dict
+    :param old_media: the media the bounds were set for
+    :type old_media: set
+    :param new_media: the new media
+    :type new_media: set
+    :param lower: The default lower bound
+    :type lower: float
+    :param mid: The default mid value (typically 0)
+    :type mid: float
+    :param upper: The default upper bound
+    :type upper: float
+    :return: a dict of reaction id and the new (lower, upper) bounds
+    :rtype: dict
+    """
+
+    new_media = set(new_media)
+    changes = {}
+    for c in new_media.symmetric_difference(old_media):
+        for r in uptake_secretion_by_compound.get(c, []):
+            changes[r] = (lower, upper) if c in new_media else (mid, upper)
+    return changes
@@ -1,10 +1,13 @@
-import sys
+from collections import ChainMap
+
+import numpy as np
+
 import PyFBA
 from PyFBA import lp, log_and_message
 
 
 def create_stoichiometric_matrix(reactions_to_run, modeldata, media, biomass_equation,
-                                 uptake_secretion=None, verbose=False):
+                                 uptake_secretion=None, verbose=False, session=None, pure=False, presolve=None):
     """Given the reactions data and a list of RIDs to include, build a
     stoichiometric matrix and load that into the linear solver.
 
@@ -26,8 +29,15 @@ def create_stoichiometric_matrix(reactions_to_run, modeldata, media, biomass_equ
     :type uptake_secretion: Dict[str, PyFBA.metabolism.Reaction]
     :param verbose: print more information
     :type verbose: bool
+    :param session: the linear programming session to load the matrix into. We use the default session if not provided
+    :type session: PyFBA.lp.LPBackend
+    :param pure: do not add the uptake and secretion reactions to modeldata.reactions (or to the compounds)
+    :type pure: bool
+    :param presolve: (optional) remove the dead end compounds, and the reactions that touch them, before we load the
+    matrix. The presolve records what was removed. See PyFBA.fba.dead_ends
+    :type presolve: PyFBA.fba.DeadEndPresolve
     :returns: Sorted lists of all the compounds and reactions in the model, and a revised reactions dict that includes
-    the uptake and secretion reactions
+    the uptake and secretion reactions. With a presolve the compounds and reactions are the ones that are left.
     :rtype: list, list, dict
 
     """
@@ -38,15 +48,25 @@ def create_stoichiometric_matrix(reactions_to_run, modeldata, media, biomass_equ
         log_and_message(msg, loglevel="ERROR")
         raise DeprecationWarning(msg)
 
-    sm = {}  # the matrix
-    reaction_cpds = set()  # all the cpds in the matrix
+    if session is None:
+        session = lp.default_session()
+
+    # the matrix for the reactions comes from a column slice of the universal matrix, and we only build the
+    # columns for the biomass equation, the uptake and secretion reactions, and any reactions that have not been
+    # compiled (e.g. from an SBML file) here
+    um = modeldata.universal_matrix()
+
+    # we work with the interned ids of the compounds (their rows in the universal matrix) rather than the compounds
+    # themselves. Equal compounds have the same id, so as with a set the first of two equal compounds is kept.
+    table = um.compound_table
+    cpd_ids = []  # the ids of the media compounds
+    extra = []  # (compound id, reaction id, value) for the columns we build here
 
     # compounds is now deprecated since we don't need to parse that. We use the compounds
     # from the media, reactions, and biomass equation, but don't look at the compounds
     # any more
 
-    # initialize the compounds set and the stoichiometric matrix with
-    # everything in the media. The order of compounds is irrelevant
+    # initialize the compounds with everything in the media
     for c in media:
         if not modeldata.get_compound_by_name(c.name):
             log_and_message(f"csm did not find media compound {c.name} in the compounds database",
@@ -54,32 +74,24 @@ def create_stoichiometric_matrix(reactions_to_run, modeldata, media, biomass_equ
         if not isinstance(c, PyFBA.metabolism.compound.CompoundWithLocation):
             log_and_message(f"csm is parsing the media, {c} is a {type(c)} " +
                             f"(not a cpd with location)", stderr=verbose, loglevel="WARNING")
-        reaction_cpds.add(c)
-        sm[c] = {}
+        cpd_ids.append(table.intern(c))
 
     # iterate through the reactions
-    for r in reactions_to_run:
+    compiled = []
+    for r in sorted(reactions_to_run):
         if 'biomass' in r.lower():
             log_and_message(f"Found a potential biomass equation in reactions to run ({r}). Skipped", stderr=verbose)
             continue
-
-        for c in modeldata.reactions[r].left_compounds:
-            reaction_cpds.add(c)
-            if c not in sm:
-                sm[c] = {}
+        if um.is_current(r, modeldata.reactions[r]):
+            compiled.append(r)
+            continue
+        for c, v in PyFBA.fba.universal_matrix.reaction_entries(modeldata.reactions[r]).items():
             if not isinstance(c, PyFBA.metabolism.compound.CompoundWithLocation):
-                log_and_message(f"In parsing left compounds for the SM, {c} is a {type(c)}", stderr=verbose,
+                log_and_message(f"In parsing compounds for the SM, {c} is a {type(c)}", stderr=verbose,
                                 loglevel="WARNING")
-            sm[c][r] = 0 - modeldata.reactions[r].get_left_compound_abundance(c)
+            extra.append((table.intern(c), r, v))
 
-        for c in modeldata.reactions[r].right_compounds:
-            reaction_cpds.add(c)
-            if c not in sm:
-                sm[c] = {}
-            if not isinstance(c, PyFBA.metabolism.compound.CompoundWithLocation):
-                log_and_message(f"csm: In parsing right compounds for the SM, {c} is a {type(c)}", stderr=verbose,
-                                loglevel="WARNING")
-            sm[c][r] = modeldata.reactions[r].get_right_compound_abundance(c)
+    urows, ucols, uvals = um.column_slice(compiled)
 
     for c in biomass_equation.left_compounds:
         if not modeldata.get_compound_by_name(c.name):
@@ -88,10 +100,6 @@ def create_stoichiometric_matrix(reactions_to_run, modeldata, media, biomass_equ
                             stderr=verbose, loglevel="WARNING")
         if verbose and not isinstance(c, PyFBA.metabolism.compound.CompoundWithLocation):
             log_and_message(f"In parsing biomass left, {c} is a {type(c)}", stderr=verbose)
-        reaction_cpds.add(c)
-        if c not in sm:
-            sm[c] = {}
-        sm[c]["BIOMASS_EQN"] = 0 - biomass_equation.get_left_compound_abundance(c)
     for c in biomass_equation.right_compounds:
         if not modeldata.get_compound_by_name(c.name):
             # compounds.add(c)
@@ -99,10 +107,8 @@ def create_stoichiometric_matrix(reactions_to_run, modeldata, media, biomass_equ
                             stderr=verbose, loglevel="WARNING")
         if verbose and not isinstance(c, PyFBA.metabolism.compound.CompoundWithLocation):
             log_and_message(f"In parsing biomass right, {c} is a {type(c)}", stderr=verbose)
-        reaction_cpds.add(c)
-        if c not in sm:
-            sm[c] = {}
-        sm[c]["BIOMASS_EQN"] = biomass_equation.get_right_compound_abundance(c)
+    for c, v in PyFBA.fba.universal_matrix.reaction_entries(biomass_equation).items():
+        extra.append((table.intern(c), "BIOMASS_EQN", v))
 
     # Add the uptake/secretion reactions. These are reactions that allow things to flow from the media
     # into the reaction, or from the cell outwards.
@@ -113,20 +119,23 @@ def create_stoichiometric_matrix(reactions_to_run, modeldata, media, biomass_equ
     # When we set the reaction bounds we determine which things are in the media unless they are provided for you
 
     if not uptake_secretion:
-        uptake_secretion = PyFBA.fba.uptake_and_secretion_reactions(reaction_cpds, media)
-    modeldata.reactions.update(uptake_secretion)
+        model_cpds = np.union1d(urows, np.array(cpd_ids + [e[0] for e in extra], dtype=np.int64))
+        uptake_secretion = PyFBA.fba.uptake_and_secretion_reactions(set(table.lookup(model_cpds.tolist())), media,
+                                                                    link_compounds=not pure,
+                                                                    templates=modeldata.boundary_templates())
+    if not pure:
+        modeldata.reactions.update(uptake_secretion)
     for r in uptake_secretion:
         # modeldata.reactions[uptake_secretion[r].id] = uptake_secretion[r]
         for c in uptake_secretion[r].left_compounds:
-            reaction_cpds.add(c)
-            if c not in sm:
-                sm[c] = {}
-            sm[c][uptake_secretion[r].id] = 0 - uptake_secretion[r].get_left_compound_abundance(c)
+            extra.append((table.intern(c), uptake_secretion[r].id,
+                          0 - uptake_secretion[r].get_left_compound_abundance(c)))
 
     # now we need to make this into a matrix sorted by
     # reaction id and by cpds
-    cp = list(reaction_cpds)
-    cp.sort()
+    model_cpds = np.union1d(urows, np.array(cpd_ids + [e[0] for e in extra], dtype=np.int64)).tolist()
+    model_cpds.sort(key=lambda i: table.items[i].id)
+    cp = table.lookup(model_cpds)
     rc = list(reactions_to_run)
     rc.sort()
     rc += [uptake_secretion[x].id for x in uptake_secretion]
@@ -134,25 +143,38 @@ def create_stoichiometric_matrix(reactions_to_run, modeldata, media, biomass_equ
     # it is important that we add these at the end
     rc.append("BIOMASS_EQN")
 
-    # here we create the matrix from our sm hash
-    data = []
-    for i, j in enumerate(cp):
-        if j not in sm:
-            sys.exit("Error while parsing: no " + j + " in sm")
-        data.append([])
-        for c in rc:
-            if c in sm[j]:
-                data[i].append(sm[j][c])
-            else:
-                data[i].append(0.0)
+    # here we create the sparse matrix. We renumber the rows (compound ids) and columns of the slice of the universal
+    # matrix, and only pass the non-zero (row, column, value) triplets to the solver
+    rowmap = np.full(len(table), -1, dtype=np.int64)
+    rowmap[model_cpds] = np.arange(len(model_cpds), dtype=np.int64)
+    rcidx = {r: j for j, r in enumerate(rc)}
+    colmap = np.array([rcidx[r] for r in compiled], dtype=np.int64)
+    rows = np.concatenate([rowmap[urows], rowmap[np.array([e[0] for e in extra], dtype=np.int64)]])
+    cols = np.concatenate([colmap[ucols], np.array([rcidx[e[1]] for e in extra], dtype=np.int64)])
+    vals = np.concatenate([uvals, np.array([e[2] for e in extra], dtype=float)])
+
+    if presolve is not None:
+        reactions = ChainMap(uptake_secretion, modeldata.reactions) if pure else modeldata.reactions
+        lower, upper = PyFBA.fba.reaction_bounds_array(modeldata, rc, media, verbose=verbose, reactions=reactions)
+        # the biomass equation is the last column, and we keep all of its compounds
+        keep_rows = np.zeros(len(cp), dtype=bool)
+        keep_rows[rows[cols == len(rc) - 1]] = True
+        kept_cpds, kept_rxns = presolve.prune(cp, rc, rows, cols, vals, lower, upper, keep_rows, verbose=verbose)
+        live = kept_rxns[cols]
+        rows = (np.cumsum(kept_cpds) - 1)[rows[live]]
+        cols = (np.cumsum(kept_rxns) - 1)[cols[live]]
+        vals = vals[live]
+        cp = [c for c, k in zip(cp, kept_cpds.tolist()) if k]
+        rc = [r for r, k in zip(rc, kept_rxns.tolist()) if k]
+    data = list(zip(rows.tolist(), cols.tolist(), vals.tolist()))
 
     # load the data into the model
-    PyFBA.lp.load(data, [str(c) for c in cp], [str(r) for r in rc], verbose=verbose)
+    session.load_sparse(data, len(cp), len(rc), [str(c) for c in cp], [str(r) for r in rc], verbose=verbose)
 
     # now set the objective function.It is the biomass_equation
     # equation which is the last reaction in the network
     ob = [0.0 for r in rc]
     ob[-1] = 1
 
-    PyFBA.lp.objective_coefficients(ob)
+    session.objective_coefficients(ob)
     return cp, rc, uptake_secretion
@@ -0,0 +1,185 @@
+"""
+Remove the dead ends from a model before we load it into the solver.
+
+A compound that the reactions in a model can make but not use (or use but not make) is a dead end. At steady state
+none of the reactions that touch it can carry any flux, so we can remove the compound and all of those reactions from
+the matrix without changing the answer. Removing them can make more dead ends, so we repeat until there are none
+left. Whether a reaction makes or uses a compound depends on the direction that it can run in, so we use the bounds of
+each reaction as well as its stoichiometry. e.g.
+
+    presolve = PyFBA.fba.DeadEndPresolve()
+    status, value, growth = PyFBA.fba.run_fba(modeldata, reactions, media, biomass, presolve=presolve)
+    print(presolve)
+    print(presolve.removed_reactions)
+
+The compounds of the biomass equation are never removed, so if one of them is a dead end the biomass equation stays in
+the model and the solver finds that it can not carry flux. The result of a pruned model has the fluxes of every
+reaction: the reactions that were removed carry no flux, and the compounds that were removed have a shadow price of
+nan because they were not in the problem that was solved.
+"""
+
+import numpy as np
+
+import PyFBA
+from PyFBA import log_and_message
+
+
+def dead_ends(nrows, ncols, rows, cols, vals, lower, upper, keep_rows=None):
+    """
+    Find the compounds that are dead ends and the reactions that touch them, until there are no dead ends left
+
+    :param nrows: the number of rows (compounds)
+    :type nrows: int
+    :param ncols: the number of columns (reactions)
+    :type ncols: int
+    :param rows: the row of each entry in the matrix
+    :type rows: numpy.ndarray
+    :param cols: the column of each entry in the matrix
+    :type cols: numpy.ndarray
+    :param vals: the value of each entry in the matrix
+    :type vals: numpy.ndarray
+    :param lower: the lower bound of each column
+    :type lower: numpy.ndarray
+    :param upper: the upper bound of each column
+    :type upper: numpy.ndarray
+    :param keep_rows: (optional) a bitset of the rows that we should never remove
+    :type keep_rows: numpy.ndarray
+    :return: bitsets of the rows and columns that are left, and the number of passes
+    :rtype: numpy.ndarray, numpy.ndarray, int
+    """
+
+    # an entry makes its compound if the reaction can run forwards and the compound is on the right, or the reaction
+    # can run backwards and the compound is on the left
+    forward = upper[cols] > 0
+    reverse = lower[cols] < 0
+    makes = ((vals > 0) & forward) | ((vals < 0) & reverse)
+    uses = ((vals < 0) & forward) | ((vals > 0) & reverse)
+
+    row_alive = np.ones(nrows, dtype=bool)
+    col_alive = np.ones(ncols, dtype=bool)
+    passes = 0
+    while True:
+        passes += 1
+        live = col_alive[cols]
+        made = np.bincount(rows[live & makes], minlength=nrows) > 0
+        used = np.bincount(rows[live & uses], minlength=nrows) > 0
+        dead = row_alive & ~(made & used)
+        if keep_rows is not None:
+            dead &= ~keep_rows
+        if not dead.any():
+            return row_alive, col_alive, passes
+        row_alive &= ~dead
+        col_alive[cols[dead[rows]]] = False
+
+
+class DeadEndPresolve:
+    """
+    Prune the dead ends from a model, and map the solution of the pruned model back to the whole model.
+
+    :ivar compounds: every compound in the model, one per row, before pruning
+    :ivar reactions: every reaction id in the model, one per column, before pruning
+    :ivar kept_compounds: a bitset of the compounds that are left
+    :ivar kept_reactions: a bitset of the reactions that are left
+    :ivar passes: the number of passes it took to remove all the dead ends
+    """
+
+    def __init__(self):
+        self.compounds = []
+        self.reactions = []
+        self.kept_compounds = np.zeros(0, dtype=bool)
+        self.kept_reactions = np.zeros(0, dtype=bool)
+        self.passes = 0
+        self._col_names = None
+        self._row_names = None
+
+    def __str__(self):
+        return f"Removed {len(self.removed_compounds)} of {len(self.compounds)} compounds and " \
+               f"{len(self.removed_reactions)} of {len(self.reactions)} reactions in {self.passes} passes"
+
+    @property
+    def removed_compounds(self):
+        """
+        The dead end compounds that we removed
+
+        :rtype: list of PyFBA.metabolism.CompoundWithLocation
+        """
+        return [c for c, k in zip(self.compounds, self.kept_compounds.tolist()) if not k]
+
+    @property
+    def removed_reactions(self):
+        """
+        The ids of the reactions that we removed because they touch a dead end
+
+        :rtype: list of str
+        """
+        return [r for r, k in zip(self.reactions, self.kept_reactions.tolist()) if not k]
+
+    def prune(self, compounds, reactions, rows, cols, vals, lower, upper, keep_rows=None, verbose=False):
+        """
+        Remove the dead ends from a matrix. The biomass equation should be the last reaction, and its compounds should
+        be in keep_rows.
+
+        :param compounds: the compound of each row
+        :type compounds: list
+        :param reactions: the reaction id of each column
+        :type reactions: list of str
+        :param rows: the row of each entry in the matrix
+        :type rows: numpy.ndarray
+        :param cols: the column of each entry in the matrix
+        :type cols: numpy.ndarray
+        :param vals: the value of each entry in the matrix
+        :type vals: numpy.ndarray
+        :param lower: the lower bound of each column
+        :type lower: numpy.ndarray
+        :param upper: the upper bound of each column
+        :type upper: numpy.ndarray
+        :param keep_rows: (optional) a bitset of the rows that we should never remove
+        :type keep_rows: numpy.ndarray
+        :param verbose: more output
+        :type verbose: bool
+        :return: bitsets of the compounds and reactions that are left
+        :rtype: numpy.ndarray, numpy.ndarray
+        """
+
+        self.compounds = list(compounds)
+        self.reactions = list(reactions)
+        self._col_names = None
+        self._row_names = None
+        self.kept_compounds, self.kept_reactions, self.passes = dead_ends(len(compounds), len(reactions), rows, cols,
+                                                                          vals, lower, upper, keep_rows)
+        log_and_message(str(self), stderr=verbose)
+        return self.kept_compounds, self.kept_reactions
+
+    def expand_fluxes(self, primals):
+        """
+        The flux through every reaction, from the fluxes of the reactions that are left. The reactions that we removed
+        carry no flux.
+
+        :param primals: the flux through each reaction that is left
+        :type primals: numpy.ndarray
+        :return: the flux through each reaction in reactions
+        :rtype: numpy.ndarray
+        """
+
+        fluxes = np.zeros(len(self.reactions))
+        fluxes[self.kept_reactions] = primals
+        return fluxes
+
+    def expand_result(self, result):
+        """
+        The result of the whole model, from the result of the pruned model
+
+        :param result: the result of solving the pruned model
+        :type result: PyFBA.fba.FBAResult
+        :return: the result, with a flux for every reaction and a shadow price (or nan) for every compound
+        :rtype: PyFBA.fba.FBAResult
+        """
+
+        if self._col_names is None:
+            self._col_names = tuple(str(r) for r in self.reactions)
+            self._row_names = tuple(str(c) for c in self.compounds)
+        duals = np.full(len(self.compounds), np.nan)
+        duals[self.kept_compounds] = result.duals
+        return PyFBA.fba.FBAResult(*result, col_names=self._col_names, primals=self.expand_fluxes(result.primals),
+                                   row_names=self._row_names, duals=duals, seconds=result.seconds,
+                                   backend=result.backend, fingerprint=result._fingerprint)
@@ -0,0 +1,247 @@
+"""
+Run many independent fbas in parallel, in separate processes.
+
+The two halves of each bisection in minimize_by_accuracy, each medium in calculate_precision_recall, and each
+knockout in gap_create are separate fbas that do not depend on each other. An FBAExecutor starts a pool of worker
+processes, and sends each of them a short description of the model once, when it starts. Each worker loads its own
+ModelData from that description and keeps it (and its own linear programming session) for as long as the pool runs,
+so the jobs that we send are just the reaction ids and the media. e.g.
+
+    with PyFBA.fba.FBAExecutor(modeldata, biomass, workers=8) as executor:
+        results = executor.map([(reactions, media) for media in all_media])
+
+The results come back in the same order as the jobs, whatever order the workers finish them in. With workers=0 (the
+default) the jobs are run one after another in this process. Each worker has to parse the ModelSEED database again when
+it starts, so only ask for workers when there are enough jobs to pay for that, e.g. workers=os.cpu_count().
+
+The workers run pure fbas (see PyFBA.fba.run_context), so they never add uptake and secretion reactions to their
+ModelData.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+
+import PyFBA
+from PyFBA import lp, log_and_message
+
+# the ModelData, biomass equation, and session of a worker process. These are set once, when the worker starts.
+_worker = {}
+
+
+def _compound_key(c):
+    """
+    The fields that define a compound. We send these to the workers rather than the compound, because a compound
+    refers to all the reactions that it is in.
+
+    :param c: the compound
+    :type c: PyFBA.metabolism.CompoundWithLocation
+    :rtype: (str, str, str)
+    """
+    return c.id, c.name, getattr(c, 'location', None)
+
+
+def _media_from_keys(keys):
+    """
+    Make the media again from the compound keys
+
+    :param keys: the (id, name, location) of each compound
+    :type keys: tuple
+    :rtype: set of PyFBA.metabolism.CompoundWithLocation
+    """
+    return {PyFBA.metabolism.CompoundWithLocation(id=i, name=n, location=loc) for i, n, loc in keys}
+
+
+class ModelDescription:
+    """
+    What a worker needs to make its own copy of the ModelData.
+
+    If we know the organism type the worker parses the ModelSEED data for that organism again, which is much less
+    to send than the ModelData itself, and adds any extra reactions (e.g. reactions from an SBML file). Otherwise we
+    send the whole ModelData.
+
+    :ivar organism_type: the organism type to parse the ModelSEED data for
+    :ivar reactions: extra reactions to add to the ModelSEED data
+    :ivar modeldata: the ModelData to send, if we do not have an organism type
+    """
+
+    def __init__(self, organism_type=None, reactions=None, modeldata=None):
+        """
+        Describe a model
+
+        :param organism_type: the organism type to parse the ModelSEED data for
+        :type organism_type: str
+        :param reactions: extra reactions to add to the ModelSEED data
+        :type reactions: dict of str and PyFBA.metabolism.Reaction
+        :param modeldata: the ModelData to send to the workers instead
+        :type modeldata: PyFBA.model_seed.ModelData
+        """
+
+        if organism_type is None and modeldata is None:
+            raise ValueError("A model description needs either an organism type or a ModelData object")
+        self.organism_type = organism_type
+        self.reactions = reactions or {}
+        self.modeldata = modeldata
+
+    @classmethod
+    def from_modeldata(cls, modeldata, reactions=None):
+        """
+        Describe a ModelData object. We can not tell whether reactions have been changed after the ModelSEED data was
+        parsed, so pass any reactions that you have added or changed.
+
+        :param modeldata: the model data
+        :type modeldata: PyFBA.model_seed.ModelData
+        :param reactions: extra reactions to add to the ModelSEED data
+        :type reactions: dict of str and PyFBA.metabolism.Reaction
+        :rtype: ModelDescription
+        """
+
+        if modeldata.organism_type:
+            return cls(organism_type=modeldata.organism_type, reactions=reactions)
+        return cls(modeldata=modeldata)
+
+    def load(self, verbose=False):
+        """
+        Make the ModelData
+
+        :param verbose: more output
+        :type verbose: bool
+        :rtype: PyFBA.model_seed.ModelData
+        """
+
+        if self.modeldata is not None:
+            return self.modeldata
+        modeldata = PyFBA.parse.model_seed.parse_model_seed_data(self.organism_type, verbose=verbose)
+        modeldata.reactions.update(self.reactions)
+        return modeldata
+
+
+def _init_worker(description, biomass_equation, backend, verbose):
+    """
+    Load the model in a worker process. This is run once when the worker starts.
+    """
+
+    _worker['modeldata'] = description.load(verbose=verbose)
+    _worker['biomass_equation'] = biomass_equation
+    _worker['session'] = lp.new_session(backend)
+    _worker['verbose'] = verbose
+
+
+def _run_job(job):
+    """
+    Run one fba in a worker process
+
+    :param job: the reaction ids, the media compound keys, the solver options, and whether to keep the solution
+    :type job: tuple
+    :rtype: PyFBA.fba.FBAResult
+    """
+
+    reactions_to_run, media_keys, options, keep_solution = job
+    result = PyFBA.fba.run_fba(_worker['modeldata'], set(reactions_to_run), _media_from_keys(media_keys),
+                               _worker['biomass_equation'], verbose=_worker['verbose'], session=_worker['session'],
+                               options=options, pure=True)
+    if keep_solution:
+        return result
+    return PyFBA.fba.FBAResult(*result, seconds=result.seconds, backend=result.backend)
+
+
+class FBAExecutor:
+    """
+    A pool of worker processes that each hold a copy of the model, and run fbas for a list of (reactions, media) jobs.
+
+    :ivar workers: the number of worker processes. 0 runs the jobs in this process
+    """
+
+    def __init__(self, modeldata, biomass_equation, workers=0, backend=None, description=None, verbose=False):
+        """
+        Start the workers
+
+        :param modeldata: the model seed object that includes compounds and reactions
+        :type modeldata: PyFBA.model_seed.ModelData
+        :param biomass_equation: the biomass equation for every job
+        :type biomass_equation: PyFBA.metabolism.Reaction
+        :param workers: the number of worker processes. 0 (the default) runs the jobs in this process
+        :type workers: int
+        :param backend: the linear programming backend for the workers to use (e.g. glpk or highs)
+        :type backend: str
+        :param description: (optional) how the workers should make the model. See ModelDescription.from_modeldata
+        :type description: ModelDescription
+        :param verbose: more output
+        :type verbose: bool
+        """
+
+        if workers < 0:
+            raise ValueError(f"The number of workers must be at least 0, not {workers}")
+        self.workers = workers
+        self.verbose = verbose
+        self._modeldata = modeldata
+        self._biomass_equation = biomass_equation
+        self._backend = backend
+        self._pool = None
+        if workers:
+            if description is None:
+                description = ModelDescription.from_modeldata(modeldata)
+            self._pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                             initargs=(description, biomass_equation, backend, verbose))
+            log_and_message(f"Started {workers} fba workers", stderr=verbose)
+        else:
+            self._session = lp.new_session(backend)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        """
+        Stop the workers
+        """
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def map(self, jobs, options=None, keep_solution=False, chunksize=1):
+        """
+        Run an fba for each job.
+
+        :param jobs: the (reactions to run, media) for each fba
+        :type jobs: iterable of (set, set)
+        :param options: the solver options for every fba
+        :type options: PyFBA.lp.SolverOptions
+        :param keep_solution: send the fluxes and shadow prices back from the workers too. Otherwise the results
+        just have the status, value, and growth
+        :type keep_solution: bool
+        :param chunksize: the number of jobs to send to a worker at a time
+        :type chunksize: int
+        :return: the result of each job, in the same order as the jobs
+        :rtype: list of PyFBA.fba.FBAResult
+        """
+
+        if self.workers == 0:
+            results = []
+            for reactions_to_run, media in jobs:
+                results.append(PyFBA.fba.run_fba(self._modeldata, set(reactions_to_run), media,
+                                                 self._biomass_equation, verbose=self.verbose, session=self._session,
+                                                 options=options, pure=True))
+            return results
+
+        if self._pool is None:
+            raise ValueError("This FBAExecutor has been closed")
+        work = [(tuple(sorted(reactions_to_run)), tuple(sorted(_compound_key(c) for c in media)), options,
+                 keep_solution) for reactions_to_run, media in jobs]
+        return list(self._pool.map(_run_job, work, chunksize=chunksize))
+
+    def run(self, reactions_to_run, media, options=None, keep_solution=False):
+        """
+        Run one fba
+
+        :param reactions_to_run: the reactions to run
+        :type reactions_to_run: set
+        :param media: the media compounds
+        :type media: set
+        :param options: the solver options
+        :type options: PyFBA.lp.SolverOptions
+        :param keep_solution: send the fluxes and shadow prices back from the worker too
+        :type keep_solution: bool
+        :rtype: PyFBA.fba.FBAResult
+        """
+        return self.map([(reactions_to_run, media)], options, keep_solution)[0]
@@ -1,9 +1,95 @@
-import copy
 import PyFBA
 from PyFBA import log_and_message
 
 
-def uptake_and_secretion_reactions(model_compounds, media):
+def is_boundary_compound(compound):
+    """
+    Does this compound need an uptake and secretion reaction? Every external compound (and the biomass) does.
+
+    :param compound: the compound
+    :type compound: PyFBA.metabolism.CompoundWithLocation
+    :rtype: bool
+    """
+    return compound.location == 'e' or compound.name == 'Biomass'
+
+
+def boundary_template(compound):
+    """
+    Make the template uptake and secretion reaction for a compound. The reaction takes the compound to a copy of itself
+    at the boundary (location b). Each fba makes its own reaction from the template (see
+    uptake_and_secretion_reactions) so the template never has an id or bounds of its own.
+
+    :param compound: the external compound
+    :type compound: PyFBA.metabolism.CompoundWithLocation
+    :return: the template reaction
+    :rtype: PyFBA.metabolism.Reaction
+    """
+
+    # we used to deepcopy the compound, but that also copies every reaction the compound is in. The boundary compound
+    # only needs the compound's own attributes, and not its reactions
+    us_leftside = compound
+    us_rightside = PyFBA.metabolism.CompoundWithLocation.from_compound(us_leftside, 'b')
+    us_rightside.reactions = set()
+    us_rightside.alternate_seed_ids = set(us_leftside.alternate_seed_ids)
+    # The uptake and secretion compounds typically have reaction bounds that allow them to be consumed
+    # (i.e. diffuse away from the cell) but not produced. However, our media components can also increase
+    # in concentration (i.e. diffuse to the cell) and thus the bounds are set higher. Whenever you change the
+    # growth media, you also need to adjust the reaction bounds to ensure that the media can be consumed!
+    # the b is for boundary and is secretion away from the cell
+    us_rightside.uptake_secretion = True
+    # this is similar name that they use in the model seed
+    # us_reaction = Reaction('us_001', "EX_" + us_leftside.model_seed_id + "_" + us_leftside.location + "0")
+    # but we normally use a different name
+    template = PyFBA.metabolism.Reaction("upsr_template", "UPTAKE_SECRETION_REACTION")
+    template.equation = '(1) + ' + str(us_leftside) + " <=> (1) + " + str(us_rightside)
+    template.add_left_compounds({us_leftside})
+    template.set_left_compound_abundance(us_leftside, 1)
+    template.add_right_compounds({us_rightside})
+    template.set_right_compound_abundance(us_rightside, 1)
+    template.set_direction('=')
+    template.is_uptake_secretion = True
+    us_rightside.add_reactions({template})
+    return template
+
+
+def boundary_templates(compounds):
+    """
+    Make the template uptake and secretion reactions for all the external compounds in a collection, e.g. all the
+    compounds in the universal matrix (see ModelData.boundary_templates)
+
+    :param compounds: the compounds
+    :type compounds: iterable of PyFBA.metabolism.CompoundWithLocation
+    :return: a dict of compound and template reaction
+    :rtype: dict
+    """
+
+    return {c: boundary_template(c) for c in compounds if is_boundary_compound(c)}
+
+
+def _boundary_reaction(template, count):
+    """
+    Make an uptake and secretion reaction from a template. This only copies the (one member) sets of compounds and
+    their abundances, so it is much cheaper than building the reaction again.
+
+    :param template: the template reaction
+    :type template: PyFBA.metabolism.Reaction
+    :param count: the number of this reaction
+    :type count: int
+    :return: the reaction
+    :rtype: PyFBA.metabolism.Reaction
+    """
+
+    us_reaction = PyFBA.metabolism.Reaction(f"upsr_{count}", f"UPTAKE_SECRETION_REACTION {count}",
+                                            equation=template.equation, direction='=')
+    us_reaction.left_compounds = set(template.left_compounds)
+    us_reaction.left_abundance = dict(template.left_abundance)
+    us_reaction.right_compounds = set(template.right_compounds)
+    us_reaction.right_abundance = dict(template.right_abundance)
+    us_reaction.is_uptake_secretion = True
+    return us_reaction
+
+
+def uptake_and_secretion_reactions(model_compounds, media, start=0, link_compounds=True, templates=None):
     """
     Figure out which compounds can be taken up from the media and/or secreted into the media. We provide an endless
     reaction for these which allows them to be taken up and/or secreted without affecting the rest of the stoichiometric
@@ -19,40 +105,32 @@ def uptake_and_secretion_reactions(model_compounds, media):
     :type model_compounds: set[PyFBA.metabolism.CompoundWithLocation]
     :param media: the media we want to grow on
     :type media: set[PyFBA.metabolism.CompoundWithLocation]
+    :param start: the number of the first reaction, so we can add more reactions to a model without reusing ids
+    :type start: int
+    :param link_compounds: add the new reactions to the reactions of each compound. Use False if the compounds are
+    shared with other models (e.g. in a pure run_fba)
+    :type link_compounds: bool
+    :param templates: (optional) a dict of compound and template reaction (see boundary_templates). We make a template
+    for any compound that is not in the dict, and add it to the dict for next time.
+    :type templates: dict
     :return: A hash of new uptake and secretion reactions we need to add to the model
     :rtype: hash
     """
 
     uptake_sec_reactions = {}
-    count = 0
+    count = start
     for c in model_compounds:
-        if c.location == 'e' or c.name == 'Biomass':
+        if is_boundary_compound(c):
             # this is an uptake or secretion reaction
-            # we need to add a new compound like this with a false location
-            us_leftside = c
-            us_rightside = copy.deepcopy(us_leftside)
-            # The uptake and secretion compounds typically have reaction bounds that allow them to be consumed
-            # (i.e. diffuse away from the cell) but not produced. However, our media components can also increase
-            # in concentration (i.e. diffuse to the cell) and thus the bounds are set higher. Whenever you change the
-            # growth media, you also need to adjust the reaction bounds to ensure that the media can be consumed!
-            # the b is for boundary and is secretion away from the cell
-            us_rightside.location = 'b'
-            us_rightside.uptake_secretion = True
-            # this is similar name that they use in the model seed
-            # us_reaction = Reaction('us_001', "EX_" + us_leftside.model_seed_id + "_" + us_leftside.location + "0")
-            # but we normally use a different name
-            us_reaction_id = f"upsr_{count}"
-            us_reaction = PyFBA.metabolism.Reaction(us_reaction_id, f"UPTAKE_SECRETION_REACTION {count}")
+            template = templates.get(c) if templates is not None else None
+            if template is None:
+                template = boundary_template(c)
+                if templates is not None:
+                    templates[c] = template
+            us_reaction = _boundary_reaction(template, count)
             count += 1
-            us_reaction.equation = '(1) + ' + str(us_leftside) + " <=> (1) + " + str(us_rightside)
-            us_reaction.add_left_compounds({us_leftside})
-            us_reaction.set_left_compound_abundance(us_leftside, 1)
-            us_reaction.add_right_compounds({us_rightside})
-            us_reaction.set_right_compound_abundance(us_rightside, 1)
-            us_reaction.set_direction('=')
-            us_reaction.is_uptake_secretion = True
-            us_leftside.add_reactions({us_reaction})
-            us_rightside.add_reactions({us_reaction})
+            if link_compounds:
+                c.add_reactions({us_reaction})
             # Here we set reaction bounds. If the compound is in the media, we let it flow freely
             # otherwise we only let it diffuse away
             if c in media:
@@ -61,7 +139,7 @@ def uptake_and_secretion_reactions(model_compounds, media):
             else:
                 us_reaction.lower_bound = 0
                 us_reaction.upper_bound = 1000
-            uptake_sec_reactions[us_reaction_id] = us_reaction
+            uptake_sec_reactions[us_reaction.id] = us_reaction
 
     return uptake_sec_reactions
 
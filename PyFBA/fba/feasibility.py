@@ -0,0 +1,109 @@
+"""
+Ask whether a model can grow, without finding out how fast it grows.
+
+Most of the time (in bisections, knockout screens, and calculate_precision_recall) we only use the growth flag from
+run_fba, i.e. whether the biomass flux is more than 1. To answer that we do not need the maximum biomass flux, just any
+solution where the biomass flux is more than 1. So in feasibility mode we set the lower bound of the biomass equation
+just above the growth threshold and set the objective to zero. The simplex method then stops at the end of phase 1, as
+soon as it has found a feasible point (the model grows) or proved that there is not one (the model does not grow). e.g.
+
+    status, value, growth = PyFBA.fba.run_fba(modeldata, reactions, media, biomass, feasibility=True)
+
+The growth is True, False, or None if the solver stopped at a limit before it could tell. The value is the biomass
+flux at the feasible point that the solver found, which is more than the threshold but is not the maximum. A model
+whose biomass flux can only reach the threshold does not grow, just as in run_fba.
+"""
+
+import time
+
+import numpy as np
+
+import PyFBA
+
+"""
+The model grows if the biomass flux is more than this
+"""
+GROWTH_THRESHOLD = 1.0
+
+"""
+How far above the threshold we set the lower bound of the biomass equation. The solver only meets the bounds to within
+its feasibility tolerance (about 1e-7), so with the lower bound at the threshold itself a model whose biomass flux can
+only reach the threshold would be feasible, although run_fba says that it does not grow.
+"""
+GROWTH_MARGIN = 1e-6
+
+"""
+The statuses that mean the solver found a feasible point, and the statuses that mean there is not one
+"""
+FEASIBLE_STATUSES = ('opt', 'feas')
+INFEASIBLE_STATUSES = ('nofeas', 'infeas')
+
+
+def growth_state(status):
+    """
+    Whether a feasibility solve means the model grows
+
+    :param status: the status of the solve
+    :type status: str
+    :return: True if the model grows, False if it does not, and None if we do not know (e.g. the solver stopped at a
+    limit)
+    :rtype: bool or None
+    """
+
+    if status in FEASIBLE_STATUSES:
+        return True
+    if status in INFEASIBLE_STATUSES:
+        return False
+    return None
+
+
+def solve_feasibility(session, column, bounds, threshold=GROWTH_THRESHOLD, options=None, fingerprint=None):
+    """
+    Find out whether the model that is loaded in a session can carry more than threshold flux through one column (the
+    biomass equation). Afterwards the bounds of the column are set back to bounds, and the objective is set back to
+    maximising the column.
+
+    :param session: the linear programming session that holds the model
+    :type session: PyFBA.lp.LPBackend
+    :param column: the index of the biomass column
+    :type column: int
+    :param bounds: the (lower, upper) bounds of the biomass column
+    :type bounds: (float, float)
+    :param threshold: the model grows if the flux is more than this
+    :type threshold: float
+    :param options: the solver options, e.g. to limit the time that the solve can take
+    :type options: PyFBA.lp.SolverOptions
+    :param fingerprint: the fingerprint of the model, or a callable that calculates it
+    :type fingerprint: str or callable
+    :return: the result, where growth is True, False, or None
+    :rtype: PyFBA.fba.FBAResult
+    """
+
+    lower, upper = bounds
+    floor = max(lower, threshold + GROWTH_MARGIN)
+    if upper < floor:
+        # the column can never carry more than threshold flux, so there is nothing to solve
+        return PyFBA.fba.FBAResult('nofeas', 0.0, False, seconds=0.0, backend=session.name, fingerprint=fingerprint)
+    ncols = session.dimensions()[1]
+    objective = np.zeros(ncols)
+    session.objective_coefficients(objective)
+    session.set_col_bounds_array([floor], [upper], [column])
+    try:
+        start = time.perf_counter()
+        status, value = session.solve(options)
+        seconds = time.perf_counter() - start
+        growth = growth_state(status)
+        # the objective is zero, so the value that the solver returns does not tell us anything
+        primals = session.col_primal_array()
+        value = float(primals[column]) if growth else 0.0
+        if growth and not value > threshold:
+            # the same test as run_fba, in case the solver only just met the lower bound
+            growth = False
+        result = PyFBA.fba.FBAResult(status, value, growth, session.cached_col_names(), primals,
+                                     session.cached_row_names(), session.row_dual_array(), seconds, session.name,
+                                     fingerprint)
+    finally:
+        session.set_col_bounds_array([lower], [upper], [column])
+        objective[column] = 1
+        session.objective_coefficients(objective)
+    return result
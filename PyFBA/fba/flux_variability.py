@@ -0,0 +1,219 @@
+"""
+Flux variability analysis (FVA).
+
+FVA finds the smallest and largest flux that each reaction can carry while the model still grows at (a fraction of)
+its maximum rate. We build the model once, find the maximum biomass flux, set the lower bound of the biomass equation
+to fraction_of_optimum times that maximum, and then minimise and maximise each reaction in turn, changing only the
+objective between solves. e.g.
+
+    reactions, minimum, maximum = PyFBA.fba.flux_variability(modeldata, reactions, media, biomass,
+                                                             fraction_of_optimum=0.9)
+
+Every solution that the solver finds is a feasible flux, so if a reaction is already at its upper (or lower) bound in
+any of them we know its maximum (or minimum) without solving for it. We also skip reactions whose bounds are fixed.
+Set prepass=False to solve for every reaction anyway.
+
+By default all the solves are done in this process. With more than one worker the reactions are split into shards, and
+each worker process builds the model once and solves its shards. See PyFBA.fba.executor.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import PyFBA
+from PyFBA import lp, log_and_message
+from .executor import ModelDescription, _compound_key, _media_from_keys
+
+# the model of a worker process. This is set once, when the worker starts.
+_worker = {}
+
+
+def _load_model(modeldata, reactions_to_run, media, biomass_equation, session, verbose=False):
+    """
+    Build the model in a session
+
+    :return: the compiled model, and the lower and upper bounds of each column
+    :rtype: PyFBA.fba.model_cache.CompiledModel, numpy.ndarray, numpy.ndarray
+    """
+
+    compiled = PyFBA.fba.model_cache.build_model(modeldata, reactions_to_run, media, biomass_equation,
+                                                 verbose=verbose, session=session, keep_problem=False, pure=True)
+    lower = np.array([compiled.rbvals[r][0] for r in compiled.rc], dtype=float)
+    upper = np.array([compiled.rbvals[r][1] for r in compiled.rc], dtype=float)
+    return compiled, lower, upper
+
+
+def _at_bounds(primals, lower, upper):
+    """
+    Which columns are at their lower and upper bounds in a solution
+
+    :rtype: numpy.ndarray, numpy.ndarray
+    """
+    return np.isclose(primals, lower, rtol=1e-9, atol=1e-9), np.isclose(primals, upper, rtol=1e-9, atol=1e-9)
+
+
+def _extremes(session, columns, lower, upper, minimum, maximum, prepass=True, options=None):
+    """
+    Minimise and maximise the flux through some columns of the model that is loaded in a session. We only solve for
+    the extremes that are not already known.
+
+    :param session: the linear programming session that holds the model, with the biomass lower bound already set
+    :type session: PyFBA.lp.LPBackend
+    :param columns: the indices of the columns
+    :type columns: list of int
+    :param lower: the lower bound of every column
+    :type lower: numpy.ndarray
+    :param upper: the upper bound of every column
+    :type upper: numpy.ndarray
+    :param minimum: the minimum flux of every column, or nan if it is not known. This is updated in place
+    :type minimum: numpy.ndarray
+    :param maximum: the maximum flux of every column, or nan if it is not known. This is updated in place
+    :type maximum: numpy.ndarray
+    :param prepass: skip the solves when a solution is already at the bound
+    :type prepass: bool
+    :param options: the solver options
+    :type options: PyFBA.lp.SolverOptions
+    :return: void. The extremes stay nan if the solve failed
+    :rtype: void
+    """
+
+    objective = np.zeros(len(lower))
+    for j in columns:
+        for sense, found in ((-1, minimum), (1, maximum)):
+            if not np.isnan(found[j]):
+                continue
+            objective[j] = sense
+            session.objective_coefficients(objective)
+            status, value = session.solve(options)
+            objective[j] = 0
+            if status != 'opt':
+                continue
+            found[j] = sense * value
+            if prepass:
+                at_lower, at_upper = _at_bounds(session.col_primal_array(), lower, upper)
+                minimum[at_lower & np.isnan(minimum)] = lower[at_lower & np.isnan(minimum)]
+                maximum[at_upper & np.isnan(maximum)] = upper[at_upper & np.isnan(maximum)]
+
+
+def _init_worker(description, reactions_to_run, media_keys, biomass_equation, backend, biomass_lower, verbose):
+    """
+    Build the model in a worker process, with the biomass lower bound set. This is run once when the worker starts.
+    """
+
+    modeldata = description.load(verbose=verbose)
+    session = lp.new_session(backend)
+    compiled, lower, upper = _load_model(modeldata, set(reactions_to_run), _media_from_keys(media_keys),
+                                         biomass_equation, session, verbose=verbose)
+    biomass = len(compiled.rc) - 1
+    lower[biomass] = biomass_lower
+    session.set_col_bounds_array([biomass_lower], [upper[biomass]], [biomass])
+    _worker.update(session=session, lower=lower, upper=upper)
+
+
+def _run_shard(job):
+    """
+    Find the extremes of one shard of columns in a worker process
+
+    :param job: the column indices, their known minimum and maximum flux (or nan), whether to use the prepass, and the
+    solver options
+    :type job: tuple
+    :return: the minimum and maximum of each column
+    :rtype: numpy.ndarray, numpy.ndarray
+    """
+
+    columns, known_min, known_max, prepass, options = job
+    minimum = np.full(len(_worker['lower']), np.nan)
+    maximum = np.full(len(_worker['lower']), np.nan)
+    minimum[columns] = known_min
+    maximum[columns] = known_max
+    _extremes(_worker['session'], columns, _worker['lower'], _worker['upper'], minimum, maximum, prepass, options)
+    return minimum[columns], maximum[columns]
+
+
+def flux_variability(modeldata, reactions_to_run, media, biomass_equation, fraction_of_optimum=1.0, reactions=None,
+                     prepass=True, workers=0, backend=None, options=None, description=None, verbose=False):
+    """
+    Calculate the minimum and maximum flux through each reaction while the model grows at fraction_of_optimum of its
+    maximum growth rate.
+
+    :param modeldata: the model seed object that includes compounds and reactions
+    :type modeldata: PyFBA.model_seed.ModelData
+    :param reactions_to_run: the reactions to run
+    :type reactions_to_run: set
+    :param media: the media compounds
+    :type media: set
+    :param biomass_equation: the biomass equation
+    :type biomass_equation: PyFBA.metabolism.Reaction
+    :param fraction_of_optimum: the fraction of the maximum biomass flux that the model must still reach
+    :type fraction_of_optimum: float
+    :param reactions: (optional) the reactions to calculate the variability of. We use every reaction in the model,
+    including the uptake and secretion reactions and the biomass equation, if not provided
+    :type reactions: list of str
+    :param prepass: skip reactions whose bounds are fixed, or that are at a bound in a solution we have already found
+    :type prepass: bool
+    :param workers: the number of worker processes. With 0 (the default) or 1 we do all the work in this process
+    :type workers: int
+    :param backend: the linear programming backend to use (e.g. glpk or highs)
+    :type backend: str
+    :param options: the solver options for every solve
+    :type options: PyFBA.lp.SolverOptions
+    :param description: (optional) how the workers should make the model. See PyFBA.fba.ModelDescription
+    :type description: PyFBA.fba.ModelDescription
+    :param verbose: more output
+    :type verbose: bool
+    :return: the reaction ids, and the minimum and maximum flux through each of them. These are nan if a solve failed
+    :rtype: list of str, numpy.ndarray, numpy.ndarray
+    """
+
+    if not 0 <= fraction_of_optimum <= 1:
+        raise ValueError(f"The fraction of the optimum must be between 0 and 1, not {fraction_of_optimum}")
+
+    session = lp.new_session(backend)
+    compiled, lower, upper = _load_model(modeldata, reactions_to_run, media, biomass_equation, session,
+                                         verbose=verbose)
+    status, value = session.solve(options)
+    if status != 'opt':
+        raise ValueError(f"We can not calculate the flux variability because the model has a status of {status}")
+
+    rc = compiled.rc
+    biomass = len(rc) - 1
+    lower[biomass] = min(fraction_of_optimum * value, upper[biomass])
+    session.set_col_bounds_array([lower[biomass]], [upper[biomass]], [biomass])
+
+    if reactions is None:
+        reactions = list(rc)
+    index = {r: j for j, r in enumerate(rc)}
+    missing = [r for r in reactions if r not in index]
+    if missing:
+        raise ValueError(f"Reactions {missing} are not in the model")
+    columns = np.array([index[r] for r in reactions], dtype=np.int64)
+
+    minimum = np.full(len(rc), np.nan)
+    maximum = np.full(len(rc), np.nan)
+    if prepass:
+        # the optimal solution is still feasible, because it grows at the maximum rate
+        fixed = lower == upper
+        at_lower, at_upper = _at_bounds(session.col_primal_array(), lower, upper)
+        minimum[fixed | at_lower] = lower[fixed | at_lower]
+        maximum[fixed | at_upper] = upper[fixed | at_upper]
+    todo = [int(j) for j in columns if np.isnan(minimum[j]) or np.isnan(maximum[j])]
+    log_and_message(f"FVA: {len(columns) - len(todo)} of {len(columns)} reactions were found by the prepass",
+                    stderr=verbose)
+
+    if workers <= 1 or len(todo) < 2:
+        _extremes(session, todo, lower, upper, minimum, maximum, prepass, options)
+        return reactions, minimum[columns], maximum[columns]
+
+    if description is None:
+        description = ModelDescription.from_modeldata(modeldata)
+    shards = [s.tolist() for s in np.array_split(np.array(todo), min(len(todo), workers * 4))]
+    jobs = [(s, minimum[s], maximum[s], prepass, options) for s in shards]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(description, tuple(sorted(reactions_to_run)),
+                                       tuple(sorted(_compound_key(c) for c in media)), biomass_equation, backend,
+                                       float(lower[biomass]), verbose)) as pool:
+        for shard, (found_min, found_max) in zip(shards, pool.map(_run_shard, jobs)):
+            minimum[shard] = found_min
+            maximum[shard] = found_max
+    return reactions, minimum[columns], maximum[columns]
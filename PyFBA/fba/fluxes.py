@@ -4,14 +4,20 @@ from PyFBA import lp
 import PyFBA
 
 
-def reaction_fluxes(verbose=False):
+def reaction_fluxes(verbose=False, session=None, backend=None):
     """
     Return the reaction fluxes from the solved FBA model.
 
     :param verbose: Print more output
     :type verbose: bool
+    :param session: the linear programming session that the FBA was run in. We use the default session if not provided
+    :type session: PyFBA.lp.LPBackend
+    :param backend: the linear programming backend that the FBA was run with, if a session is not provided
+    :type backend: str
     :return: A dict of reaction ID and flux through that reaction
     :rtype: dict of str and float
     """
 
-    return lp.col_primal_hash()
+    if session is None:
+        session = lp.default_session(backend)
+    return session.col_primal_hash()
@@ -0,0 +1,219 @@
+"""
+Gene (peg) knockout screens.
+
+A gene does not switch off a reaction directly. The gene encodes one or more roles, the roles are the subunits of the
+enzyme complexes, and the complexes catalyse the reactions. So when we delete a gene:
+
+  * a role is lost when every peg that encodes it is deleted
+  * a complex fails when any of its roles that are encoded in the genome is lost
+  * a reaction is knocked out when every complex that can catalyse it has failed
+
+Reactions with no complex that is encoded in the genome (e.g. the spontaneous and gap filled reactions) are never
+knocked out by a gene deletion.
+
+GeneReactionIndex compiles these rules once, from the complexes in modeldata.enzymes and either an assigned functions
+dict (see PyFBA.parse.read_assigned_functions) or the pegs that have already been added to the enzymes. The effect of
+deleting some genes is then just the set of reactions that they knock out, and we call that set the signature of the
+deletion. Many genes have the same signature (all the subunits of one complex, and every gene whose roles are also
+encoded elsewhere, which knocks nothing out), so GeneKnockoutScreen only solves each signature once, on a
+KnockoutScreen, and caches the results by signature. e.g.
+
+    wild_type, results = PyFBA.fba.gene_knockouts(modeldata, reactions, media, biomass, assigned_functions)
+    essential = {peg for peg in results if not results[peg].growth}
+"""
+
+import PyFBA
+from PyFBA import log_and_message
+from .knockouts import KnockoutScreen, ZERO_FLUX
+
+
+class GeneReactionIndex:
+    """
+    The rules that connect the genes to the reactions in a model.
+
+    :ivar peg_roles: the roles that each peg encodes
+    :ivar role_pegs: the pegs that encode each role
+    :ivar role_complexes: the complexes that need each role
+    :ivar complex_reactions: the gene associated reactions in the model that each complex catalyses
+    :ivar reaction_complexes: the complexes that are encoded in the genome for each gene associated reaction
+    """
+
+    def __init__(self, modeldata, reactions_to_run, assigned_functions=None):
+        """
+        Compile the gene to reaction rules
+
+        :param modeldata: the model seed object that includes the reactions and enzymes
+        :type modeldata: PyFBA.model_seed.ModelData
+        :param reactions_to_run: the reactions in the model
+        :type reactions_to_run: set
+        :param assigned_functions: a dict of peg and the set of roles it encodes. We use the pegs that have been added
+        to the enzymes in modeldata if not provided
+        :type assigned_functions: dict of str and set
+        """
+
+        if modeldata.enzymes is None:
+            raise ValueError("The model data does not have any enzymes, so we can not connect genes to reactions")
+
+        self.peg_roles = {}
+        if assigned_functions is None:
+            for enzyme in modeldata.enzymes.values():
+                for peg, role in enzyme.pegs.items():
+                    self.peg_roles.setdefault(peg, set()).add(role)
+        else:
+            for peg, roles in assigned_functions.items():
+                self.peg_roles[peg] = set(roles)
+
+        self.role_pegs = {}
+        for peg, roles in self.peg_roles.items():
+            for role in roles:
+                self.role_pegs.setdefault(role, set()).add(peg)
+
+        self.role_complexes = {}
+        self.complex_reactions = {}
+        self.reaction_complexes = {}
+        for rid in reactions_to_run:
+            if rid not in modeldata.reactions:
+                continue
+            for cid in modeldata.reactions[rid].enzymes:
+                if cid not in modeldata.enzymes:
+                    continue
+                roles = {r for r in modeldata.enzymes[cid].roles if r in self.role_pegs}
+                if not roles:
+                    # none of the subunits are encoded, so this complex is not in the genome
+                    continue
+                self.reaction_complexes.setdefault(rid, set()).add(cid)
+                self.complex_reactions.setdefault(cid, set()).add(rid)
+                for role in roles:
+                    self.role_complexes.setdefault(role, set()).add(cid)
+
+    def genes(self):
+        """
+        The pegs that encode at least one subunit of a complex in the model
+
+        :rtype: list of str
+        """
+        return sorted(p for p in self.peg_roles if any(r in self.role_complexes for r in self.peg_roles[p]))
+
+    def signature(self, genes):
+        """
+        The reactions that are knocked out when some genes are deleted
+
+        :param genes: the pegs to delete
+        :type genes: set of str
+        :return: the reactions that are knocked out
+        :rtype: frozenset of str
+        """
+
+        genes = set(genes)
+        failed = set()
+        for peg in genes:
+            for role in self.peg_roles.get(peg, ()):
+                if role in self.role_complexes and self.role_pegs[role] <= genes:
+                    failed.update(self.role_complexes[role])
+
+        knocked_out = set()
+        for cid in failed:
+            for rid in self.complex_reactions[cid]:
+                if rid not in knocked_out and self.reaction_complexes[rid] <= failed:
+                    knocked_out.add(rid)
+        return frozenset(knocked_out)
+
+
+class GeneKnockoutScreen:
+    """
+    A model that is loaded once, for testing many gene knockouts.
+
+    :ivar index: the gene to reaction rules
+    :ivar screen: the reaction knockout screen that runs the model
+    :ivar wild_type: the result with no knockouts
+    :ivar results: the result of each signature that we have tested
+    """
+
+    def __init__(self, modeldata, reactions_to_run, media, biomass_equation, assigned_functions=None, workers=0,
+                 backend=None, options=None, description=None, verbose=False):
+        """
+        Compile the gene to reaction rules, load the model, and solve the wild type. See KnockoutScreen for the
+        parameters that are not described here.
+
+        :param assigned_functions: a dict of peg and the set of roles it encodes. We use the pegs that have been added
+        to the enzymes in modeldata if not provided
+        :type assigned_functions: dict of str and set
+        """
+
+        self.verbose = verbose
+        self.index = GeneReactionIndex(modeldata, reactions_to_run, assigned_functions)
+        self.screen = KnockoutScreen(modeldata, reactions_to_run, media, biomass_equation, workers=workers,
+                                     backend=backend, options=options, description=description, verbose=verbose)
+        self.wild_type = self.screen.wild_type
+        self.results = {frozenset(): self.wild_type}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        """
+        Stop the workers
+        """
+        self.screen.close()
+
+    def run(self, deletions, skip_zero_flux=True):
+        """
+        Test some gene deletions. Each signature is only solved once.
+
+        :param deletions: the genes to delete in each test
+        :type deletions: list of set of str
+        :param skip_zero_flux: do not solve when every reaction that is knocked out carries no flux in the wild type.
+        The result is the wild type result
+        :type skip_zero_flux: bool
+        :return: the result of each test, in the same order as the deletions
+        :rtype: list of PyFBA.fba.FBAResult
+        """
+
+        signatures = [self.index.signature(genes) for genes in deletions]
+        todo = []
+        for sig in dict.fromkeys(signatures):
+            if sig in self.results:
+                continue
+            if skip_zero_flux and all(abs(self.screen.flux(self.wild_type, r)) <= ZERO_FLUX for r in sig):
+                self.results[sig] = self.wild_type
+            else:
+                todo.append(sig)
+        for sig, result in zip(todo, self.screen.run([tuple(sorted(sig)) for sig in todo])):
+            self.results[sig] = result
+        log_and_message(f"Gene knockouts: {len(deletions)} deletions have {len(set(signatures))} signatures. "
+                        f"Solved {len(todo)}", stderr=self.verbose)
+        return [self.results[sig] for sig in signatures]
+
+    def single_knockouts(self, genes=None, skip_zero_flux=True):
+        """
+        Delete each gene on its own
+
+        :param genes: the genes to delete. We use every gene that encodes part of a complex in the model if not
+        provided
+        :type genes: list of str
+        :param skip_zero_flux: see run
+        :type skip_zero_flux: bool
+        :return: a dict of peg and the result of deleting it
+        :rtype: dict of str and PyFBA.fba.FBAResult
+        """
+
+        if genes is None:
+            genes = self.index.genes()
+        return dict(zip(genes, self.run([{g} for g in genes], skip_zero_flux)))
+
+
+def gene_knockouts(modeldata, reactions_to_run, media, biomass_equation, assigned_functions=None, genes=None,
+                   skip_zero_flux=True, workers=0, backend=None, options=None, verbose=False):
+    """
+    Delete each gene on its own. See GeneKnockoutScreen for the parameters.
+
+    :return: the wild type result, and a dict of peg and the result of deleting it
+    :rtype: PyFBA.fba.FBAResult, dict of str and PyFBA.fba.FBAResult
+    """
+
+    with GeneKnockoutScreen(modeldata, reactions_to_run, media, biomass_equation, assigned_functions,
+                            workers=workers, backend=backend, options=options, verbose=verbose) as screen:
+        return screen.wild_type, screen.single_knockouts(genes, skip_zero_flux)
@@ -0,0 +1,146 @@
+"""
+Give every compound and reaction a dense integer id.
+
+Compounds are hashed on their id, name, and location, and reactions on their id and name, and we used to recompute
+those hashes every time we put them in a set or a dict while building a matrix or gap filling. An InternTable numbers
+each object once, so that the hot loops can work on numpy arrays of integers, and sets of compounds or reactions can be
+bitsets (numpy boolean arrays with one element per object in the table). The objects themselves are only needed again
+for reporting.
+
+ModelData keeps two tables, one for compounds (with their locations) and one for reactions, and these are the row and
+column numbers of the universal matrix. See ModelData.compound_table and ModelData.reaction_table.
+"""
+
+import threading
+
+import numpy as np
+
+
+class InternTable:
+    """
+    A table of objects and their dense integer ids. Ids start at 0 and are never reused.
+
+    :ivar items: the object for each id
+    :ivar index: a dict of object and id
+    """
+
+    def __init__(self, items=None):
+        """
+        Start a table
+
+        :param items: (optional) the objects to add first
+        :type items: iterable
+        """
+
+        self.items = []
+        self.index = {}
+        self._lock = threading.Lock()
+        if items is not None:
+            for item in items:
+                self.intern(item)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __contains__(self, item):
+        return item in self.index
+
+    def __getitem__(self, i):
+        return self.items[i]
+
+    def __getstate__(self):
+        """
+        A lock can not be pickled or copied, so we leave it out and make a new one
+        """
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def intern(self, item):
+        """
+        The id of an object, adding it to the table if it is not there
+
+        :param item: the object
+        :type item: object
+        :return: the id
+        :rtype: int
+        """
+
+        i = self.index.get(item)
+        if i is None:
+            with self._lock:
+                i = self.index.get(item)
+                if i is None:
+                    i = len(self.items)
+                    self.items.append(item)
+                    self.index[item] = i
+        return i
+
+    def intern_all(self, items):
+        """
+        The ids of several objects, adding any that are not in the table
+
+        :param items: the objects
+        :type items: iterable
+        :return: the ids, in the same order as the objects
+        :rtype: numpy.ndarray
+        """
+        return np.array([self.intern(item) for item in items], dtype=np.int64)
+
+    def get(self, item, default=-1):
+        """
+        The id of an object, without adding it to the table
+
+        :param item: the object
+        :type item: object
+        :param default: what to return if the object is not in the table
+        :type default: int
+        :return: the id
+        :rtype: int
+        """
+        return self.index.get(item, default)
+
+    def lookup(self, ids):
+        """
+        The objects for some ids
+
+        :param ids: the ids
+        :type ids: iterable of int
+        :return: the objects
+        :rtype: list
+        """
+        return [self.items[i] for i in ids]
+
+    def bitset(self, items=(), ids=None):
+        """
+        A bitset with one element for every object in the table, that is True for the objects we are given. Objects
+        that are not in the table are ignored.
+
+        :param items: the objects that are in the set
+        :type items: iterable
+        :param ids: (optional) the ids of the objects that are in the set, instead of the objects
+        :type ids: iterable of int
+        :return: the bitset
+        :rtype: numpy.ndarray
+        """
+
+        bits = np.zeros(len(self.items), dtype=bool)
+        if ids is None:
+            ids = [i for i in (self.index.get(item) for item in items) if i is not None]
+        bits[np.asarray(ids, dtype=np.int64)] = True
+        return bits
+
+    def from_bitset(self, bits):
+        """
+        The objects that are in a bitset
+
+        :param bits: the bitset
+        :type bits: numpy.ndarray
+        :return: the objects
+        :rtype: list
+        """
+        return self.lookup(np.flatnonzero(bits).tolist())
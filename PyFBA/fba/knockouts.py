@@ -0,0 +1,311 @@
+"""
+Single and double reaction knockout screens.
+
+We load the model once (see PyFBA.fba.WarmStartModel) and knock a reaction out by setting the bounds of its column to
+(0, 0), so each test is just a re-solve from the previous solution.
+
+Most knockouts do not need a solve at all. If a reaction carries no flux in the wild type solution, that solution is
+still feasible (and still optimal) without it, so knocking it out can not change growth. In the same way the result of
+knocking out a pair of reactions is the result of knocking out one of them, if the other carries no flux in that
+single knockout solution. Removing reactions can never increase growth, so if either single knockout is lethal the
+pair is too, and we leave those pairs out: the double knockouts that we report are the pairs of viable reactions, and
+the synthetic lethal pairs are the ones that do not grow. e.g.
+
+    wild_type, singles, doubles = PyFBA.fba.double_knockouts(modeldata, reactions, media, biomass)
+    essential = {r for r in singles if not singles[r].growth}
+    synthetic_lethal = {p for p in doubles if not doubles[p].growth}
+
+By default every knockout is solved in this process. With more than one worker the knockouts are split across worker
+processes, each of which loads the model once. See PyFBA.fba.executor.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations
+
+import numpy as np
+
+import PyFBA
+from PyFBA import log_and_message
+from .executor import ModelDescription, _compound_key, _media_from_keys
+
+"""
+The largest flux that we count as no flux
+"""
+ZERO_FLUX = 1e-9
+
+# the model of a worker process. This is set once, when the worker starts.
+_worker = {}
+
+
+def _strip(result):
+    """
+    Just the status, value, and growth of a result, so it is cheap to send between processes
+    """
+    return PyFBA.fba.FBAResult(*result, seconds=result.seconds, backend=result.backend)
+
+
+def _screen(model, knockouts, options=None, keep_solution=False):
+    """
+    Test each knockout in a loaded model, and then switch all the reactions back on
+
+    :param model: the loaded model, with all the reactions switched on
+    :type model: PyFBA.fba.WarmStartModel
+    :param knockouts: the reactions to knock out in each test
+    :type knockouts: list of tuple
+    :param options: the solver options
+    :type options: PyFBA.lp.SolverOptions
+    :param keep_solution: keep the fluxes of each solution
+    :type keep_solution: bool
+    :return: the result of each test, in the same order as the knockouts
+    :rtype: list of PyFBA.fba.FBAResult
+    """
+
+    results = []
+    for ko in knockouts:
+        model.set_reactions(model.candidates.difference(ko))
+        result = model.run(options=options)
+        results.append(result if keep_solution else _strip(result))
+    model.restore()
+    return results
+
+
+def _init_worker(description, reactions_to_run, media_keys, biomass_equation, backend, verbose):
+    """
+    Load the model in a worker process. This is run once when the worker starts.
+    """
+
+    modeldata = description.load(verbose=verbose)
+    _worker['model'] = PyFBA.fba.WarmStartModel(modeldata, set(reactions_to_run), _media_from_keys(media_keys),
+                                                biomass_equation, backend=backend, verbose=verbose, pure=True)
+
+
+def _run_shard(job):
+    """
+    Test one shard of knockouts in a worker process
+
+    :param job: the knockouts, the solver options, and whether to keep the solutions
+    :type job: tuple
+    :rtype: list of PyFBA.fba.FBAResult
+    """
+    knockouts, options, keep_solution = job
+    return _screen(_worker['model'], knockouts, options, keep_solution)
+
+
+class KnockoutScreen:
+    """
+    A model that is loaded once, for testing many knockouts.
+
+    :ivar model: the loaded model. It is pure, so it does not change modeldata
+    :ivar wild_type: the result with no knockouts
+    :ivar workers: the number of worker processes
+    """
+
+    def __init__(self, modeldata, reactions_to_run, media, biomass_equation, workers=0, backend=None,
+                 options=None, description=None, verbose=False):
+        """
+        Load the model and solve the wild type
+
+        :param modeldata: the model seed object that includes compounds and reactions
+        :type modeldata: PyFBA.model_seed.ModelData
+        :param reactions_to_run: the reactions in the wild type
+        :type reactions_to_run: set
+        :param media: the media compounds
+        :type media: set
+        :param biomass_equation: the biomass equation
+        :type biomass_equation: PyFBA.metabolism.Reaction
+        :param workers: the number of worker processes. With 0 (the default) or 1 we do all the work in this process
+        :type workers: int
+        :param backend: the linear programming backend to use (e.g. glpk or highs)
+        :type backend: str
+        :param options: the solver options for every solve
+        :type options: PyFBA.lp.SolverOptions
+        :param description: (optional) how the workers should make the model. See PyFBA.fba.ModelDescription
+        :type description: PyFBA.fba.ModelDescription
+        :param verbose: more output
+        :type verbose: bool
+        """
+
+        self.workers = workers
+        self.options = options
+        self.verbose = verbose
+        # the model is pure, so the uptake and secretion reactions and the bounds are kept in its context and
+        # modeldata is left alone
+        self.model = PyFBA.fba.WarmStartModel(modeldata, reactions_to_run, media, biomass_equation, backend=backend,
+                                              verbose=verbose, pure=True)
+        self.wild_type = self.model.run(options=options)
+        self._pool = None
+        if workers > 1:
+            if description is None:
+                description = ModelDescription.from_modeldata(modeldata)
+            self._pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                             initargs=(description, tuple(sorted(self.model.candidates)),
+                                                       tuple(sorted(_compound_key(c) for c in media)),
+                                                       biomass_equation, backend, verbose))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        """
+        Stop the workers
+        """
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def flux(self, result, rid):
+        """
+        The flux through a reaction in a result from this model. The wild type reactions are the first columns, in
+        sorted order, so they are in the same columns in the results from the worker processes.
+
+        :param result: the result
+        :type result: PyFBA.fba.FBAResult
+        :param rid: the reaction id
+        :type rid: str
+        :rtype: float
+        """
+        return float(result.primals[self.model.index[rid]])
+
+    def _no_flux(self, result, rid):
+        """
+        Whether a reaction carries no flux in a result. A result without its solution (see _strip) does not tell us,
+        so we say that it may carry flux.
+
+        :param result: the result
+        :type result: PyFBA.fba.FBAResult
+        :param rid: the reaction id
+        :type rid: str
+        :rtype: bool
+        """
+        return len(result.primals) > 0 and abs(self.flux(result, rid)) <= ZERO_FLUX
+
+    def run(self, knockouts, keep_solution=False):
+        """
+        Test some knockouts
+
+        :param knockouts: the reactions to knock out in each test
+        :type knockouts: list of tuple
+        :param keep_solution: keep the fluxes of each solution
+        :type keep_solution: bool
+        :return: the result of each test, in the same order as the knockouts
+        :rtype: list of PyFBA.fba.FBAResult
+        """
+
+        knockouts = [tuple(ko) for ko in knockouts]
+        if self._pool is None or len(knockouts) < 2:
+            return _screen(self.model, knockouts, self.options, keep_solution)
+
+        shards = [s.tolist() for s in np.array_split(np.arange(len(knockouts)),
+                                                     min(len(knockouts), self.workers * 4))]
+        jobs = [([knockouts[i] for i in s], self.options, keep_solution) for s in shards]
+        results = []
+        for shard_results in self._pool.map(_run_shard, jobs):
+            results.extend(shard_results)
+        return results
+
+    def single_knockouts(self, reactions=None, skip_zero_flux=True, keep_solution=False):
+        """
+        Knock out each reaction on its own
+
+        :param reactions: the reactions to knock out. We use all the reactions in the wild type if not provided
+        :type reactions: list of str
+        :param skip_zero_flux: do not solve for reactions that carry no flux in the wild type. Their result is the wild
+        type result
+        :type skip_zero_flux: bool
+        :param keep_solution: keep the fluxes of each solution
+        :type keep_solution: bool
+        :return: a dict of reaction id and the result of knocking it out
+        :rtype: dict of str and PyFBA.fba.FBAResult
+        """
+
+        if reactions is None:
+            reactions = sorted(self.model.candidates)
+        missing = [r for r in reactions if r not in self.model.candidates]
+        if missing:
+            raise ValueError(f"Reactions {missing} are not in the model, so we can not knock them out")
+
+        results = {}
+        todo = []
+        for r in reactions:
+            if skip_zero_flux and abs(self.flux(self.wild_type, r)) <= ZERO_FLUX:
+                results[r] = self.wild_type
+            else:
+                todo.append(r)
+        for r, result in zip(todo, self.run([(r,) for r in todo], keep_solution=keep_solution)):
+            results[r] = result
+        log_and_message(f"Single knockouts: solved {len(todo)} of {len(reactions)}. "
+                        f"{sum(1 for r in results.values() if not r.growth)} are lethal", stderr=self.verbose)
+        return {r: results[r] for r in reactions}
+
+    def double_knockouts(self, singles, pairs=None, skip_zero_flux=True):
+        """
+        Knock out pairs of reactions. Pairs where either single knockout is lethal are left out.
+
+        :param singles: the single knockout results (see single_knockouts). We can only skip the pairs where one
+        reaction carries no flux when the other is knocked out if the results have their solutions
+        (keep_solution=True), so the pairs of results without solutions are always solved
+        :type singles: dict of str and PyFBA.fba.FBAResult
+        :param pairs: the pairs to test. We use every pair of reactions whose single knockouts grow if not provided
+        :type pairs: list of (str, str)
+        :param skip_zero_flux: do not solve for a pair if one reaction carries no flux when the other is knocked out
+        :type skip_zero_flux: bool
+        :return: a dict of the pair of reaction ids and the result of knocking them both out
+        :rtype: dict of (str, str) and PyFBA.fba.FBAResult
+        """
+
+        viable = [r for r in singles if singles[r].growth]
+        if pairs is None:
+            pairs = list(combinations(viable, 2))
+        else:
+            viable = set(viable)
+            pairs = [tuple(p) for p in pairs if p[0] in viable and p[1] in viable]
+
+        results = {}
+        todo = []
+        for a, b in pairs:
+            if skip_zero_flux and self._no_flux(singles[a], b):
+                results[(a, b)] = singles[a]
+            elif skip_zero_flux and self._no_flux(singles[b], a):
+                results[(a, b)] = singles[b]
+            else:
+                todo.append((a, b))
+        for p, result in zip(todo, self.run(todo)):
+            results[p] = result
+        log_and_message(f"Double knockouts: solved {len(todo)} of {len(pairs)} pairs. "
+                        f"{sum(1 for r in results.values() if not r.growth)} are synthetic lethal",
+                        stderr=self.verbose)
+        return {p: results[p] for p in pairs}
+
+
+def single_knockouts(modeldata, reactions_to_run, media, biomass_equation, reactions=None, skip_zero_flux=True,
+                     workers=0, backend=None, options=None, verbose=False):
+    """
+    Knock out each reaction on its own. See KnockoutScreen for the parameters.
+
+    :return: the wild type result, and a dict of reaction id and the result of knocking it out
+    :rtype: PyFBA.fba.FBAResult, dict of str and PyFBA.fba.FBAResult
+    """
+
+    with KnockoutScreen(modeldata, reactions_to_run, media, biomass_equation, workers=workers, backend=backend,
+                        options=options, verbose=verbose) as screen:
+        return screen.wild_type, screen.single_knockouts(reactions, skip_zero_flux)
+
+
+def double_knockouts(modeldata, reactions_to_run, media, biomass_equation, reactions=None, pairs=None,
+                     skip_zero_flux=True, workers=0, backend=None, options=None, verbose=False):
+    """
+    Knock out each reaction, and then each pair of reactions whose single knockouts grow. See KnockoutScreen for the
+    parameters.
+
+    :return: the wild type result, a dict of reaction id and the single knockout result, and a dict of the pair of
+    reaction ids and the double knockout result
+    :rtype: PyFBA.fba.FBAResult, dict of str and PyFBA.fba.FBAResult, dict of (str, str) and PyFBA.fba.FBAResult
+    """
+
+    with KnockoutScreen(modeldata, reactions_to_run, media, biomass_equation, workers=workers, backend=backend,
+                        options=options, verbose=verbose) as screen:
+        singles = screen.single_knockouts(reactions, skip_zero_flux, keep_solution=True)
+        return screen.wild_type, singles, screen.double_knockouts(singles, pairs, skip_zero_flux)
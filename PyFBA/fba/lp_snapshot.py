@@ -0,0 +1,143 @@
+"""
+Save a fully bounded FBA problem to disk, and reload it rather than rebuilding it.
+
+Many pipelines run the same model (the same reactions, media, and biomass equation) again and again from the command
+line. We write the problem to an MPS file whose name is a hash of everything that went into it, and next time
+we just read that file into the solver, skipping create_stoichiometric_matrix and reaction_bounds.
+
+The hash is cheap to calculate, so a reload does not need reaction_bounds either. It includes the id and direction of
+every reaction, any bounds that have been changed from the bounds that the direction gives (see
+PyFBA.fba.model_cache.changed_bounds), the media, and the biomass equation. It does not include the stoichiometry of
+the reactions, so if you change the biochemistry itself (e.g. a new release of the ModelSEED database) use a new
+snapshot directory.
+
+When a problem is loaded from a snapshot it is not built, so run_fba does not add the uptake and secretion reactions to
+modeldata or write the bounds onto the reactions, as it does when it builds the problem. Use pure=True if you want
+modeldata to look the same whether or not there was a snapshot.
+"""
+
+import hashlib
+import os
+
+import PyFBA
+from PyFBA import log_and_message
+
+"""
+Change this if the way we build the problem changes, so that old snapshots are not used
+"""
+SNAPSHOT_VERSION = 2
+
+
+def _reaction_fingerprint(rxn):
+    """
+    A string that describes everything about a reaction that goes into the problem
+
+    :param rxn: the reaction
+    :type rxn: PyFBA.metabolism.Reaction
+    :return: the fingerprint
+    :rtype: str
+    """
+
+    left = sorted(f"{c}*{rxn.get_left_compound_abundance(c)}" for c in rxn.left_compounds)
+    right = sorted(f"{c}*{rxn.get_right_compound_abundance(c)}" for c in rxn.right_compounds)
+    bounds = (rxn.lower_bound, rxn.upper_bound)
+    return f"{rxn.id}|{rxn.direction}|{bounds}|" + ";".join(left) + "=>" + ";".join(right)
+
+
+def snapshot_key(modeldata, reactions_to_run, media, biomass_equation, uptake_secretion=None):
+    """
+    The content hash of an FBA problem. This does not calculate the bounds of the reactions or look at their
+    stoichiometry, so it is cheap.
+
+    :param modeldata: the model seed object that includes compounds and reactions
+    :type modeldata: PyFBA.model_seed.ModelData
+    :param reactions_to_run: the reactions to run
+    :type reactions_to_run: set
+    :param media: An array of compound.Compound objects representing the media
+    :type media: set
+    :param biomass_equation: The biomass_equation equation
+    :type biomass_equation: PyFBA.metabolism.Reaction
+    :param uptake_secretion: the uptake and secretion reactions, if they are provided rather than calculated
+    :type uptake_secretion: dict of Reaction
+    :return: the sha256 hex digest
+    :rtype: str
+    """
+
+    reactions = sorted(r for r in reactions_to_run if 'biomass' not in r.lower())
+    codes = [PyFBA.fba.bounds.direction_code(modeldata.reactions[r].direction) for r in reactions]
+
+    h = hashlib.sha256()
+    h.update(f"PyFBA snapshot version {SNAPSHOT_VERSION}\n".encode())
+    h.update(("reactions:" + ";".join(f"{r}:{c}" for r, c in zip(reactions, codes)) + "\n").encode())
+    # reactions remember the bounds from an fba, so we only use the bounds that have been changed from those
+    h.update(("bounds:" + PyFBA.fba.model_cache.changed_bounds(modeldata, reactions) + "\n").encode())
+    h.update(("media:" + ";".join(sorted(str(c) for c in media)) + "\n").encode())
+    h.update(("biomass:" + _reaction_fingerprint(biomass_equation) + "\n").encode())
+    if uptake_secretion:
+        for r in sorted(uptake_secretion):
+            h.update(("upsr:" + _reaction_fingerprint(uptake_secretion[r]) + "\n").encode())
+    return h.hexdigest()
+
+
+def snapshot_file(snapshot_dir, key):
+    """
+    The MPS file for a snapshot
+
+    :param snapshot_dir: the directory that holds the snapshots
+    :type snapshot_dir: str
+    :param key: the snapshot key
+    :type key: str
+    :return: the path to the file
+    :rtype: str
+    """
+    return os.path.join(snapshot_dir, f"{key}.mps")
+
+
+def load_snapshot(snapshot_dir, key, session, verbose=False):
+    """
+    Load a snapshot into the solver if we have one
+
+    :param snapshot_dir: the directory that holds the snapshots
+    :type snapshot_dir: str
+    :param key: the snapshot key
+    :type key: str
+    :param session: the linear programming session to load the problem into
+    :type session: PyFBA.lp.LPBackend
+    :param verbose: more output
+    :type verbose: bool
+    :return: True if the snapshot was loaded
+    :rtype: bool
+    """
+
+    mpsfile = snapshot_file(snapshot_dir, key)
+    if not os.path.exists(mpsfile):
+        return False
+    log_and_message(f"Loading the problem from {mpsfile}", stderr=verbose)
+    session.read_mps(mpsfile, verbose=verbose)
+    return True
+
+
+def save_snapshot(snapshot_dir, key, session, verbose=False):
+    """
+    Save the problem that is loaded in the solver as a snapshot. We write to a temporary file and rename it, so
+    several processes can share a snapshot directory.
+
+    :param snapshot_dir: the directory that holds the snapshots
+    :type snapshot_dir: str
+    :param key: the snapshot key
+    :type key: str
+    :param session: the linear programming session that holds the problem
+    :type session: PyFBA.lp.LPBackend
+    :param verbose: more output
+    :type verbose: bool
+    :return: the file that we wrote
+    :rtype: str
+    """
+
+    os.makedirs(snapshot_dir, exist_ok=True)
+    mpsfile = snapshot_file(snapshot_dir, key)
+    tmpfile = f"{mpsfile}.{os.getpid()}.tmp"
+    session.write_mps(tmpfile)
+    os.replace(tmpfile, mpsfile)
+    log_and_message(f"Saved the problem to {mpsfile}", stderr=verbose)
+    return mpsfile
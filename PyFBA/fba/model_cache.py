@@ -0,0 +1,354 @@
+"""
+An in-memory cache of compiled FBA models.
+
+Gap filling and calculate_precision_recall run the same model (the same reactions, media, and biomass equation)
+many times, for example when the base reactions are retested in each round of a bisection. Each time we used to build
+the stoichiometric matrix and calculate the bounds again. With a cache, run_fba builds the model once, keeps the
+compounds, reactions, uptake and secretion reactions, matrix, bounds, and objective, and the next time just loads them
+into the solver.
+
+The cache is a least recently used (LRU) cache, so once it is full the model that we have not used for the longest
+time is dropped. e.g.
+
+    cache = PyFBA.fba.ModelCache(maxsize=256)
+    status, value, growth = PyFBA.fba.run_fba(modeldata, reactions, media, biomass, cache=cache)
+    print(cache.stats())
+
+The key is a fingerprint of the reaction ids and any bounds that are set on them, the media, and the biomass equation
+(and any uptake and secretion reactions you provide). It does not include the stoichiometry of each reaction, so if you
+change the compounds of a reaction in modeldata in place call cache.clear().
+"""
+
+import copy
+import hashlib
+import threading
+from collections import ChainMap, OrderedDict
+
+import numpy as np
+
+import PyFBA
+from PyFBA import log_and_message
+
+"""
+The number of models that the default cache holds
+"""
+DEFAULT_CACHE_SIZE = 128
+
+_default_cache = None
+
+
+def _stoichiometry(rxn):
+    """
+    A string of the compounds and abundances on each side of a reaction
+
+    :param rxn: the reaction
+    :type rxn: PyFBA.metabolism.Reaction
+    :rtype: str
+    """
+
+    left = sorted(f"{c}*{rxn.get_left_compound_abundance(c)}" for c in rxn.left_compounds)
+    right = sorted(f"{c}*{rxn.get_right_compound_abundance(c)}" for c in rxn.right_compounds)
+    return ";".join(left) + "=>" + ";".join(right)
+
+
+def changed_bounds(modeldata, reactions_to_run):
+    """
+    The bounds that are set on the reactions and that are different from the bounds that their direction gives. The
+    bounds can be changed in place (e.g. to knock a reaction out), but run_fba writes the bounds from the direction
+    back onto the reactions, so these are the only bounds that tell two models apart.
+
+    :param modeldata: the model seed object that includes compounds and reactions
+    :type modeldata: PyFBA.model_seed.ModelData
+    :param reactions_to_run: the reactions to run
+    :type reactions_to_run: set
+    :return: the reaction ids and their bounds, as a string
+    :rtype: str
+    """
+
+    codes = np.arange(PyFBA.fba.bounds.UNKNOWN_DIRECTION + 1)
+    default_lower, default_upper = PyFBA.fba.bounds.bounds_from_directions(codes)
+    bounds = []
+    for r in sorted(reactions_to_run):
+        rxn = modeldata.reactions.get(r)
+        if rxn is None or rxn.lower_bound is None or rxn.upper_bound is None:
+            continue
+        code = PyFBA.fba.bounds.direction_code(rxn.direction)
+        if (rxn.lower_bound, rxn.upper_bound) != (default_lower[code], default_upper[code]):
+            bounds.append(f"{r}:{rxn.lower_bound}:{rxn.upper_bound}")
+    return ";".join(bounds)
+
+
+def model_fingerprint(modeldata, reactions_to_run, media, biomass_equation, uptake_secretion=None):
+    """
+    A stable fingerprint of the model that run_fba would build. This only uses the reaction ids and the bounds that
+    have been changed, so it is cheap to calculate.
+
+    :param modeldata: the model seed object that includes compounds and reactions
+    :type modeldata: PyFBA.model_seed.ModelData
+    :param reactions_to_run: the reactions to run
+    :type reactions_to_run: set
+    :param media: the media compounds
+    :type media: set
+    :param biomass_equation: the biomass equation
+    :type biomass_equation: PyFBA.metabolism.Reaction
+    :param uptake_secretion: the uptake and secretion reactions, if they are provided rather than calculated
+    :type uptake_secretion: dict of Reaction
+    :return: the sha256 hex digest
+    :rtype: str
+    """
+
+    h = hashlib.sha256()
+    # models from different ModelData objects can have the same reaction ids but different reactions
+    h.update(f"modeldata:{modeldata.token}\n".encode())
+    h.update(("reactions:" + ";".join(sorted(reactions_to_run)) + "\n").encode())
+    h.update(("bounds:" + changed_bounds(modeldata, reactions_to_run) + "\n").encode())
+    h.update(("media:" + ";".join(sorted(str(c) for c in media)) + "\n").encode())
+    h.update(("biomass:" + _stoichiometry(biomass_equation) + "\n").encode())
+    if uptake_secretion:
+        for r in sorted(uptake_secretion):
+            h.update((f"upsr:{r}:" + _stoichiometry(uptake_secretion[r]) + "\n").encode())
+    return h.hexdigest()
+
+
+class CompiledModel:
+    """
+    Everything that we need to load a model into the solver without building it again.
+
+    :ivar cp: the sorted compounds, one per row
+    :ivar rc: the reaction ids, one per column, with the uptake and secretion reactions and the biomass equation last
+    :ivar uptake_secretion: the uptake and secretion reactions, by id
+    :ivar rbvals: the dict of reaction id and (lower, upper) bounds
+    :ivar problem: the problem as a dict (see PyFBA.lp.mps)
+    :ivar presolve: a copy of the presolve that removed the dead ends from the model, or None. It is never the
+    caller's presolve, which may be used again to prune a different model
+    """
+
+    def __init__(self, cp, rc, uptake_secretion, rbvals, problem=None, presolve=None):
+        """
+        Store a compiled model
+
+        :param cp: the compounds in the model
+        :type cp: list
+        :param rc: the reactions in the model
+        :type rc: list
+        :param uptake_secretion: the uptake and secretion reactions
+        :type uptake_secretion: dict of Reaction
+        :param rbvals: the reaction bounds
+        :type rbvals: dict
+        :param problem: the problem that was loaded into the solver. See PyFBA.lp.LPBackend.get_problem
+        :type problem: dict
+        :param presolve: (optional) the presolve that removed the dead ends from the model
+        :type presolve: PyFBA.fba.DeadEndPresolve
+        """
+
+        self.cp = cp
+        self.rc = rc
+        self.uptake_secretion = uptake_secretion
+        self.rbvals = rbvals
+        self.problem = problem
+        self.presolve = presolve
+
+    def load(self, modeldata, session, verbose=False, pure=False):
+        """
+        Load the model into the solver, and put the uptake and secretion reactions and the bounds back into modeldata,
+        just as create_stoichiometric_matrix and reaction_bounds do (unless this is a pure run).
+
+        :param modeldata: the model seed object that includes compounds and reactions
+        :type modeldata: PyFBA.model_seed.ModelData
+        :param session: the linear programming session to load the model into
+        :type session: PyFBA.lp.LPBackend
+        :param verbose: more output
+        :type verbose: bool
+        :param pure: leave modeldata alone
+        :type pure: bool
+        :return: void
+        :rtype: void
+        """
+
+        p = self.problem
+        session.load_sparse(p['triplets'], p['nrows'], p['ncols'], p['row_names'], p['col_names'], verbose=verbose)
+        session.row_bounds(p['row_bounds'])
+        session.col_bounds(p['col_bounds'])
+        session.objective_coefficients(p['objective'])
+        if pure:
+            return
+
+        modeldata.reactions.update(self.uptake_secretion)
+        for r in self.rc:
+            if r in modeldata.reactions:
+                modeldata.reactions[r].lower_bound, modeldata.reactions[r].upper_bound = self.rbvals[r]
+
+
+class ModelCache:
+    """
+    A least recently used cache of CompiledModel objects.
+
+    :ivar hits: the number of times we found a model in the cache
+    :ivar misses: the number of times we did not
+    """
+
+    def __init__(self, maxsize=DEFAULT_CACHE_SIZE):
+        """
+        Create an empty cache
+
+        :param maxsize: the most models to keep. Use 0 to disable the cache
+        :type maxsize: int
+        """
+
+        if maxsize < 0:
+            raise ValueError(f"The size of the cache must be at least 0, not {maxsize}")
+        self._maxsize = maxsize
+        self._models = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._models)
+
+    def __contains__(self, key):
+        return key in self._models
+
+    @property
+    def maxsize(self):
+        """
+        The most models that we keep
+        """
+        return self._maxsize
+
+    @maxsize.setter
+    def maxsize(self, maxsize):
+        """
+        Change the size of the cache, dropping the least recently used models if there are too many
+
+        :param maxsize: the most models to keep
+        :type maxsize: int
+        """
+        if maxsize < 0:
+            raise ValueError(f"The size of the cache must be at least 0, not {maxsize}")
+        with self._lock:
+            self._maxsize = maxsize
+            self._evict()
+
+    def _evict(self):
+        """
+        Drop the least recently used models until the cache is small enough. Call with the lock held.
+        """
+        while len(self._models) > self._maxsize:
+            self._models.popitem(last=False)
+
+    def get(self, key):
+        """
+        Get a model from the cache, and count the hit or miss
+
+        :param key: the model fingerprint
+        :type key: str
+        :return: the model, or None if it is not in the cache
+        :rtype: CompiledModel
+        """
+
+        with self._lock:
+            model = self._models.get(key)
+            if model is None:
+                self.misses += 1
+                return None
+            self._models.move_to_end(key)
+            self.hits += 1
+            return model
+
+    def put(self, key, model):
+        """
+        Add a model to the cache
+
+        :param key: the model fingerprint
+        :type key: str
+        :param model: the compiled model
+        :type model: CompiledModel
+        :return: void
+        :rtype: void
+        """
+
+        with self._lock:
+            self._models[key] = model
+            self._models.move_to_end(key)
+            self._evict()
+
+    def clear(self):
+        """
+        Forget all the models and reset the counters
+        """
+        with self._lock:
+            self._models.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """
+        How well is the cache working?
+
+        :return: a dict of hits, misses, size, and maxsize
+        :rtype: dict
+        """
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._models), 'maxsize': self._maxsize}
+
+
+def default_cache():
+    """
+    The cache that run_fba uses when you pass cache=True
+
+    :return: the shared cache
+    :rtype: ModelCache
+    """
+
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ModelCache()
+    return _default_cache
+
+
+def build_model(modeldata, reactions_to_run, media, biomass_equation, uptake_secretion=None, verbose=False,
+                session=None, keep_problem=True, pure=False, presolve=None):
+    """
+    Build a model, load it into the solver, and return everything we need to load it again.
+
+    :param modeldata: the model seed object that includes compounds and reactions
+    :type modeldata: PyFBA.model_seed.ModelData
+    :param reactions_to_run: the reactions to run
+    :type reactions_to_run: set
+    :param media: the media compounds
+    :type media: set
+    :param biomass_equation: the biomass equation
+    :type biomass_equation: PyFBA.metabolism.Reaction
+    :param uptake_secretion: the uptake and secretion reactions, if they are provided rather than calculated
+    :type uptake_secretion: dict of Reaction
+    :param verbose: more output
+    :type verbose: bool
+    :param session: the linear programming session to load the model into
+    :type session: PyFBA.lp.LPBackend
+    :param keep_problem: copy the problem back out of the solver so that the model can be cached
+    :type keep_problem: bool
+    :param pure: leave modeldata alone. The uptake and secretion reactions and the bounds are only in the compiled model
+    :type pure: bool
+    :param presolve: (optional) remove the dead ends from the model before it is loaded. See PyFBA.fba.dead_ends
+    :type presolve: PyFBA.fba.DeadEndPresolve
+    :return: the compiled model
+    :rtype: CompiledModel
+    """
+
+    cp, rc, upsr = PyFBA.fba.create_stoichiometric_matrix(reactions_to_run, modeldata, media, biomass_equation,
+                                                          uptake_secretion, verbose=verbose, session=session,
+                                                          pure=pure, presolve=presolve)
+    reactions = ChainMap(upsr, modeldata.reactions) if pure else modeldata.reactions
+    lower, upper = PyFBA.fba.reaction_bounds_array(modeldata, rc, media, verbose=verbose, reactions=reactions)
+    session.set_col_bounds_array(lower, upper)
+    rbvals = dict(zip(rc, zip(lower.tolist(), upper.tolist())))
+    if not pure:
+        # reaction_bounds has always stored the bounds on the reactions
+        for r in rc:
+            if r in modeldata.reactions:
+                modeldata.reactions[r].lower_bound, modeldata.reactions[r].upper_bound = rbvals[r]
+    PyFBA.fba.compound_bounds(cp, session=session)
+    log_and_message(f"Compiled a model of {len(cp)} compounds and {len(rc)} reactions", stderr=verbose)
+    if presolve is not None:
+        presolve = copy.copy(presolve)
+    return CompiledModel(cp, rc, upsr, rbvals, session.get_problem() if keep_problem else None, presolve)
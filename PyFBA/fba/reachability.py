@@ -0,0 +1,179 @@
+"""
+A topological test of whether a model can possibly grow, before we load it into the solver.
+
+Many of the models that we test while gap filling do not grow for a simple reason: one of the compounds that the
+biomass equation needs can not be made from the media with the reactions in the model. We can find that out from the
+reaction to compound incidence alone, without a simplex solve.
+
+Network expansion (the scope of the media) is the usual way to ask which compounds can be made: start with the media
+and keep adding the products of every reaction whose substrates we already have. That is not safe for flux balance
+analysis, because the LP can run autocatalytic cycles (e.g. ATP is needed to make ATP) that network expansion never
+starts. So we run the expansion the other way round. We start with every compound, and repeatedly remove each
+reaction direction that needs a compound that nothing left can make, and each compound that no reaction direction left
+(and no uptake from the media) makes. What is left is an over estimate of the compounds that can be made at steady
+state, so if the biomass equation needs a compound that is not left, the model can not grow, and the LP would say
+the same. Each pass is a few numpy operations on bitsets over the compound table (see PyFBA.fba.interning). e.g.
+
+    missing = PyFBA.fba.reachability.unreachable_biomass(modeldata, reactions, media, biomass)
+    if missing:
+        print(f"We can not grow because we can not make {missing}")
+
+run_fba(..., reachability=True) and run_fba_batch(..., reachability=True) use this to skip the solve for models that
+can not grow.
+"""
+
+import numpy as np
+
+import PyFBA
+from PyFBA import log_and_message
+
+
+def _directed_entries(modeldata, reactions_to_run, media, biomass_equation=None, uptake_secretion=None):
+    """
+    The substrates and products of each direction that each reaction can run in, as rows of the compound table
+
+    :return: the compound table, the substrate rows and their reaction directions, the product rows and their reaction
+    directions, the number of reaction directions, the rows of the compounds that can be taken up, and the direction
+    of the biomass equation (or -1)
+    :rtype: tuple
+    """
+
+    um = modeldata.universal_matrix()
+    table = um.compound_table
+    rids = sorted(r for r in reactions_to_run if 'biomass' not in r.lower())
+    compiled = [r for r in rids if um.is_current(r, modeldata.reactions[r])]
+    rows, cols, vals = um.column_slice(compiled)
+    rows, cols, vals = [rows], [cols], [vals]
+    ncols = len(compiled)
+    for r in rids:
+        if um.is_current(r, modeldata.reactions[r]):
+            continue
+        entries = PyFBA.fba.universal_matrix.reaction_entries(modeldata.reactions[r])
+        rows.append(np.array([table.intern(c) for c in entries], dtype=np.int64))
+        cols.append(np.full(len(entries), ncols, dtype=np.int64))
+        vals.append(np.array(list(entries.values()), dtype=float))
+        compiled.append(r)
+        ncols += 1
+    lower, upper = PyFBA.fba.reaction_bounds_array(modeldata, compiled, media)
+
+    biomass = -1
+    if biomass_equation is not None:
+        entries = PyFBA.fba.universal_matrix.reaction_entries(biomass_equation)
+        rows.append(np.array([table.intern(c) for c in entries], dtype=np.int64))
+        cols.append(np.full(len(entries), ncols, dtype=np.int64))
+        vals.append(np.array(list(entries.values()), dtype=float))
+        # the biomass equation only runs forwards
+        lower = np.append(lower, 0.0)
+        upper = np.append(upper, 1000.0)
+        biomass = ncols
+        ncols += 1
+    rows, cols, vals = np.concatenate(rows), np.concatenate(cols), np.concatenate(vals)
+
+    # the forward direction of column j is j, and the reverse direction is ncols + j. A reverse entry has the opposite
+    # sign, so the substrates of a direction are always its negative entries
+    forward = upper[cols] > 0
+    reverse = lower[cols] < 0
+    rows = np.concatenate([rows[forward], rows[reverse]])
+    dirs = np.concatenate([cols[forward], cols[reverse] + ncols])
+    vals = np.concatenate([vals[forward], -vals[reverse]])
+    substrate = vals < 0
+
+    if uptake_secretion:
+        sources = [table.intern(c) for rxn in uptake_secretion.values()
+                   if rxn.lower_bound is None or rxn.lower_bound < 0 for c in rxn.left_compounds]
+    else:
+        sources = [table.intern(c) for c in media if PyFBA.fba.external_reactions.is_boundary_compound(c)]
+    return (table, rows[substrate], dirs[substrate], rows[~substrate], dirs[~substrate], 2 * ncols,
+            np.array(sources, dtype=np.int64), biomass)
+
+
+def _fixed_point(ncompounds, substrate_rows, substrate_dirs, product_rows, product_dirs, ndirs, sources):
+    """
+    Remove the reaction directions that need a compound that can not be made, and the compounds that can not be made,
+    until nothing changes
+
+    :return: the compounds that can be made, and the reaction directions that can run
+    :rtype: numpy.ndarray, numpy.ndarray
+    """
+
+    producible = np.ones(ncompounds, dtype=bool)
+    while True:
+        alive = np.bincount(substrate_dirs[~producible[substrate_rows]], minlength=ndirs) == 0
+        made = np.zeros(ncompounds, dtype=bool)
+        made[sources] = True
+        made[product_rows[alive[product_dirs]]] = True
+        if np.array_equal(made, producible):
+            return producible, alive
+        producible = made
+
+
+def producible(modeldata, reactions_to_run, media, biomass_equation=None, uptake_secretion=None):
+    """
+    The compounds that may be made at steady state from the media with these reactions. Compounds that are not in the
+    bitset can certainly not be made.
+
+    :param modeldata: the model seed object that includes compounds and reactions
+    :type modeldata: PyFBA.model_seed.ModelData
+    :param reactions_to_run: the reactions to run
+    :type reactions_to_run: set
+    :param media: the media compounds
+    :type media: set
+    :param biomass_equation: (optional) the biomass equation, which makes some compounds (e.g. ADP) too
+    :type biomass_equation: PyFBA.metabolism.Reaction
+    :param uptake_secretion: (optional) the uptake and secretion reactions, if they are provided rather than
+    calculated from the media. The compounds of the ones that can run backwards can be taken up.
+    :type uptake_secretion: dict of Reaction
+    :return: a bitset over the compound table (see ModelData.compound_table)
+    :rtype: numpy.ndarray
+    """
+
+    table, srows, sdirs, prows, pdirs, ndirs, sources, biomass = _directed_entries(modeldata, reactions_to_run, media,
+                                                                                   biomass_equation, uptake_secretion)
+    made, alive = _fixed_point(len(table), srows, sdirs, prows, pdirs, ndirs, sources)
+    return made
+
+
+def unreachable_biomass(modeldata, reactions_to_run, media, biomass_equation, uptake_secretion=None, verbose=False):
+    """
+    The compounds that the biomass equation needs but that can not be made. If there are any, the model can not grow.
+
+    :param modeldata: the model seed object that includes compounds and reactions
+    :type modeldata: PyFBA.model_seed.ModelData
+    :param reactions_to_run: the reactions to run
+    :type reactions_to_run: set
+    :param media: the media compounds
+    :type media: set
+    :param biomass_equation: the biomass equation
+    :type biomass_equation: PyFBA.metabolism.Reaction
+    :param uptake_secretion: (optional) the uptake and secretion reactions, if they are provided rather than
+    calculated from the media
+    :type uptake_secretion: dict of Reaction
+    :param verbose: more output
+    :type verbose: bool
+    :return: the biomass compounds that can not be made. An empty list means that we need the LP to tell whether the
+    model grows
+    :rtype: list of PyFBA.metabolism.CompoundWithLocation
+    """
+
+    table, srows, sdirs, prows, pdirs, ndirs, sources, biomass = _directed_entries(modeldata, reactions_to_run, media,
+                                                                                   biomass_equation, uptake_secretion)
+    made, alive = _fixed_point(len(table), srows, sdirs, prows, pdirs, ndirs, sources)
+    missing = sorted(table.from_bitset(table.bitset(biomass_equation.left_compounds) & ~made), key=str)
+    if missing:
+        log_and_message(f"The model can not grow because we can not make {len(missing)} biomass compounds, e.g. "
+                        f"{missing[0]}", stderr=verbose)
+    return missing
+
+
+def no_growth(feasibility=False, fingerprint=None):
+    """
+    The result of a model that can not grow, without solving it. This is what the LP would say: the biomass flux is
+    zero, which is optimal, or in feasibility mode there is no feasible point.
+
+    :param feasibility: the result of a feasibility solve (see PyFBA.fba.feasibility)
+    :type feasibility: bool
+    :param fingerprint: the fingerprint of the model, or a callable that calculates it
+    :type fingerprint: str or callable
+    :rtype: PyFBA.fba.FBAResult
+    """
+    return PyFBA.fba.FBAResult('nofeas' if feasibility else 'opt', 0.0, False, fingerprint=fingerprint)
@@ -0,0 +1,189 @@
+"""
+The result of one run of run_fba.
+
+run_fba has always returned (status, value, growth), and an FBAResult is still that tuple, so
+
+    status, value, growth = PyFBA.fba.run_fba(modeldata, reactions, media, biomass)
+
+works as it always has. It also keeps a copy of the solution, taken as soon as the solver finishes, so you can look at
+it after the session has solved something else:
+
+    result = PyFBA.fba.run_fba(modeldata, reactions, media, biomass)
+    flux = result.flux('rxn00001')
+    prices = result.shadow_prices
+
+The primals and duals are kept as numpy arrays, and the column and row names are the tuples that the session caches
+(see PyFBA.lp.LPBackend.cached_col_names), so every result from the same loaded model shares one copy of the names.
+The dicts of fluxes and shadow prices, and the fingerprint of the model, are only made when you ask for them. Pickling a
+result (e.g. to send it back from another process) just sends the arrays and the names.
+"""
+
+import numpy as np
+
+
+class FBAResult(tuple):
+    """
+    The (status, value, growth) of an fba, with the solution.
+
+    :ivar col_names: the name of each column (reaction), shared with the session and the other results of this model
+    :ivar primals: the flux through each column, in the same order as col_names
+    :ivar row_names: the name of each row (compound)
+    :ivar duals: the dual (shadow price) of each row, in the same order as row_names
+    :ivar seconds: how long the solve took
+    :ivar backend: the name of the linear programming backend that solved the model
+    """
+
+    def __new__(cls, status, value, growth, col_names=(), primals=None, row_names=(), duals=None, seconds=None,
+                backend=None, fingerprint=None):
+        """
+        Keep the result of a solve
+
+        :param status: which type of linear resolution
+        :type status: str
+        :param value: the value of the objective function
+        :type value: float
+        :param growth: whether the model grew
+        :type growth: bool
+        :param col_names: the name of each column
+        :type col_names: tuple of str
+        :param primals: the primal of each column
+        :type primals: numpy.ndarray
+        :param row_names: the name of each row
+        :type row_names: tuple of str
+        :param duals: the dual of each row
+        :type duals: numpy.ndarray
+        :param seconds: how long the solve took
+        :type seconds: float
+        :param backend: the name of the backend
+        :type backend: str
+        :param fingerprint: the fingerprint of the model (see PyFBA.fba.model_cache.model_fingerprint), or a callable
+        that returns it, so that we only calculate it if someone asks
+        :type fingerprint: str or callable
+        """
+
+        self = super().__new__(cls, (status, value, growth))
+        self.col_names = col_names
+        self.primals = np.zeros(len(col_names)) if primals is None else primals
+        self.row_names = row_names
+        self.duals = np.zeros(len(row_names)) if duals is None else duals
+        self.seconds = seconds
+        self.backend = backend
+        self._fingerprint = fingerprint
+        self._fluxes = None
+        self._shadow_prices = None
+        return self
+
+    @classmethod
+    def from_session(cls, session, status, value, growth, seconds=None, fingerprint=None):
+        """
+        Copy the solution out of a session that has just been solved
+
+        :param session: the linear programming session
+        :type session: PyFBA.lp.LPBackend
+        :param status: which type of linear resolution
+        :type status: str
+        :param value: the value of the objective function
+        :type value: float
+        :param growth: whether the model grew
+        :type growth: bool
+        :param seconds: how long the solve took
+        :type seconds: float
+        :param fingerprint: the fingerprint of the model, or a callable that returns it
+        :type fingerprint: str or callable
+        :return: the result
+        :rtype: FBAResult
+        """
+
+        return cls(status, value, growth, session.cached_col_names(), session.col_primal_array(),
+                   session.cached_row_names(), session.row_dual_array(), seconds, session.name, fingerprint)
+
+    def __getnewargs__(self):
+        return tuple(self)
+
+    def __getstate__(self):
+        """
+        Only the arrays and the names are pickled. We calculate the fingerprint now because the callable refers to the
+        model, and we make the dicts again if they are needed.
+        """
+        state = self.__dict__.copy()
+        state['_fingerprint'] = self.fingerprint
+        state['_fluxes'] = None
+        state['_shadow_prices'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+
+    def __repr__(self):
+        return f"FBAResult(status={self.status!r}, value={self.value!r}, growth={self.growth!r})"
+
+    @property
+    def status(self):
+        """
+        Which type of linear resolution
+        """
+        return self[0]
+
+    @property
+    def value(self):
+        """
+        The value of the objective function
+        """
+        return self[1]
+
+    @property
+    def growth(self):
+        """
+        Whether the model grew
+        """
+        return self[2]
+
+    @property
+    def fluxes(self):
+        """
+        The flux through each reaction
+
+        :return: a dict of reaction id and flux
+        :rtype: dict of str and float
+        """
+        if self._fluxes is None:
+            self._fluxes = dict(zip(self.col_names, self.primals.tolist()))
+        return self._fluxes
+
+    @property
+    def shadow_prices(self):
+        """
+        The shadow price of each compound
+
+        :return: a dict of row name and dual
+        :rtype: dict of str and float
+        """
+        if self._shadow_prices is None:
+            self._shadow_prices = dict(zip(self.row_names, self.duals.tolist()))
+        return self._shadow_prices
+
+    def flux(self, rid):
+        """
+        The flux through one reaction. This does not need the whole dict of fluxes.
+
+        :param rid: the reaction id
+        :type rid: str
+        :rtype: float
+        """
+        if self._fluxes is not None:
+            return self._fluxes[rid]
+        try:
+            return float(self.primals[self.col_names.index(rid)])
+        except ValueError:
+            raise KeyError(rid)
+
+    @property
+    def fingerprint(self):
+        """
+        The fingerprint of the model that was solved. See PyFBA.fba.model_cache.model_fingerprint
+
+        :rtype: str
+        """
+        if callable(self._fingerprint):
+            self._fingerprint = self._fingerprint()
+        return self._fingerprint
@@ -0,0 +1,96 @@
+"""
+The state of a single FBA run.
+
+By default run_fba adds the uptake and secretion reactions to modeldata.reactions and writes the bounds that it
+calculates back onto the Reaction objects, so you have to call remove_uptake_and_secretion_reactions between runs,
+and two runs can not share a ModelData object at the same time.
+
+If you pass run_fba a context (or pure=True) it leaves modeldata alone: the uptake and secretion reactions, the bounds,
+the compounds and reactions in the matrix, and the linear programming session are kept in the context instead. e.g.
+
+    context = PyFBA.fba.FBAContext()
+    status, value, growth = PyFBA.fba.run_fba(modeldata, reactions, media, biomass, context=context)
+    fluxes = context.fluxes()
+
+If you do not give it a session, a pure run gets a new session of its own, so several runs can go at once in different
+threads.
+"""
+
+from collections import ChainMap
+
+
+class FBAContext:
+    """
+    Everything that one run of run_fba creates.
+
+    :ivar modeldata: the model seed object that the run used
+    :ivar session: the linear programming session that holds the model
+    :ivar cp: the compounds in the matrix, one per row
+    :ivar rc: the reactions in the matrix, one per column
+    :ivar uptake_secretion: the uptake and secretion reactions for this run, by id
+    :ivar rbvals: the dict of reaction id and (lower, upper) bounds for this run
+    :ivar status: the status of the solution
+    :ivar value: the value of the objective function
+    :ivar growth: whether the model grew
+    :ivar result: the FBAResult of the run
+    """
+
+    def __init__(self, session=None):
+        """
+        Start an empty context
+
+        :param session: (optional) the linear programming session to run the fba in
+        :type session: PyFBA.lp.LPBackend
+        """
+
+        self.modeldata = None
+        self.session = session
+        self.cp = []
+        self.rc = []
+        self.uptake_secretion = {}
+        self.rbvals = {}
+        self.status = None
+        self.value = None
+        self.growth = None
+        self.result = None
+
+    @property
+    def reactions(self):
+        """
+        All the reactions that this run knows about: the uptake and secretion reactions for this run, and the reactions
+        in modeldata. Changes are written to the uptake and secretion reactions, not to modeldata.
+
+        :rtype: collections.ChainMap
+        """
+        if self.modeldata is None:
+            return ChainMap(self.uptake_secretion)
+        return ChainMap(self.uptake_secretion, self.modeldata.reactions)
+
+    def lower_bound(self, rid):
+        """
+        The lower bound that this run used for a reaction
+
+        :param rid: the reaction id
+        :type rid: str
+        :rtype: float
+        """
+        return self.rbvals[rid][0]
+
+    def upper_bound(self, rid):
+        """
+        The upper bound that this run used for a reaction
+
+        :param rid: the reaction id
+        :type rid: str
+        :rtype: float
+        """
+        return self.rbvals[rid][1]
+
+    def fluxes(self):
+        """
+        The reaction fluxes from the solved model
+
+        :return: a dict of reaction id and flux
+        :rtype: dict of str and float
+        """
+        return self.session.col_primal_hash()
@@ -1,8 +1,13 @@
+import copy
+import time
+
 from PyFBA import lp, log_and_message
 import PyFBA
 
 
-def run_fba(modeldata, reactions_to_run, media, biomass_equation, uptake_secretion=None, verbose=False):
+def run_fba(modeldata, reactions_to_run, media, biomass_equation, uptake_secretion=None, verbose=False, session=None,
+            backend=None, options=None, snapshot_dir=None, cache=None, pure=False, context=None, feasibility=False,
+            reachability=False, presolve=None):
     """
     Run an fba for a set of data. We required the reactions object,
     a list of reactions to run, the media, and the biomass_equation equation.
@@ -22,16 +27,111 @@ def run_fba(modeldata, reactions_to_run, media, biomass_equation, uptake_secreti
     :type uptake_secretion: dict of Reaction
     :param verbose: Print more output
     :type verbose: bool
-    :return: which type of linear resolution, the output value of the model, whether the model grew
-    :rtype: (str, float, bool)
+    :param session: the linear programming session to run the fba in. We use the default session if not provided.
+    Use a separate session for each model if you want to keep several models loaded at once.
+    :type session: PyFBA.lp.LPBackend
+    :param backend: the linear programming backend to use (e.g. glpk or highs) if a session is not provided. We use
+    the default session for that backend. See PyFBA.lp.sessions
+    :type backend: str
+    :param options: the solver options, e.g. to limit the time that the solve can take. If the solver stops at a
+    limit the status is itlim or tmlim and the model does not grow.
+    :type options: PyFBA.lp.SolverOptions
+    :param snapshot_dir: (optional) a directory of saved problems. If we have already saved this problem we load it
+    rather than building it, otherwise we build it and save it there. With a cache as well, we look in the cache first
+    and then for a snapshot. A problem that is loaded from a snapshot is not built, so it does not change modeldata
+    even if this is not a pure run. See PyFBA.fba.lp_snapshot
+    :type snapshot_dir: str
+    :param cache: (optional) an in-memory cache of compiled models. Use True for the shared default cache, or pass a
+    PyFBA.fba.ModelCache. If we have compiled this model before we load it from the cache. See PyFBA.fba.model_cache.
+    Only models that we build are put in the cache, so a model that is loaded from a snapshot is not cached, and is
+    loaded from the snapshot again next time
+    :type cache: PyFBA.fba.ModelCache or bool
+    :param pure: leave modeldata alone. The uptake and secretion reactions and the bounds are kept in a per-run context
+    rather than being added to modeldata.reactions, and if a session is not provided we use a new session rather than
+    the default session, so pure runs can share a ModelData object. See PyFBA.fba.run_context
+    :type pure: bool
+    :param context: (optional) a context to keep the state of this run in. Passing a context makes this a pure run
+    :type context: PyFBA.fba.FBAContext
+    :param feasibility: only find out whether the model grows. We look for any solution where the biomass flux is at
+    least the growth threshold rather than the maximum biomass flux, and growth is None if the solver stopped before it
+    could tell. See PyFBA.fba.feasibility
+    :type feasibility: bool
+    :param reachability: first check that every compound the biomass equation needs can be made from the media, and
+    if one can not, return no growth without building or solving the model. Nothing is loaded into the session and
+    modeldata is not changed in that case. See PyFBA.fba.reachability
+    :type reachability: bool
+    :param presolve: (optional) remove the dead end compounds, and the reactions that touch them, before we load the
+    model. The presolve records what was removed, and the result still has a flux for every reaction. This does not
+    work with snapshot_dir. See PyFBA.fba.dead_ends
+    :type presolve: PyFBA.fba.DeadEndPresolve
+    :return: which type of linear resolution, the output value of the model, whether the model grew. This is an
+    FBAResult, which also keeps the fluxes and shadow prices. See PyFBA.fba.result
+    :rtype: PyFBA.fba.FBAResult
 
     """
 
-    cp, rc, upsr = PyFBA.fba.create_stoichiometric_matrix(reactions_to_run, modeldata, media,
-                                                          biomass_equation, uptake_secretion, verbose=verbose)
+    if context is not None:
+        pure = True
+    elif pure:
+        context = PyFBA.fba.FBAContext()
+
+    if session is None and pure:
+        session = context.session or lp.new_session(backend)
+    elif session is None:
+        session = lp.default_session(backend)
+    if pure:
+        context.modeldata = modeldata
+        context.session = session
+
+    if cache is True:
+        cache = PyFBA.fba.model_cache.default_cache()
+
+    def fingerprint():
+        return PyFBA.fba.model_cache.model_fingerprint(modeldata, reactions_to_run, media, biomass_equation,
+                                                       uptake_secretion)
+
+    if reachability and PyFBA.fba.reachability.unreachable_biomass(modeldata, reactions_to_run, media,
+                                                                   biomass_equation, uptake_secretion, verbose):
+        result = PyFBA.fba.reachability.no_growth(feasibility, fingerprint)
+        if context is not None:
+            context.status, context.value, context.growth = result
+            context.result = result
+        return result
 
-    rbvals = PyFBA.fba.reaction_bounds(modeldata.reactions, rc, media, verbose=verbose)
-    PyFBA.fba.compound_bounds(cp)
+    if presolve is not None and snapshot_dir:
+        raise ValueError("We can not save or load snapshots of models with the dead ends removed")
+
+    ckey = None
+    # an empty cache has a length of 0, so we can not just test "if cache"
+    if cache is not None and cache is not False:
+        ckey = fingerprint()
+        # a pruned model has different rows and columns, so it is cached separately
+        cache_key = ckey if presolve is None else f"{ckey}-dead_ends"
+        compiled = cache.get(cache_key)
+        if compiled is not None:
+            log_and_message("Loading the model from the cache", stderr=verbose)
+            compiled.load(modeldata, session, verbose=verbose, pure=pure)
+            if presolve is not None:
+                # copy what the cached presolve removed into the caller's presolve. The cached one is our own copy
+                vars(presolve).update(vars(copy.copy(compiled.presolve)))
+            return _solve(session, options, verbose, context, compiled, ckey, feasibility)
+
+    key = None
+    if snapshot_dir:
+        key = PyFBA.fba.lp_snapshot.snapshot_key(modeldata, reactions_to_run, media, biomass_equation,
+                                                 uptake_secretion)
+        if PyFBA.fba.lp_snapshot.load_snapshot(snapshot_dir, key, session, verbose=verbose):
+            return _solve(session, options, verbose, context, fingerprint=ckey or fingerprint, feasibility=feasibility)
+
+    compiled = PyFBA.fba.model_cache.build_model(modeldata, reactions_to_run, media, biomass_equation,
+                                                 uptake_secretion, verbose=verbose, session=session,
+                                                 keep_problem=bool(ckey), pure=pure, presolve=presolve)
+    cp, rc, upsr = compiled.cp, compiled.rc, compiled.uptake_secretion
+    if ckey:
+        cache.put(cache_key, compiled)
+
+    if key:
+        PyFBA.fba.lp_snapshot.save_snapshot(snapshot_dir, key, session, verbose=verbose)
 
     if verbose:
         log_and_message(f"Length of the media: {len(media)}", stderr=verbose)
@@ -41,10 +141,60 @@ def run_fba(modeldata, reactions_to_run, media, biomass_equation, uptake_secreti
         log_and_message(f"Number of uptake/secretion reactions {len(upsr)}", stderr=verbose)
         log_and_message(f"SMat dimensions: {len(cp)} x {len(rc)}", stderr=verbose)
 
-    status, value = PyFBA.lp.solve()
+    return _solve(session, options, verbose, context, compiled, ckey or fingerprint, feasibility)
+
+
+def _solve(session, options=None, verbose=False, context=None, compiled=None, fingerprint=None, feasibility=False):
+    """
+    Solve the fba that is loaded in the session
+
+    :param session: the linear programming session that holds the fba
+    :type session: PyFBA.lp.LPBackend
+    :param options: the solver options
+    :type options: PyFBA.lp.SolverOptions
+    :param verbose: Print more output
+    :type verbose: bool
+    :param context: the context of a pure run, where we keep the model and the result
+    :type context: PyFBA.fba.FBAContext
+    :param compiled: the model that is loaded in the session, if we know it
+    :type compiled: PyFBA.fba.model_cache.CompiledModel
+    :param fingerprint: the fingerprint of the model, or a callable that calculates it
+    :type fingerprint: str or callable
+    :param feasibility: only find out whether the model grows
+    :type feasibility: bool
+    :return: which type of linear resolution, the output value of the model, whether the model grew, and the solution
+    :rtype: PyFBA.fba.FBAResult
+    """
+
+    if feasibility:
+        # the biomass equation is always the last column
+        column = session.dimensions()[1] - 1
+        # these are the bounds that reaction_bounds gives the biomass equation
+        bounds = compiled.rbvals['BIOMASS_EQN'] if compiled is not None else (0.0, 1000.0)
+        result = PyFBA.fba.feasibility.solve_feasibility(session, column, bounds, options=options,
+                                                         fingerprint=fingerprint)
+        status, value, growth = result
+    else:
+        start = time.perf_counter()
+        status, value = session.solve(options)
+        seconds = time.perf_counter() - start
+
+        growth = False
+        if value > 1 and status not in lp.LIMIT_STATUSES:
+            growth = True
+        result = PyFBA.fba.FBAResult.from_session(session, status, value, growth, seconds, fingerprint)
+
+    if compiled is not None and compiled.presolve is not None:
+        result = compiled.presolve.expand_result(result)
 
-    growth = False
-    if value > 1:
-        growth = True
+    if status in lp.LIMIT_STATUSES:
+        log_and_message(f"The solver stopped at a limit ({status}) before it found the optimal solution",
+                        stderr=verbose)
 
-    return status, value, growth
+    if context is not None:
+        if compiled is not None:
+            context.cp, context.rc = compiled.cp, compiled.rc
+            context.uptake_secretion, context.rbvals = compiled.uptake_secretion, compiled.rbvals
+        context.status, context.value, context.growth = status, value, growth
+        context.result = result
+    return result
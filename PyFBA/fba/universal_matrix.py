@@ -0,0 +1,220 @@
+"""
+A sparse stoichiometric matrix for every reaction we know about.
+
+Building the stoichiometric matrix for a model used to mean walking the left and right compounds of every reaction
+and looking up each abundance. We now do that once for the whole reaction universe: every compound (with its
+location) is given a row number and every reaction a column number, and the matrix is stored in compressed sparse
+column (CSC) form. The matrix for a model is then a column slice, which numpy does in a handful of operations.
+
+Uptake and secretion reactions are made for each model, and reuse the same ids (upsr_0, upsr_1, ...) for different
+compounds, so they are never compiled into the universal matrix. Neither are biomass reactions.
+
+We also keep the direction of every reaction as a small integer code (see PyFBA.fba.bounds.DIRECTION_CODES), so that
+the default bounds for a model are a column slice too. Any bounds that are set on a reaction (e.g. from an SBML file,
+or to knock it out) are read from the reaction each time, so you can change them in place.
+
+The matrix is built lazily by ModelData.universal_matrix(). If you change the compounds or the direction of a reaction
+in place (rather than replacing it), call ModelData.universal_matrix(rebuild=True).
+"""
+
+import numpy as np
+
+from PyFBA import log_and_message
+from .bounds import direction_code, bounds_from_directions
+from .interning import InternTable
+
+
+def reaction_entries(rxn):
+    """
+    The non-zero entries in the column for a reaction. If a compound is on both sides of the reaction the right hand
+    side wins, which is what create_stoichiometric_matrix has always done.
+
+    :param rxn: the reaction
+    :type rxn: PyFBA.metabolism.Reaction
+    :return: a dict of compound and stoichiometry
+    :rtype: dict
+    """
+
+    entries = {}
+    for c in rxn.left_compounds:
+        entries[c] = 0 - rxn.get_left_compound_abundance(c)
+    for c in rxn.right_compounds:
+        entries[c] = rxn.get_right_compound_abundance(c)
+    return entries
+
+
+def compilable(rid, rxn):
+    """
+    Should this reaction be in the universal matrix?
+
+    :param rid: the reaction id
+    :type rid: str
+    :param rxn: the reaction
+    :type rxn: PyFBA.metabolism.Reaction
+    :rtype: bool
+    """
+    return not rxn.is_uptake_secretion and 'biomass' not in rid.lower()
+
+
+class UniversalMatrix:
+    """
+    The stoichiometric matrix for every reaction in a ModelData object.
+
+    :ivar compound_table: the interning table of compounds. The id of a compound is its row number
+    :ivar reaction_table: the interning table of reaction ids. The id of a reaction is its column number
+    :ivar compounds: the compound for each row (compound_table.items)
+    :ivar cpindex: a dict of compound and row number (compound_table.index)
+    :ivar reactions: the reaction id for each column (reaction_table.items)
+    :ivar rxnindex: a dict of reaction id and column number (reaction_table.index)
+    :ivar indptr: the entries for column j are indptr[j]:indptr[j+1] in row_idx and values
+    :ivar row_idx: the row number of each entry
+    :ivar values: the stoichiometry of each entry
+    :ivar directions: the direction code of each reaction
+    """
+
+    def __init__(self, reactions, verbose=False):
+        """
+        Compile the matrix
+
+        :param reactions: the dict of reaction id and reaction that we know about (e.g. modeldata.reactions)
+        :type reactions: dict of str and PyFBA.metabolism.Reaction
+        :param verbose: more output
+        :type verbose: bool
+        """
+
+        # compounds that are not in any reaction (e.g. only in the media) can be interned too, so there may be more
+        # compounds than rows with entries. Only add_reactions adds to the reaction table, so that it matches the
+        # columns
+        self.compound_table = InternTable()
+        self.reaction_table = InternTable()
+        self.compounds = self.compound_table.items
+        self.cpindex = self.compound_table.index
+        self.reactions = self.reaction_table.items
+        self.rxnindex = self.reaction_table.index
+        self._objects = []
+        self.indptr = np.zeros(1, dtype=np.int64)
+        self.row_idx = np.zeros(0, dtype=np.int64)
+        self.values = np.zeros(0)
+        self.directions = np.zeros(0, dtype=np.int8)
+        self.add_reactions(reactions)
+        log_and_message(f"Compiled a universal matrix of {len(self.compounds)} compounds and " +
+                        f"{len(self.reactions)} reactions with {len(self.values)} non-zero entries", stderr=verbose)
+
+    def __len__(self):
+        return len(self.reactions)
+
+    def add_reactions(self, reactions):
+        """
+        Add columns for any reactions that we have not already compiled. Uptake and secretion reactions and biomass
+        reactions are skipped.
+
+        :param reactions: a dict of reaction id and reaction
+        :type reactions: dict of str and PyFBA.metabolism.Reaction
+        :return: the number of reactions that were added
+        :rtype: int
+        """
+
+        lengths = []
+        rows = []
+        vals = []
+        directions = []
+        for rid in sorted(reactions):
+            rxn = reactions[rid]
+            if rid in self.rxnindex or not compilable(rid, rxn):
+                continue
+            entries = reaction_entries(rxn)
+            for c, v in entries.items():
+                rows.append(self.compound_table.intern(c))
+                vals.append(v)
+            lengths.append(len(entries))
+            directions.append(direction_code(rxn.direction))
+            self.reaction_table.intern(rid)
+            self._objects.append(rxn)
+
+        if lengths:
+            self.indptr = np.concatenate([self.indptr, self.indptr[-1] + np.cumsum(lengths)])
+            self.row_idx = np.concatenate([self.row_idx, np.array(rows, dtype=np.int64)])
+            self.values = np.concatenate([self.values, np.array(vals, dtype=float)])
+            self.directions = np.concatenate([self.directions, np.array(directions, dtype=np.int8)])
+        return len(lengths)
+
+    def is_current(self, rid, rxn):
+        """
+        Is the compiled column for this reaction up to date? It is not if the reaction has been replaced by a
+        different object since we compiled it.
+
+        :param rid: the reaction id
+        :type rid: str
+        :param rxn: the reaction that is in the model now
+        :type rxn: PyFBA.metabolism.Reaction
+        :rtype: bool
+        """
+        return rid in self.rxnindex and self._objects[self.rxnindex[rid]] is rxn
+
+    def compiled_reactions(self):
+        """
+        The reaction objects that we compiled, one per column. Compare these with the reactions in the model to see
+        which columns are current (see is_current).
+
+        :rtype: list of PyFBA.metabolism.Reaction
+        """
+        return self._objects
+
+    def column_slice(self, reaction_ids):
+        """
+        The entries of the matrix for some of the reactions. All the reactions must have been compiled.
+
+        :param reaction_ids: the reactions, in the order of the columns you want
+        :type reaction_ids: list of str
+        :return: the universal row number, the position in reaction_ids, and the value of every entry
+        :rtype: (numpy.ndarray, numpy.ndarray, numpy.ndarray)
+        """
+
+        cols = np.array([self.rxnindex[r] for r in reaction_ids], dtype=np.int64)
+        starts = self.indptr[cols]
+        lengths = self.indptr[cols + 1] - starts
+        total = int(lengths.sum())
+        # the index of every entry in every column: start of the column + the position in the column
+        offsets = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths)
+        idx = offsets + np.arange(total, dtype=np.int64)
+        return self.row_idx[idx], np.repeat(np.arange(len(cols), dtype=np.int64), lengths), self.values[idx]
+
+    def fixed_bounds(self, cols):
+        """
+        The bounds that are set on some of the compiled reactions now. These are read from the reactions, not from
+        when they were compiled, so that changing the bounds of a reaction in place (e.g. to knock it out) works.
+
+        :param cols: the column numbers
+        :type cols: numpy.ndarray
+        :return: the lower and upper bound of each reaction, or nan if the reaction does not have both bounds set
+        :rtype: (numpy.ndarray, numpy.ndarray)
+        """
+
+        fixed = np.full((len(cols), 2), np.nan)
+        for i, k in enumerate(cols.tolist()):
+            rxn = self._objects[k]
+            if rxn.lower_bound is not None and rxn.upper_bound is not None:
+                fixed[i] = rxn.lower_bound, rxn.upper_bound
+        return fixed[:, 0], fixed[:, 1]
+
+    def column_bounds(self, reaction_ids, lower=-1000.0, mid=0.0, upper=1000.0):
+        """
+        The bounds of some of the reactions, from their directions and any bounds that were set on them. This is the
+        same as PyFBA.fba.calculate_reaction_bounds, but for all the reactions at once. All the reactions must have
+        been compiled.
+
+        :param reaction_ids: the reactions, in the order of the columns you want
+        :type reaction_ids: list of str
+        :param lower: The default lower bound
+        :type lower: float
+        :param mid: The default mid value (typically 0)
+        :type mid: float
+        :param upper: The default upper bound
+        :type upper: float
+        :return: the lower and upper bounds of each reaction
+        :rtype: (numpy.ndarray, numpy.ndarray)
+        """
+
+        cols = np.array([self.rxnindex[r] for r in reaction_ids], dtype=np.int64)
+        fixed_lower, fixed_upper = self.fixed_bounds(cols)
+        return bounds_from_directions(self.directions[cols], fixed_lower, fixed_upper, lower, mid, upper)
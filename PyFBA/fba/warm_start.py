@@ -0,0 +1,388 @@
+"""
+Load a model once and re-solve it as reactions are switched on and off.
+
+Bisection and knockout loops (e.g. in minimize_additional_reactions) test many reaction sets that only differ by a
+handful of reactions. Rather than rebuilding the stoichiometric matrix for every test, we load the union of all the
+candidate reactions once, and "remove" a reaction by clamping its column bounds to (0, 0). The solver keeps the basis
+from the previous solution, so each re-solve starts from the last optimum rather than from scratch.
+
+Gapfilling only ever adds reactions to the model, so you can also add new reactions (and any new compounds that they
+need) to a loaded model, or delete reactions from it, without rebuilding everything else.
+
+Like run_fba, a warm start model normally adds its uptake and secretion reactions to modeldata.reactions and writes
+its bounds onto the reactions. With pure=True (or a context) it leaves modeldata alone, and keeps them in a
+PyFBA.fba.FBAContext instead (see PyFBA.fba.run_context).
+"""
+
+import re
+import time
+from collections import ChainMap
+
+import PyFBA
+from PyFBA import lp, log_and_message
+
+
+class WarmStartModel:
+    """
+    A model that is loaded into its own linear programming session once, and then re-solved for any subset of the
+    candidate reactions.
+
+    :ivar session: the linear programming session that holds this model
+    :ivar cp: the sorted list of compounds in the model (the rows)
+    :ivar rc: the list of reactions in the model, including uptake and secretion and the biomass equation (the columns)
+    :ivar uptake_secretion: the uptake and secretion reactions that were added to the model
+    :ivar uptake_secretion_by_compound: a dict of compound and the ids of its uptake and secretion reactions
+    :ivar rbvals: a dict of reaction id and the (lower, upper) bounds for that reaction when it is switched on
+    :ivar candidates: the set of reactions that can be switched on and off
+    :ivar active: the set of candidate reactions that are currently switched on
+    :ivar columns: a dict of reaction id and the {compound: stoichiometry} entries in its column
+    :ivar context: the context that holds the uptake and secretion reactions and the bounds of a pure model, or None
+    """
+
+    def __init__(self, modeldata, candidate_reactions, media, biomass_equation, uptake_secretion=None,
+                 session=None, backend=None, verbose=False, pure=False, context=None):
+        """
+        Build the stoichiometric matrix for all the candidate reactions and load it into the solver.
+
+        :param modeldata: the model seed object that includes compounds and reactions
+        :type modeldata: PyFBA.model_seed.ModelData
+        :param candidate_reactions: the union of all the reactions that we will test
+        :type candidate_reactions: set[str]
+        :param media: An array of compound.Compound objects representing the media
+        :type media: set
+        :param biomass_equation: The biomass_equation equation
+        :type biomass_equation: PyFBA.metabolism.Reaction
+        :param uptake_secretion: A hash of uptake and secretion reactions that should be added to the model.
+        Calculated if not provided.
+        :type uptake_secretion: dict of Reaction
+        :param session: the linear programming session to use. We create a new session if not provided
+        :type session: PyFBA.lp.LPBackend
+        :param backend: the linear programming backend to use for the new session (e.g. glpk or highs)
+        :type backend: str
+        :param verbose: Print more output
+        :type verbose: bool
+        :param pure: leave modeldata alone. The uptake and secretion reactions and the bounds are kept in a context
+        :type pure: bool
+        :param context: (optional) a context to keep the state of this model in. Passing a context makes this a pure
+        model
+        :type context: PyFBA.fba.FBAContext
+        """
+
+        if context is not None:
+            pure = True
+        elif pure:
+            context = PyFBA.fba.FBAContext()
+        if session is None and context is not None:
+            session = context.session
+        if session is None:
+            session = lp.new_session(backend)
+        self.session = session
+        self.context = context
+        self.modeldata = modeldata
+        self.media = media
+        self.biomass_equation = biomass_equation
+        self.verbose = verbose
+        self.candidates = set(candidate_reactions)
+
+        if pure:
+            compiled = PyFBA.fba.model_cache.build_model(modeldata, self.candidates, media, biomass_equation,
+                                                         uptake_secretion, verbose=verbose, session=session,
+                                                         keep_problem=False, pure=True)
+            self.cp, self.rc, self.uptake_secretion, self.rbvals = compiled.cp, compiled.rc, \
+                compiled.uptake_secretion, compiled.rbvals
+            context.modeldata, context.session = modeldata, session
+            context.cp, context.rc, context.uptake_secretion, context.rbvals = self.cp, self.rc, \
+                self.uptake_secretion, self.rbvals
+        else:
+            self.cp, self.rc, self.uptake_secretion = PyFBA.fba.create_stoichiometric_matrix(
+                self.candidates, modeldata, media, biomass_equation, uptake_secretion, verbose=verbose,
+                session=session)
+            self.rbvals = PyFBA.fba.reaction_bounds(modeldata.reactions, self.rc, media, verbose=verbose,
+                                                    session=session)
+            PyFBA.fba.compound_bounds(self.cp, session=session)
+
+        self.index = {r: i for i, r in enumerate(self.rc)}
+        self.cpindex = {c: i for i, c in enumerate(self.cp)}
+        self.active = set(self.candidates)
+        self.columns = {r: self._column_entries(r) for r in self.rc}
+        self.uptake_secretion_by_compound = PyFBA.fba.uptake_secretion_index(self.uptake_secretion)
+        # the media and biomass compounds are always in the model, even if no reactions use them
+        self.fixed_compounds = set(media).union(biomass_equation.left_compounds, biomass_equation.right_compounds)
+
+        log_and_message(f"Loaded a warm start model with {len(self.cp)} compounds and {len(self.rc)} reactions",
+                        stderr=verbose)
+
+    def set_reactions(self, reactions_to_run):
+        """
+        Switch on just these reactions, and switch off all the other candidate reactions. Only the columns whose
+        state changes are updated in the solver.
+
+        :param reactions_to_run: the reactions to run. These must all be in the candidate reactions
+        :type reactions_to_run: set[str]
+        """
+
+        reactions_to_run = set(reactions_to_run)
+        missing = reactions_to_run - self.candidates
+        if missing:
+            raise ValueError(f"Reactions {missing} are not in the candidate reactions that were loaded. " +
+                             "Please create a new WarmStartModel that includes them")
+
+        changes = {}
+        for r in self.active - reactions_to_run:
+            changes[self.index[r]] = (0, 0)
+        for r in reactions_to_run - self.active:
+            changes[self.index[r]] = self.rbvals[r]
+        self.session.update_col_bounds(changes)
+        self.active = reactions_to_run
+
+    def knockout(self, reactions):
+        """
+        Switch off some reactions, leaving everything else as it is
+
+        :param reactions: the reactions to switch off
+        :type reactions: set[str]
+        """
+        self.set_reactions(self.active - set(reactions))
+
+    def restore(self, reactions=None):
+        """
+        Switch some reactions back on. If no reactions are provided all the candidate reactions are switched on
+
+        :param reactions: the reactions to switch on
+        :type reactions: set[str]
+        """
+        if reactions is None:
+            self.set_reactions(self.candidates)
+        else:
+            self.set_reactions(self.active.union(reactions))
+
+    def set_media(self, media):
+        """
+        Change the growth media. We only look at the compounds that move in to or out of the media, and change the
+        bounds of their uptake and secretion reactions (see PyFBA.fba.media_bounds_delta), so the work depends on how
+        much the media changes and not on the size of the model. We send all of those changes to the solver at once.
+        Media compounds that are not in the model are ignored, since no reaction can use them.
+
+        :param media: An array of compound.Compound objects representing the new media
+        :type media: set
+        :return: the number of uptake and secretion reactions whose bounds changed
+        :rtype: int
+        """
+
+        indices = []
+        lower = []
+        upper = []
+        changes = PyFBA.fba.media_bounds_delta(self.uptake_secretion_by_compound, self.media, media)
+        for r, bounds in changes.items():
+            if r not in self.index or self.rbvals[r] == bounds:
+                continue
+            rxn = self.uptake_secretion[r]
+            rxn.lower_bound, rxn.upper_bound = bounds
+            self.rbvals[r] = bounds
+            indices.append(self.index[r])
+            lower.append(bounds[0])
+            upper.append(bounds[1])
+
+        self.session.set_col_bounds_array(lower, upper, indices)
+        self.media = media
+        self.fixed_compounds = set(media).union(self.biomass_equation.left_compounds,
+                                                self.biomass_equation.right_compounds)
+        log_and_message(f"Changed the bounds of {len(indices)} uptake and secretion reactions for the new media",
+                        stderr=self.verbose)
+        return len(indices)
+
+    def run(self, reactions_to_run=None, options=None, feasibility=False):
+        """
+        Solve the model, starting from the previous solution.
+
+        :param reactions_to_run: (optional) the reactions to run. If not provided we use the reactions that are
+        currently switched on
+        :type reactions_to_run: set[str]
+        :param options: (optional) the solver options, e.g. to limit the time that the solve can take
+        :type options: PyFBA.lp.SolverOptions
+        :param feasibility: only find out whether the model grows. See PyFBA.fba.feasibility
+        :type feasibility: bool
+        :return: which type of linear resolution, the output value of the model, whether the model grew, and the
+        solution
+        :rtype: PyFBA.fba.FBAResult
+        """
+
+        if reactions_to_run is not None:
+            self.set_reactions(reactions_to_run)
+
+        active, media = set(self.active), self.media
+
+        def fingerprint():
+            return PyFBA.fba.model_cache.model_fingerprint(self.modeldata, active, media, self.biomass_equation)
+
+        if feasibility:
+            return PyFBA.fba.feasibility.solve_feasibility(self.session, self.index['BIOMASS_EQN'],
+                                                           self.rbvals['BIOMASS_EQN'], options=options,
+                                                           fingerprint=fingerprint)
+
+        start = time.perf_counter()
+        status, value = self.session.solve(options)
+        seconds = time.perf_counter() - start
+
+        growth = False
+        if value > 1 and status not in lp.LIMIT_STATUSES:
+            growth = True
+
+        return PyFBA.fba.FBAResult.from_session(self.session, status, value, growth, seconds, fingerprint)
+
+    def _column_entries(self, r):
+        """
+        The non-zero entries in the column for a reaction. These match the entries that
+        create_stoichiometric_matrix makes.
+
+        :param r: the reaction id
+        :type r: str
+        :return: a dict of compound and stoichiometry
+        :rtype: dict
+        """
+
+        entries = {}
+        if r == "BIOMASS_EQN":
+            rxn = self.biomass_equation
+        elif r in self.uptake_secretion:
+            # we only add the left side of the uptake and secretion reactions
+            rxn = self.uptake_secretion[r]
+            for c in rxn.left_compounds:
+                entries[c] = 0 - rxn.get_left_compound_abundance(c)
+            return entries
+        elif 'biomass' in r.lower():
+            return entries
+        else:
+            rxn = self.modeldata.reactions[r]
+
+        for c in rxn.left_compounds:
+            entries[c] = 0 - rxn.get_left_compound_abundance(c)
+        for c in rxn.right_compounds:
+            entries[c] = rxn.get_right_compound_abundance(c)
+        return entries
+
+    def _next_uptake_secretion_id(self):
+        """
+        The next free number for an uptake and secretion reaction
+
+        :return: the number to start from
+        :rtype: int
+        """
+
+        used = [-1]
+        for r in self.uptake_secretion:
+            m = re.match(r'upsr_(\d+)$', r)
+            if m:
+                used.append(int(m.group(1)))
+        return max(used) + 1
+
+    def add_reactions(self, reactions):
+        """
+        Add new reactions to the loaded model. We add a row for every compound that is not already in the model, and
+        uptake and secretion reactions for any new external compounds. The new reactions are switched on.
+
+        :param reactions: the reactions to add. Reactions already in the model are ignored
+        :type reactions: set[str]
+        :return: the reactions that were added
+        :rtype: list[str]
+        """
+
+        new = sorted(set(reactions) - set(self.index))
+        if not new:
+            return []
+        missing = [r for r in new if r not in self.modeldata.reactions]
+        if missing:
+            raise ValueError(f"Reactions {missing} are not in the model data, so we can not add them to the model")
+
+        entries = {r: self._column_entries(r) for r in new}
+        new_cpds = set()
+        for r in new:
+            for c in entries[r]:
+                if c not in self.cpindex:
+                    new_cpds.add(c)
+
+        pure = self.context is not None
+        upsr = PyFBA.fba.uptake_and_secretion_reactions(new_cpds, self.media, start=self._next_uptake_secretion_id(),
+                                                        link_compounds=not pure,
+                                                        templates=self.modeldata.boundary_templates())
+        if not pure:
+            self.modeldata.reactions.update(upsr)
+        self.uptake_secretion.update(upsr)
+        for c, ids in PyFBA.fba.uptake_secretion_index(upsr).items():
+            self.uptake_secretion_by_compound.setdefault(c, []).extend(ids)
+        cols = new + list(upsr)
+        for r in upsr:
+            entries[r] = self._column_entries(r)
+
+        new_cpds = sorted(new_cpds)
+        first = self.session.add_rows(len(new_cpds), [str(c) for c in new_cpds], [(0, 0) for c in new_cpds],
+                                      verbose=self.verbose)
+        for i, c in enumerate(new_cpds):
+            self.cpindex[c] = first + i
+            self.cp.append(c)
+
+        reactions = ChainMap(self.uptake_secretion, self.modeldata.reactions) if pure else self.modeldata.reactions
+        rbvals = PyFBA.fba.calculate_reaction_bounds(reactions, cols, self.media, verbose=self.verbose)
+        if not pure:
+            for r in cols:
+                self.modeldata.reactions[r].lower_bound, self.modeldata.reactions[r].upper_bound = rbvals[r]
+        self.rbvals.update(rbvals)
+
+        first = self.session.add_cols([[(self.cpindex[c], v) for c, v in entries[r].items()] for r in cols],
+                                      [str(r) for r in cols], [rbvals[r] for r in cols], verbose=self.verbose)
+        for i, r in enumerate(cols):
+            self.index[r] = first + i
+            self.rc.append(r)
+            self.columns[r] = entries[r]
+
+        self.candidates.update(new)
+        self.active.update(new)
+        log_and_message(f"Added {len(new)} reactions, {len(upsr)} uptake and secretion reactions, and "
+                        f"{len(new_cpds)} compounds to the warm start model", stderr=self.verbose)
+        return new
+
+    def remove_reactions(self, reactions):
+        """
+        Delete reactions from the loaded model. Compounds that are no longer used by any reaction (other than
+        their uptake and secretion reactions) are deleted too, unless they are in the media or the biomass equation.
+
+        :param reactions: the reactions to delete. Reactions that are not candidates are ignored
+        :type reactions: set[str]
+        :return: the reactions that were deleted
+        :rtype: list[str]
+        """
+
+        gone = set(reactions).intersection(self.candidates)
+        if not gone:
+            return []
+
+        used = set()
+        for r in self.rc:
+            if r not in gone and r not in self.uptake_secretion:
+                used.update(self.columns[r])
+        orphan_cpds = {c for c in self.cpindex if c not in used and c not in self.fixed_compounds}
+        orphan_upsr = {u for u in self.uptake_secretion if u in self.index and set(self.columns[u]) <= orphan_cpds}
+        drop = gone.union(orphan_upsr)
+
+        self.session.delete_cols([self.index[r] for r in drop])
+        self.session.delete_rows([self.cpindex[c] for c in orphan_cpds])
+
+        for u in orphan_upsr:
+            self.uptake_secretion.pop(u)
+            if self.context is None:
+                self.modeldata.reactions.pop(u, None)
+        if orphan_upsr:
+            self.uptake_secretion_by_compound = PyFBA.fba.uptake_secretion_index(self.uptake_secretion)
+        for r in drop:
+            self.columns.pop(r)
+            self.rbvals.pop(r, None)
+        self.rc = [r for r in self.rc if r not in drop]
+        self.cp = [c for c in self.cp if c not in orphan_cpds]
+        self.index = {r: i for i, r in enumerate(self.rc)}
+        self.cpindex = {c: i for i, c in enumerate(self.cp)}
+        self.candidates.difference_update(gone)
+        self.active.difference_update(gone)
+
+        log_and_message(f"Deleted {len(gone)} reactions, {len(orphan_upsr)} uptake and secretion reactions, and "
+                        f"{len(orphan_cpds)} compounds from the warm start model", stderr=self.verbose)
+        return sorted(gone)
@@ -25,7 +25,7 @@ def update_r2r(old, new, why, verbose=False):
     return old
 
 
-def run_eqn(why, md, r2r, med, bme, verbose=False):
+def run_eqn(why, md, r2r, med, bme, verbose=False, model=None):
     """
     Run the fba
     :param why: why are we doing this
@@ -35,15 +35,26 @@ def run_eqn(why, md, r2r, med, bme, verbose=False):
     :param bme: biomass equation
     :param verbose: more output
     :type verbose: bool
+    :param model: (optional) a loaded WarmStartModel. We add any new reactions to it rather than rebuilding the model
+    :type model: PyFBA.fba.WarmStartModel
     :return: (value, growth)
     """
 
-    status, value, growth = PyFBA.fba.run_fba(md, r2r, med, bme)
+    if model:
+        model.add_reactions(r2r)
+        if PyFBA.fba.reachability.unreachable_biomass(md, r2r, med, bme, verbose=verbose):
+            status, value, growth = PyFBA.fba.reachability.no_growth()
+        else:
+            status, value, growth = model.run(r2r)
+    else:
+        status, value, growth = PyFBA.fba.run_fba(md, r2r, med, bme, reachability=True,
+                                                  presolve=PyFBA.fba.DeadEndPresolve())
     log_and_message(f"FBA run {why} has a biomass flux value of {value} --> Growth: {growth}", stderr=verbose)
     return value, growth
 
 
-def gapfill(reactions, model_data, growth_media, biomass_eqtn, close, genome_type, r2exclude=None, verbose=False):
+def gapfill(reactions, model_data, growth_media, biomass_eqtn, close, genome_type, r2exclude=None, verbose=False,
+            incremental=False):
     """
     Gapfill a set of reactions and return a tuple of [new reactions that grow, [reason, list of reactions]].
 
@@ -57,6 +68,8 @@ def gapfill(reactions, model_data, growth_media, biomass_eqtn, close, genome_typ
     :param genome_type: the genome type
     :param verbose: more output
     :param r2exclude: a set of reactions to exclude (optional)
+    :param incremental: load the model once and add each set of gapfilled reactions to it, rather than rebuilding
+    the model at every step
     :return: a dict of the reactions and why they are there!
     :rtype: dict[str, str]
     """
@@ -66,8 +79,13 @@ def gapfill(reactions, model_data, growth_media, biomass_eqtn, close, genome_typ
     added_reactions = []
     original_reactions_to_run = copy.deepcopy(reactions)
 
+    model = None
+    if incremental:
+        model = PyFBA.fba.WarmStartModel(model_data, reactions, growth_media, biomass_eqtn, verbose=verbose)
+
     val, growth = run_eqn(f"Initial test to make sure we don't grow!", model_data,
-                          r2r=reactions, bme=biomass_eqtn, med=growth_media, verbose=verbose)
+                          r2r=reactions, bme=biomass_eqtn, med=growth_media, verbose=verbose,
+                          model=model)
     if growth:
         return {r:"initial" for r in reactions}
 
@@ -102,7 +120,8 @@ def gapfill(reactions, model_data, growth_media, biomass_eqtn, close, genome_typ
     reactions = update_r2r(reactions, essential_reactions, "ESSENTIAL REACTIONS")
 
     val, growth = run_eqn(f"Test growth after {step}", model_data,
-                          r2r=reactions, bme=biomass_eqtn, med=growth_media, verbose=verbose)
+                          r2r=reactions, bme=biomass_eqtn, med=growth_media, verbose=verbose,
+                          model=model)
     if growth:
         return PyFBA.gapfill.minimize_reactions(original_reactions_to_run, added_reactions, model_data, growth_media,
                                                 biomass_eqtn, verbose=verbose)
@@ -120,7 +139,8 @@ def gapfill(reactions, model_data, growth_media, biomass_eqtn, close, genome_typ
     reactions = update_r2r(reactions, linked_reactions, "LINKED REACTIONS")
 
     val, growth = run_eqn(f"Test growth after {step}", model_data,
-                          r2r=reactions, bme=biomass_eqtn, med=growth_media, verbose=verbose)
+                          r2r=reactions, bme=biomass_eqtn, med=growth_media, verbose=verbose,
+                          model=model)
 
     if growth:
         return PyFBA.gapfill.minimize_reactions(original_reactions_to_run, added_reactions, model_data, growth_media,
@@ -139,7 +159,8 @@ def gapfill(reactions, model_data, growth_media, biomass_eqtn, close, genome_typ
     reactions = update_r2r(reactions, media_reactions, "MEDIA REACTIONS")
 
     val, growth = run_eqn(f"Test growth after {step}", model_data,
-                          r2r=reactions, bme=biomass_eqtn, med=growth_media, verbose=verbose)
+                          r2r=reactions, bme=biomass_eqtn, med=growth_media, verbose=verbose,
+                          model=model)
     if growth:
         return PyFBA.gapfill.minimize_reactions(original_reactions_to_run, added_reactions, model_data, growth_media,
                                                 biomass_eqtn, verbose=verbose)
@@ -162,7 +183,8 @@ def gapfill(reactions, model_data, growth_media, biomass_eqtn, close, genome_typ
             added_reactions.append((step, close_reactions))
             reactions = update_r2r(reactions, close_reactions, "CLOSE REACTIONS")
             val, growth = run_eqn(f"Test growth after {step}", model_data,
-                                  r2r=reactions, bme=biomass_eqtn, med=growth_media, verbose=verbose)
+                                  r2r=reactions, bme=biomass_eqtn, med=growth_media, verbose=verbose,
+                                  model=model)
             if growth:
                 return PyFBA.gapfill.minimize_reactions(original_reactions_to_run, added_reactions, model_data,
                                                         growth_media,
@@ -182,7 +204,8 @@ def gapfill(reactions, model_data, growth_media, biomass_eqtn, close, genome_typ
     added_reactions.append(("subsystems", subsystem_reactions))
     reactions = update_r2r(reactions, subsystem_reactions, "SUBSYSTEMS REACTIONS")
     val, growth = run_eqn(f"Test growth after {step}", model_data,
-                          r2r=reactions, bme=biomass_eqtn, med=growth_media, verbose=verbose)
+                          r2r=reactions, bme=biomass_eqtn, med=growth_media, verbose=verbose,
+                          model=model)
     if growth:
         return PyFBA.gapfill.minimize_reactions(original_reactions_to_run, added_reactions, model_data, growth_media,
                                                 biomass_eqtn, verbose=verbose)
@@ -199,7 +222,8 @@ def gapfill(reactions, model_data, growth_media, biomass_eqtn, close, genome_typ
     added_reactions.append(("orphans", orphan_reactions))
     reactions = update_r2r(reactions, orphan_reactions, "ORPHAN REACTIONS")
     val, growth = run_eqn(f"Test growth after {step}", model_data,
-                          r2r=reactions, bme=biomass_eqtn, med=growth_media, verbose=verbose)
+                          r2r=reactions, bme=biomass_eqtn, med=growth_media, verbose=verbose,
+                          model=model)
     if growth:
         return PyFBA.gapfill.minimize_reactions(original_reactions_to_run, added_reactions, model_data, growth_media,
                                                 biomass_eqtn, verbose=verbose)
@@ -219,7 +243,8 @@ def gapfill(reactions, model_data, growth_media, biomass_eqtn, close, genome_typ
     reactions = update_r2r(reactions, prob_reactions, "PROBABILITY OF REACTIONS")
 
     val, growth = run_eqn(f"Test growth after {step}", model_data,
-                          r2r=reactions, bme=biomass_eqtn, med=growth_media, verbose=verbose)
+                          r2r=reactions, bme=biomass_eqtn, med=growth_media, verbose=verbose,
+                          model=model)
     if growth:
         return PyFBA.gapfill.minimize_reactions(original_reactions_to_run, added_reactions, model_data, growth_media,
                                                 biomass_eqtn, verbose=verbose)
@@ -240,7 +265,8 @@ def gapfill(reactions, model_data, growth_media, biomass_eqtn, close, genome_typ
     reactions = update_r2r(reactions, with_p_reactions, "REACTIONS WITH PROTEINS")
 
     val, growth = run_eqn(f"Test growth after {step}", model_data,
-                          r2r=reactions, bme=biomass_eqtn, med=growth_media, verbose=verbose)
+                          r2r=reactions, bme=biomass_eqtn, med=growth_media, verbose=verbose,
+                          model=model)
     if growth:
         return PyFBA.gapfill.minimize_reactions(original_reactions_to_run, added_reactions, model_data, growth_media,
                                                 biomass_eqtn, verbose=verbose)
@@ -270,7 +296,8 @@ def gapfill(reactions, model_data, growth_media, biomass_eqtn, close, genome_typ
     reactions = update_r2r(reactions, without_p_reactions, "REACTIONS WITHOUT PROTEINS")
 
     val, growth = run_eqn(f"Test growth after {step}", model_data,
-                          r2r=reactions, bme=biomass_eqtn, med=growth_media, verbose=verbose)
+                          r2r=reactions, bme=biomass_eqtn, med=growth_media, verbose=verbose,
+                          model=model)
     if growth:
         return PyFBA.gapfill.minimize_reactions(original_reactions_to_run, added_reactions, model_data, growth_media,
                                                 biomass_eqtn, verbose=verbose)
@@ -68,7 +68,7 @@ def gapfill_two_media(model_data, reactions, growth_media, no_growth_media, clos
         for idx in range(len(allreactions)):
             testr = allreactions[:idx] + allreactions[idx+1:]
             status, value, growth = PyFBA.fba.run_fba(model_data, set(testr), no_growth_media, biomass_eqtn,
-                                                      verbose=verbose)
+                                                      verbose=verbose, reachability=True)
             if not growth:
                 # this reaction allows us to grow in this condition, so exclude it!
                 log_and_message(f"Reaction {allreactions[idx]} allows us to grow where we shouldn't. Skipped", stderr=verbose)
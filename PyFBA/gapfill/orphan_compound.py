@@ -1,5 +1,7 @@
 import sys
 
+import numpy as np
+
 
 def suggest_by_compound(modeldata, reactions2run, max_reactions, verbose=False):
     """
@@ -35,10 +37,19 @@ def suggest_by_compound(modeldata, reactions2run, max_reactions, verbose=False):
 
     """
 
-    cpd = {}
+    # count the reactions that each compound is in using the interned compound ids (the rows of the universal
+    # matrix), and only use the compounds themselves for the ones we keep
+    um = modeldata.universal_matrix()
+    compiled = []
+    rows = []
     for r in reactions2run:
-        for c in modeldata.reactions[r].all_compounds():
-            cpd[c] = cpd.get(c, 0) + 1
+        if um.is_current(r, modeldata.reactions[r]):
+            compiled.append(r)
+        else:
+            rows.append(um.compound_table.intern_all(modeldata.reactions[r].all_compounds()))
+    rows.append(um.column_slice(compiled)[0])
+    counts = np.bincount(np.concatenate(rows), minlength=len(um.compound_table))
+    cpd = {um.compound_table[i]: int(counts[i]) for i in np.flatnonzero(counts).tolist()}
 
     ikeep = set()
     ekeep = set()
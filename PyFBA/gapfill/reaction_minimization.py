@@ -20,35 +20,53 @@ def accuracy(precision_recall):
     return 1.0 * (precision_recall['tp'] + precision_recall['tn']) / (sum(list(precision_recall.values())))
 
 
-def calculate_precision_recall(growth_media, no_growth_media, modeldata, reactions2run, biomass_eqtn):
+def run_growth_test(model, modeldata, reactions2run, media, biomass_eqn):
     """
-    Test growth on our positive and negative media. Return the number of positive/negatives that grew.
+    Test whether a set of reactions grows. If we have a WarmStartModel we re-solve that, otherwise we run a complete
+    FBA. Either way, we do not solve if a compound that the biomass equation needs can not be made (see
+    PyFBA.fba.reachability), and a complete FBA removes the dead ends first (see PyFBA.fba.dead_ends)
 
-    :param no_growth_media: Media on which the model should NOT grow
-    :type no_growth_media: list of Media sets
-    :param growth_media: Media on which the model should grow
-    :type growth_media: list of Media sets
+    :param model: a model that has been loaded with all the reactions we will test, or None
+    :type model: PyFBA.fba.WarmStartModel
     :param modeldata: The model data
     :type modeldata: PyFBA.model_seed.ModelData
-    :param reactions2run:The set of reactions to run
+    :param reactions2run: The set of reactions to run
     :type reactions2run: set
-    :param biomass_eqtn: The biomass equation
-    :type biomass_eqtn: PyFBA.metabolism.reaction.Reaction
+    :param media: our media object
+    :type media: set
+    :param biomass_eqn: our biomass equation
+    :type biomass_eqn: network.reaction.Reaction
+    :return: which type of linear resolution, the output value of the model, whether the model grew
+    :rtype: (str, float, bool)
+    """
+
+    if model:
+        if PyFBA.fba.reachability.unreachable_biomass(modeldata, reactions2run, media, biomass_eqn):
+            return PyFBA.fba.reachability.no_growth()
+        return model.run(reactions2run)
+    return PyFBA.fba.run_fba(modeldata, reactions2run, media, biomass_eqn, reachability=True,
+                             presolve=PyFBA.fba.DeadEndPresolve())
+
+
+def _count_growth(growths, n_growth_media):
+    """
+    Count the true and false positives and negatives
+
+    :param growths: whether the model grew on each of the growth media and then each of the no growth media
+    :type growths: list of bool
+    :param n_growth_media: the number of growth media
+    :type n_growth_media: int
     :return: A dict of true positives, true negatives, false positives, false negative
     :rtype: dict of str and int
     """
     results = {'tp': 0, 'tn': 0, 'fp': 0, 'fn': 0}
-    for media in growth_media:
-        status, value, growth = PyFBA.fba.run_fba(modeldata, reactions2run, media, biomass_eqtn)
-        PyFBA.fba.remove_uptake_and_secretion_reactions(modeldata.reactions)
+    for growth in growths[:n_growth_media]:
         if growth:
             results['tp'] += 1
         else:
             results['fn'] += 1
 
-    for media in no_growth_media:
-        status, value, growth = PyFBA.fba.run_fba(modeldata, reactions2run, media, biomass_eqtn)
-        PyFBA.fba.remove_uptake_and_secretion_reactions(modeldata.reactions)
+    for growth in growths[n_growth_media:]:
         if growth:
             results['fp'] += 1
         else:
@@ -57,8 +75,84 @@ def calculate_precision_recall(growth_media, no_growth_media, modeldata, reactio
     return results
 
 
+def calculate_precision_recall(growth_media, no_growth_media, modeldata, reactions2run, biomass_eqtn, cache=None,
+                               executor=None, feasibility=False):
+    """
+    Test growth on our positive and negative media. Return the number of positive/negatives that grew.
+
+    :param no_growth_media: Media on which the model should NOT grow
+    :type no_growth_media: list of Media sets
+    :param growth_media: Media on which the model should grow
+    :type growth_media: list of Media sets
+    :param modeldata: The model data
+    :type modeldata: PyFBA.model_seed.ModelData
+    :param reactions2run:The set of reactions to run
+    :type reactions2run: set
+    :param biomass_eqtn: The biomass equation
+    :type biomass_eqtn: PyFBA.metabolism.reaction.Reaction
+    :param cache: (optional) a cache of compiled models to use if you calculate this several times. See run_fba.
+    Without a cache we build the model once and run it on all the media. See PyFBA.fba.run_fba_batch
+    :type cache: PyFBA.fba.ModelCache or bool
+    :param executor: (optional) run the media in parallel in these worker processes. See PyFBA.fba.FBAExecutor
+    :type executor: PyFBA.fba.FBAExecutor
+    :param feasibility: only find out whether the model grows on each medium, which is quicker. See
+    PyFBA.fba.feasibility
+    :type feasibility: bool
+    :return: A dict of true positives, true negatives, false positives, false negative
+    :rtype: dict of str and int
+    """
+    growth_media = list(growth_media)
+    no_growth_media = list(no_growth_media)
+    if executor is not None:
+        growths = [r.growth for r in executor.map([(reactions2run, m) for m in growth_media + no_growth_media])]
+    elif cache is None or cache is False:
+        growths = [r.growth for r in PyFBA.fba.run_fba_batch(modeldata, reactions2run, growth_media + no_growth_media,
+                                                             biomass_eqtn, feasibility=feasibility,
+                                                             reachability=True)]
+    else:
+        growths = []
+        for media in growth_media + no_growth_media:
+            status, value, growth = PyFBA.fba.run_fba(modeldata, reactions2run, media, biomass_eqtn, cache=cache,
+                                                      reachability=True, feasibility=feasibility)
+            PyFBA.fba.remove_uptake_and_secretion_reactions(modeldata.reactions)
+            growths.append(growth)
+
+    return _count_growth(growths, len(growth_media))
+
+
+def precision_recall_of_sets(growth_media, no_growth_media, modeldata, reaction_sets, biomass_eqtn, executor=None):
+    """
+    calculate_precision_recall for several sets of reactions, e.g. both halves of a bisection. With an executor all the
+    fbas for all the sets are run in parallel.
+
+    :param no_growth_media: Media on which the model should NOT grow
+    :type no_growth_media: list of Media sets
+    :param growth_media: Media on which the model should grow
+    :type growth_media: list of Media sets
+    :param modeldata: The model data
+    :type modeldata: PyFBA.model_seed.ModelData
+    :param reaction_sets: the sets of reactions to run
+    :type reaction_sets: list of set
+    :param biomass_eqtn: The biomass equation
+    :type biomass_eqtn: PyFBA.metabolism.reaction.Reaction
+    :param executor: (optional) run the fbas in parallel in these worker processes. See PyFBA.fba.FBAExecutor
+    :type executor: PyFBA.fba.FBAExecutor
+    :return: the dict of true positives, true negatives, false positives, false negatives for each set
+    :rtype: list of dict
+    """
+
+    if executor is None:
+        return [calculate_precision_recall(growth_media, no_growth_media, modeldata, r2r, biomass_eqtn)
+                for r2r in reaction_sets]
+
+    all_media = list(growth_media) + list(no_growth_media)
+    results = executor.map([(r2r, m) for r2r in reaction_sets for m in all_media])
+    return [_count_growth([r.growth for r in results[i:i + len(all_media)]], len(growth_media))
+            for i in range(0, len(results), len(all_media))]
+
+
 def iterate_reactions_to_run(base_reactions, optional_reactions, modeldata, media,
-                             biomass_eqn, verbose=False):
+                             biomass_eqn, verbose=False, model=None):
     """
     Iterate all the elements in optional_reactions and merge them with base reactions, and then test to see which are
     required for growth
@@ -82,6 +176,8 @@ def iterate_reactions_to_run(base_reactions, optional_reactions, modeldata, medi
     :type biomass_eqn: network.reaction.Reaction
     :param verbose: Print more information
     :type verbose: bool
+    :param model: (optional) a WarmStartModel that has been loaded with all of these reactions
+    :type model: PyFBA.fba.WarmStartModel
     :return: The list of reactions that need to be added to base_reactions to get growth
     :rtype: list
     """
@@ -95,7 +191,7 @@ def iterate_reactions_to_run(base_reactions, optional_reactions, modeldata, medi
         r2r = base_reactions.union(optional_reactions).union(required_optionals)
         log_and_message(f"Single reaction iteration {i} of {num_elements}: Attempting without {removed_reaction}: "
                         f"{modeldata.reactions[removed_reaction].equation}", stderr=verbose)
-        status, value, growth = PyFBA.fba.run_fba(modeldata, r2r, media, biomass_eqn)
+        status, value, growth = run_growth_test(model, modeldata, r2r, media, biomass_eqn)
         if not growth:
             log_and_message("Result: REQUIRED", stderr=verbose)
             required_optionals.add(removed_reaction)
@@ -107,7 +203,7 @@ def iterate_reactions_to_run(base_reactions, optional_reactions, modeldata, medi
 
 
 def minimize_additional_reactions(base_reactions, optional_reactions, modeldata, media,
-                                  biomass_eqn, verbose=False):
+                                  biomass_eqn, verbose=False, warm_start=False):
     """
     Given two sets, one of base reactions (base_reactions), and one of optional
     reactions we will attempt to minimize the reactions in the optional
@@ -128,29 +224,38 @@ def minimize_additional_reactions(base_reactions, optional_reactions, modeldata,
     :type biomass_eqn: network.reaction.Reaction
     :param verbose: Print more information
     :type verbose: bool
+    :param warm_start: Load the union of the base and optional reactions once, and switch reactions on and off
+        by their bounds rather than rebuilding the model for every test
+    :type warm_start: bool
     :return: The set of reactions that need to be added to base_reactions to get growth
     :rtype: set
     """
 
     base_reactions = set(base_reactions)
     optional_reactions = set(optional_reactions)
+
+    model = None
+    if warm_start:
+        model = PyFBA.fba.WarmStartModel(modeldata, base_reactions.union(optional_reactions), media, biomass_eqn,
+                                         verbose=verbose)
+
     # test that (a) the base_reactions set does not grow and the base_reactions
     # + optional set does grow
-    status, value, growth = PyFBA.fba.run_fba(modeldata, base_reactions, media, biomass_eqn)
+    status, value, growth = run_growth_test(model, modeldata, base_reactions, media, biomass_eqn)
     if growth:
         log_and_message("The set of 'base' reactions results in growth so we don't need to bisect the optional set",
                         stderr=True)
         return set()
 
-    status, value, growth = PyFBA.fba.run_fba(modeldata, base_reactions.union(optional_reactions), media,
-                                              biomass_eqn)
+    status, value, growth = run_growth_test(model, modeldata, base_reactions.union(optional_reactions), media,
+                                            biomass_eqn)
     if not growth:
         raise Exception("'base' union 'optional' reactions does not generate growth. We can not bisect the set\n")
 
     # first, lets see if we can limit the reactions based on compounds present and still get growth
     limited_rxn = PyFBA.gapfill.limit_reactions_by_compound(modeldata.reactions, base_reactions, optional_reactions)
-    status, value, growth = PyFBA.fba.run_fba(modeldata, base_reactions.union(limited_rxn), media,
-                                              biomass_eqn)
+    status, value, growth = run_growth_test(model, modeldata, base_reactions.union(limited_rxn), media,
+                                            biomass_eqn)
     if growth:
         if verbose:
             log_and_message(f"Successfully limited the reactions by compound and reduced from "
@@ -172,7 +277,7 @@ def minimize_additional_reactions(base_reactions, optional_reactions, modeldata,
         left, right = PyFBA.gapfill.bisections.bisect(current_rx_list)
         # left, right = percent_split(current_rx_list, percent)
         r2r = base_reactions.union(set(left))
-        status, value, lgrowth = PyFBA.fba.run_fba(modeldata, r2r, media, biomass_eqn)
+        status, value, lgrowth = run_growth_test(model, modeldata, r2r, media, biomass_eqn)
         # running the fba takes all the time, so we only run the right half if the left half doesn't grow
         if lgrowth:
             tries = 0
@@ -184,7 +289,7 @@ def minimize_additional_reactions(base_reactions, optional_reactions, modeldata,
                             f"Growth: {lgrowth} and NOT TESTED", stderr=verbose)
         else:
             r2r = base_reactions.union(set(right))
-            status, value, rgrowth = PyFBA.fba.run_fba(modeldata, r2r, media, biomass_eqn)
+            status, value, rgrowth = run_growth_test(model, modeldata, r2r, media, biomass_eqn)
             log_and_message(f"Iteration: {itera} Try: {tries} Length: {len(left)} and {len(right)} "
                             f"Growth: {lgrowth} and {rgrowth}", stderr=verbose)
 
@@ -204,7 +309,7 @@ def minimize_additional_reactions(base_reactions, optional_reactions, modeldata,
                 uneven_test = True
                 if len(current_rx_list) < 20:
                     left = iterate_reactions_to_run(base_reactions, current_rx_list, modeldata, media, biomass_eqn,
-                                                    verbose)
+                                                    verbose, model=model)
                     right = []
                     test = False
                 else:
@@ -219,7 +324,7 @@ def minimize_additional_reactions(base_reactions, optional_reactions, modeldata,
                         # r2r = base_reactions.union(set(left))
                         # status, value, lgrowth = PyFBA.fba.run_fba(compounds, reactions, r2r, media, biomass_eqn)
                         r2r = base_reactions.union(set(right))
-                        status, value, rgrowth = PyFBA.fba.run_fba(modeldata, r2r, media, biomass_eqn)
+                        status, value, rgrowth = run_growth_test(model, modeldata, r2r, media, biomass_eqn)
                         log_and_message(f"Iteration: {itera} Try: {tries} Length: {len(left)} and {len(right)} "
                                         f"Growth: {lgrowth} and {rgrowth}", stderr=verbose)
                         # if lgrowth:
@@ -249,7 +354,7 @@ def minimize_additional_reactions(base_reactions, optional_reactions, modeldata,
 
 
 def minimize_by_accuracy(base_reactions, optional_reactions, modeldata, growth_media, no_growth_media,
-                         biomass_eqn, minimum_tp=0, minimum_accuracy=0.50, verbose=False):
+                         biomass_eqn, minimum_tp=0, minimum_accuracy=0.50, verbose=False, executor=None):
     """
     Given two sets, one of base reactions (base_reactions), and one of optional
     reactions we will attempt to minimize the reactions in the optional
@@ -280,6 +385,9 @@ def minimize_by_accuracy(base_reactions, optional_reactions, modeldata, growth_m
     :type biomass_eqn: network.reaction.Reaction
     :param verbose: Print more information
     :type verbose: bool
+    :param executor: (optional) test both halves of each bisection in parallel in these worker processes. See
+        PyFBA.fba.FBAExecutor
+    :type executor: PyFBA.fba.FBAExecutor
     :return: The set of reactions that need to be added to base_reactions to get growth
     :rtype: set
     """
@@ -292,7 +400,7 @@ def minimize_by_accuracy(base_reactions, optional_reactions, modeldata, growth_m
     # test that (a) the base_reactions set does not grow and the base_reactions
     # + optional set does grow
     base_precision = calculate_precision_recall(growth_media, no_growth_media, modeldata, base_reactions,
-                                                biomass_eqn)
+                                                biomass_eqn, executor=executor)
     if base_precision['tp'] > minimum_tp:
         msg = f"The set of 'base' reactions results in {base_precision['tp']} positive reactions. " \
               f"Bigger than {minimum_tp} so no need to bisect"
@@ -307,7 +415,8 @@ def minimize_by_accuracy(base_reactions, optional_reactions, modeldata, growth_m
         return set()
 
     beginning_precision = calculate_precision_recall(growth_media, no_growth_media, modeldata,
-                                                     base_reactions.union(optional_reactions), biomass_eqn)
+                                                     base_reactions.union(optional_reactions), biomass_eqn,
+                                                     executor=executor)
 
     beginning_accuracy = accuracy(beginning_precision)
 
@@ -323,7 +432,8 @@ def minimize_by_accuracy(base_reactions, optional_reactions, modeldata, growth_m
     # first, lets see if we can limit the reactions based on compounds present and get better accuracy
     limited_rxn = PyFBA.gapfill.limit_reactions_by_compound(modeldata.reactions, base_reactions, optional_reactions)
     new_precision = calculate_precision_recall(growth_media, no_growth_media, modeldata,
-                                               base_reactions.union(limited_rxn), biomass_eqn)
+                                               base_reactions.union(limited_rxn), biomass_eqn,
+                                               executor=executor)
     new_accuracy = accuracy(new_precision)
     msg = f"The improved accuracy is {new_accuracy}."
     log_and_message(msg, stderr=verbose)
@@ -348,12 +458,10 @@ def minimize_by_accuracy(base_reactions, optional_reactions, modeldata, growth_m
         left, right = PyFBA.gapfill.bisections.bisect(current_rx_list)
         log_and_message(f"Lengths: left {len(left)} right {len(right)}", stderr=verbose)
         # left, right = percent_split(current_rx_list, percent)
-        r2r = base_reactions.union(set(left))
-        l_precision = calculate_precision_recall(growth_media, no_growth_media, modeldata, r2r, biomass_eqn)
+        l_precision, r_precision = precision_recall_of_sets(growth_media, no_growth_media, modeldata,
+                                                            [base_reactions.union(left), base_reactions.union(right)],
+                                                            biomass_eqn, executor=executor)
         l_accuracy = accuracy(l_precision)
-
-        r2r = base_reactions.union(set(right))
-        r_precision = calculate_precision_recall(growth_media, no_growth_media, modeldata, r2r, biomass_eqn)
         r_accuracy = accuracy(r_precision)
 
         if l_precision['tp'] > minimum_tp and r_precision['tp'] > minimum_tp:
@@ -382,14 +490,10 @@ def minimize_by_accuracy(base_reactions, optional_reactions, modeldata, growth_m
             percent = 40
             left, right = PyFBA.gapfill.bisections.percent_split(current_rx_list, percent)
             while uneven_test and len(left) > 0 and len(right) > 0:
-                r2r = base_reactions.union(set(left))
-                l_precision = calculate_precision_recall(growth_media, no_growth_media, modeldata,
-                                                         r2r, biomass_eqn)
+                l_precision, r_precision = precision_recall_of_sets(
+                    growth_media, no_growth_media, modeldata,
+                    [base_reactions.union(left), base_reactions.union(right)], biomass_eqn, executor=executor)
                 l_accuracy = accuracy(l_precision)
-
-                r2r = base_reactions.union(set(right))
-                r_precision = calculate_precision_recall(growth_media, no_growth_media, modeldata,
-                                                         r2r, biomass_eqn)
                 r_accuracy = accuracy(r_precision)
                 msg = f"Iteration: {itera} Try: {tries} Length: {len(left)} and {len(right)} " \
                       f"Growth: {l_precision['tp']} and {r_precision['tp']} Accuracy {l_accuracy} " \
@@ -425,7 +529,8 @@ def minimize_by_accuracy(base_reactions, optional_reactions, modeldata, growth_m
     return remaining
 
 
-def minimize_reactions(original_reactions_to_run, added_reactions, modeldata, media, biomass_equation, verbose=False):
+def minimize_reactions(original_reactions_to_run, added_reactions, modeldata, media, biomass_equation, verbose=False,
+                       warm_start=False):
     """
     Sort thorugh all the added reactions and return a dict of new reactions
     :param original_reactions_to_run: the original set from our genome
@@ -440,6 +545,8 @@ def minimize_reactions(original_reactions_to_run, added_reactions, modeldata, me
     :type biomass_equation: PyFBA.metabolism.Reaction
     :param verbose: more output
     :type verbose: bool
+    :param warm_start: load each set of reactions once and re-solve it (see minimize_additional_reactions)
+    :type warm_start: bool
     :return: A dict of the minimal set of reactions and their source
     :rtype: dict[str, str]
     """
@@ -467,7 +574,7 @@ def minimize_reactions(original_reactions_to_run, added_reactions, modeldata, me
         # Use minimization function to determine the minimal
         # set of gap-filled reactions from the current method
         new_essential = minimize_additional_reactions(ori, new, modeldata, media, biomass_equation,
-                                                                    verbose=True)
+                                                                    verbose=True, warm_start=warm_start)
         log_and_message(f"Saved {len(new_essential)} reactions from {how}", stderr=verbose)
         # Record the method used to determine
         # how the reaction was gap-filled
@@ -1,5 +1,14 @@
-from .glpk_solver import load, row_bounds, col_bounds, objective_coefficients, solve
-from .glpk_solver import col_primal_hash, col_primals, row_primal_hash, row_primals
+from .backend import LPBackend
+from .options import SolverOptions, LIMIT_STATUSES
+from .instrumentation import SolverStats, enable_instrumentation, disable_instrumentation, solver_stats
+from .glpk_solver import LPSession
+from .highs_solver import HiGHSSession
+from .sessions import backends, default_backend, new_session, default_session
+from .sessions import load, load_sparse, load_csr, row_bounds, col_bounds, objective_coefficients, solve
+from .sessions import col_primal_hash, col_primals, row_primal_hash, row_primals
 
-__all__ = ['load', 'row_bounds', 'col_bounds', 'objective_coefficients', 'solve', 'col_primal_hash', 'col_primals',
-            'row_primal_hash', 'row_primals']
+__all__ = ['LPBackend', 'SolverOptions', 'LIMIT_STATUSES', 'LPSession', 'HiGHSSession', 'backends', 'default_backend',
+           'new_session', 'default_session', 'SolverStats', 'enable_instrumentation', 'disable_instrumentation',
+           'solver_stats',
+           'load', 'load_sparse', 'load_csr', 'row_bounds', 'col_bounds', 'objective_coefficients', 'solve',
+           'col_primal_hash', 'col_primals', 'row_primal_hash', 'row_primals']
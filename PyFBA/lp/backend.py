@@ -0,0 +1,552 @@
+"""
+The interface that every linear programming backend implements.
+
+A backend is a class whose instances (sessions) each hold one linear programming problem. PyFBA.fba only talks to the
+solver through these methods, so any backend can be used to run an FBA. The problem is always a maximisation of the
+objective, with lower and upper bounds on every row (compound) and column (reaction). A bound of None means
+unbounded.
+
+Each session can have a SolverOptions object (see PyFBA/lp/options.py) that is used for every solve, or you can pass
+the options to solve() directly.
+"""
+
+import math
+
+from . import mps
+from .instrumentation import instrumented
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def as_bound(value):
+    """
+    Convert one lower or upper bound to a float, or to None if it is unbounded. Arrays of bounds can not hold None,
+    so we also accept +/- infinity and NaN as unbounded.
+
+    :param value: the bound
+    :type value: float
+    :return: the bound, or None if it is unbounded
+    :rtype: float
+    """
+    if value is None:
+        return None
+    value = float(value)
+    if math.isinf(value) or math.isnan(value):
+        return None
+    return value
+
+
+class LPBackend:
+    """
+    The base class for a linear programming session. Subclasses must implement the methods that raise
+    NotImplementedError. The other methods are built on top of those, but a subclass can override them if the solver
+    has a faster way to do it.
+    """
+
+    name = None
+    options = None
+    last_iterations = None
+    _col_index = None
+    _row_index = None
+    _col_name_cache = None
+    _row_name_cache = None
+
+    @instrumented('load')
+    def load(self, matrix, rowheaders=None, colheaders=None, verbose=False):
+        """
+        Load a dense matrix into the solver. See load_sparse for the parameters.
+
+        :param matrix: the 2D array of data. It should not have row or column headers
+        :type matrix: list of list
+        """
+
+        triplets = []
+        for i in range(len(matrix)):
+            for j in range(len(matrix[i])):
+                if matrix[i][j] != 0:
+                    triplets.append((i, j, matrix[i][j]))
+        self.load_sparse(triplets, len(matrix), len(matrix[0]), rowheaders, colheaders, verbose)
+
+    def load_sparse(self, triplets, nrows, ncols, rowheaders=None, colheaders=None, verbose=False):
+        """
+        Load a sparse matrix into the solver, replacing anything that was there before.
+
+        :param triplets: the non-zero elements of the matrix as (row index, column index, value) tuples
+        :type triplets: list of (int, int, float)
+        :param nrows: the number of rows in the matrix
+        :type nrows: int
+        :param ncols: the number of columns in the matrix
+        :type ncols: int
+        :param rowheaders: (optional) are the row identifiers
+        :type rowheaders: list
+        :param colheaders: (optional) are the column identifiers
+        :type colheaders: list
+        :param verbose: verbose turns on some debugging output
+        :type verbose: int
+        """
+        raise NotImplementedError(f"{type(self).__name__} has not implemented load_sparse")
+
+    @instrumented('load')
+    def load_csr(self, indptr, indices, data, ncols, rowheaders=None, colheaders=None, verbose=False):
+        """
+        Load a matrix in compressed sparse row (CSR) format into the linear programming solver. This is the same
+        layout that scipy.sparse.csr_matrix uses, so you can pass m.indptr, m.indices, and m.data directly.
+
+        :param indptr: the row pointers. The values for row i are in data[indptr[i]:indptr[i+1]]
+        :type indptr: list of int
+        :param indices: the column index for each value in data
+        :type indices: list of int
+        :param data: the non-zero values
+        :type data: list of float
+        :param ncols: the number of columns in the matrix
+        :type ncols: int
+        :param rowheaders: (optional) are the row identifiers
+        :type rowheaders: list
+        :param colheaders: (optional) are the column identifiers
+        :type colheaders: list
+        :param verbose: verbose turns on some debugging output. The higher the number the more output is generated
+        :type verbose: int
+        :return: void
+        :rtype: void
+        """
+
+        if len(indices) != len(data):
+            raise ValueError(f"There are {len(indices)} column indices but {len(data)} values in the CSR matrix")
+
+        nrows = len(indptr) - 1
+        triplets = []
+        for i in range(nrows):
+            for k in range(indptr[i], indptr[i + 1]):
+                triplets.append((i, int(indices[k]), float(data[k])))
+
+        self.load_sparse(triplets, nrows, ncols, rowheaders, colheaders, verbose)
+
+    def row_bounds(self, bounds):
+        """
+        Set the (lower bound, upper bound) tuple for every row
+
+        :param bounds: The bounds as a single tuple for each of the rows
+        :type bounds: list of tuples
+        """
+        raise NotImplementedError(f"{type(self).__name__} has not implemented row_bounds")
+
+    def col_bounds(self, bounds):
+        """
+        Set the (lower bound, upper bound) tuple for every column
+
+        :param bounds: The bounds as a single tuple for each of the columns
+        :type bounds: list of tuples
+        """
+        raise NotImplementedError(f"{type(self).__name__} has not implemented col_bounds")
+
+    def update_col_bounds(self, changes):
+        """
+        Change the bounds for only some of the columns
+
+        :param changes: a dict of column index and the (lower bound, upper bound) tuple for that column
+        :type changes: dict of int and tuple
+        """
+        raise NotImplementedError(f"{type(self).__name__} has not implemented update_col_bounds")
+
+    def update_row_bounds(self, changes):
+        """
+        Change the bounds for only some of the rows
+
+        :param changes: a dict of row index and the (lower bound, upper bound) tuple for that row
+        :type changes: dict of int and tuple
+        """
+        raise NotImplementedError(f"{type(self).__name__} has not implemented update_row_bounds")
+
+    @instrumented('bounds')
+    def set_col_bounds_array(self, lower, upper, indices=None):
+        """
+        Set the column bounds from arrays of lower and upper bounds, rather than a list of tuples. Use None,
+        +/- infinity, or NaN for unbounded.
+
+        If indices is provided this is a sparse delta: lower[k] and upper[k] are the new bounds for column indices[k],
+        and the other columns are not changed. Otherwise there must be one lower and upper bound for every column.
+
+        Backends that can set the bounds of many columns in one call (e.g. HiGHS) override this. This default turns the
+        arrays into (lower, upper) tuples and sets them one column at a time with col_bounds or update_col_bounds. The
+        GLPK backend uses it because GLPK has no call that sets many bounds at once, so there it is only a convenience,
+        and it is not any faster.
+
+        :param lower: the lower bounds
+        :type lower: numpy.ndarray or list of float
+        :param upper: the upper bounds
+        :type upper: numpy.ndarray or list of float
+        :param indices: (optional) the columns to change
+        :type indices: numpy.ndarray or list of int
+        :return: void
+        :rtype: void
+        """
+
+        bounds = self._bounds_from_arrays(lower, upper, indices)
+        if indices is None:
+            self.col_bounds(bounds)
+        else:
+            self.update_col_bounds(dict(zip([int(j) for j in indices], bounds)))
+
+    @instrumented('bounds')
+    def set_row_bounds_array(self, lower, upper, indices=None):
+        """
+        Set the row bounds from arrays of lower and upper bounds. See set_col_bounds_array.
+
+        :param lower: the lower bounds
+        :type lower: numpy.ndarray or list of float
+        :param upper: the upper bounds
+        :type upper: numpy.ndarray or list of float
+        :param indices: (optional) the rows to change
+        :type indices: numpy.ndarray or list of int
+        :return: void
+        :rtype: void
+        """
+
+        bounds = self._bounds_from_arrays(lower, upper, indices)
+        if indices is None:
+            self.row_bounds(bounds)
+        else:
+            self.update_row_bounds(dict(zip([int(i) for i in indices], bounds)))
+
+    @staticmethod
+    def _bounds_from_arrays(lower, upper, indices=None):
+        """
+        Zip arrays of lower and upper bounds into a list of (lower, upper) tuples, checking that they are the same size
+
+        :param lower: the lower bounds
+        :type lower: numpy.ndarray or list of float
+        :param upper: the upper bounds
+        :type upper: numpy.ndarray or list of float
+        :param indices: (optional) the indices that the bounds are for
+        :type indices: numpy.ndarray or list of int
+        :return: the bounds
+        :rtype: list of tuple
+        """
+
+        if len(lower) != len(upper):
+            raise ValueError(f"There are {len(lower)} lower bounds but {len(upper)} upper bounds")
+        if indices is not None and len(indices) != len(lower):
+            raise ValueError(f"There are {len(indices)} indices but {len(lower)} bounds")
+        return [(as_bound(lo), as_bound(up)) for lo, up in zip(lower, upper)]
+
+    def col_index(self):
+        """
+        A dict of column name and column index. This is cached until the columns change.
+
+        :return: the index of each column
+        :rtype: dict of str and int
+        """
+
+        if self._col_index is None:
+            self._col_index = {n: j for j, n in enumerate(self.cached_col_names())}
+        return self._col_index
+
+    def row_index(self):
+        """
+        A dict of row name and row index. This is cached until the rows change.
+
+        :return: the index of each row
+        :rtype: dict of str and int
+        """
+
+        if self._row_index is None:
+            self._row_index = {n: i for i, n in enumerate(self.cached_row_names())}
+        return self._row_index
+
+    def cached_col_names(self):
+        """
+        The names of the columns, in column order. This is cached until the columns change, so use this rather than
+        col_names when you need the names for many solutions of the same problem.
+
+        :return: the name of each column
+        :rtype: tuple of str
+        """
+
+        if self._col_name_cache is None:
+            self._col_name_cache = tuple(self.col_names())
+        return self._col_name_cache
+
+    def cached_row_names(self):
+        """
+        The names of the rows, in row order. This is cached until the rows change.
+
+        :return: the name of each row
+        :rtype: tuple of str
+        """
+
+        if self._row_name_cache is None:
+            self._row_name_cache = tuple(self.row_names())
+        return self._row_name_cache
+
+    def _names_changed(self):
+        """
+        Forget the cached name to index maps. Call this whenever rows or columns are loaded, added, or deleted.
+        """
+
+        self._col_index = None
+        self._row_index = None
+        self._col_name_cache = None
+        self._row_name_cache = None
+
+    @instrumented('bounds')
+    def update_named_col_bounds(self, changes):
+        """
+        Change the bounds for only some of the columns, using the column names rather than their indices
+
+        :param changes: a dict of column name and the (lower bound, upper bound) tuple for that column
+        :type changes: dict of str and tuple
+        :return: void
+        :rtype: void
+        """
+
+        index = self.col_index()
+        missing = [n for n in changes if n not in index]
+        if missing:
+            raise ValueError(f"Columns {missing} are not in the problem")
+        self.update_col_bounds({index[n]: changes[n] for n in changes})
+
+    @instrumented('bounds')
+    def update_named_row_bounds(self, changes):
+        """
+        Change the bounds for only some of the rows, using the row names rather than their indices
+
+        :param changes: a dict of row name and the (lower bound, upper bound) tuple for that row
+        :type changes: dict of str and tuple
+        :return: void
+        :rtype: void
+        """
+
+        index = self.row_index()
+        missing = [n for n in changes if n not in index]
+        if missing:
+            raise ValueError(f"Rows {missing} are not in the problem")
+        self.update_row_bounds({index[n]: changes[n] for n in changes})
+
+    def add_rows(self, n, rowheaders=None, bounds=None, verbose=False):
+        """
+        Append new, empty, rows to a problem that is already loaded
+
+        :return: the index of the first new row
+        :rtype: int
+        """
+        raise NotImplementedError(f"{type(self).__name__} has not implemented add_rows")
+
+    def add_cols(self, columns, colheaders=None, bounds=None, verbose=False):
+        """
+        Append new columns, each a list of (row index, value) tuples, to a problem that is already loaded
+
+        :return: the index of the first new column
+        :rtype: int
+        """
+        raise NotImplementedError(f"{type(self).__name__} has not implemented add_cols")
+
+    def delete_rows(self, indices):
+        """
+        Delete some rows from the problem
+        """
+        raise NotImplementedError(f"{type(self).__name__} has not implemented delete_rows")
+
+    def delete_cols(self, indices):
+        """
+        Delete some columns from the problem
+        """
+        raise NotImplementedError(f"{type(self).__name__} has not implemented delete_cols")
+
+    def objective_coefficients(self, coeff):
+        """
+        Set the objective coefficients, one for each column
+
+        :param coeff: The objective cooefficient for the linear solver
+        :type coeff: list of float or numpy.ndarray
+        """
+        raise NotImplementedError(f"{type(self).__name__} has not implemented objective_coefficients")
+
+    def solve(self, options=None):
+        """
+        Solve the problem and return the status and the objective function value. The status uses the GLPK
+        names: opt, feas, infeas, nofeas, unbnd, or undef, or is itlim or tmlim if the solver stopped because it
+        reached the iteration or time limit.
+
+        :param options: the options for this solve. If not provided we use the session options, if they are set
+        :type options: PyFBA.lp.SolverOptions
+        :return: The status and value of the solution
+        :rtype: str, float
+        """
+        raise NotImplementedError(f"{type(self).__name__} has not implemented solve")
+
+    def dimensions(self):
+        """
+        The size of the loaded problem
+
+        :return: the number of rows, the number of columns, and the number of non-zero elements in the matrix
+        :rtype: (int, int, int)
+        """
+        raise NotImplementedError(f"{type(self).__name__} has not implemented dimensions")
+
+    def col_names(self):
+        """
+        The names of the columns
+
+        :rtype: list of str
+        """
+        raise NotImplementedError(f"{type(self).__name__} has not implemented col_names")
+
+    def row_names(self):
+        """
+        The names of the rows
+
+        :rtype: list of str
+        """
+        raise NotImplementedError(f"{type(self).__name__} has not implemented row_names")
+
+    def col_primals(self):
+        """
+        Return an array of the primals (activities), one for each column
+
+        :return: A list of the column primals
+        :rtype: list
+        """
+        raise NotImplementedError(f"{type(self).__name__} has not implemented col_primals")
+
+    def row_primals(self):
+        """
+        Return an array of the primals (activities), one for each row
+
+        :return: A list of the row primals
+        :rtype: list
+        """
+        raise NotImplementedError(f"{type(self).__name__} has not implemented row_primals")
+
+    def row_duals(self):
+        """
+        Return an array of the duals (shadow prices), one for each row
+
+        :return: A list of the row duals
+        :rtype: list
+        """
+        raise NotImplementedError(f"{type(self).__name__} has not implemented row_duals")
+
+    def col_reduced_costs(self):
+        """
+        Return an array of the reduced costs, one for each column
+
+        :return: A list of the column reduced costs
+        :rtype: list
+        """
+        raise NotImplementedError(f"{type(self).__name__} has not implemented col_reduced_costs")
+
+    def get_problem(self):
+        """
+        Return everything that defines the loaded problem: the matrix, the bounds, the objective, and the names. This is
+        the problem dict that PyFBA.lp.mps reads and writes.
+
+        :return: the problem
+        :rtype: dict
+        """
+        raise NotImplementedError(f"{type(self).__name__} has not implemented get_problem")
+
+    def write_mps(self, filename):
+        """
+        Write the loaded problem, including all the bounds and the objective, to a free MPS file
+
+        :param filename: the file to write
+        :type filename: str
+        :return: void
+        :rtype: void
+        """
+
+        mps.write_mps(filename, self.get_problem())
+
+    @instrumented('load')
+    def read_mps(self, filename, verbose=False):
+        """
+        Load a problem from a free MPS file, replacing anything that was there before. The file includes the bounds
+        and the objective, so the problem is ready to solve.
+
+        :param filename: the file to read
+        :type filename: str
+        :param verbose: verbose turns on some debugging output
+        :type verbose: int
+        :return: void
+        :rtype: void
+        """
+
+        problem = mps.read_mps(filename)
+        self.load_sparse(problem['triplets'], problem['nrows'], problem['ncols'], problem['row_names'],
+                         problem['col_names'], verbose)
+        self.row_bounds(problem['row_bounds'])
+        self.col_bounds(problem['col_bounds'])
+        self.objective_coefficients(problem['objective'])
+
+    def col_primal_hash(self):
+        """
+        Return a hash of the column names and the primals (activities) associated with those columns
+
+        :return: A hash of the column names and their primals
+        :rtype: dict
+        """
+        return dict(zip(self.cached_col_names(), self.col_primals()))
+
+    def row_primal_hash(self):
+        """
+        Return a hash of the row names and the primals (activities) associated with those rows
+
+        :return: A hash of the row names and their primals
+        :rtype: dict
+        """
+        return dict(zip(self.cached_row_names(), self.row_primals()))
+
+    @staticmethod
+    def _array(values):
+        """
+        Convert a list of floats to a numpy array
+
+        :param values: the values
+        :type values: list of float
+        :return: the values
+        :rtype: numpy.ndarray
+        """
+        if np is None:
+            raise ImportError("The array accessors need numpy. Please install it")
+        return np.array(values, dtype=float)
+
+    def col_primal_array(self):
+        """
+        Return a numpy array of the primals (activities), one for each column, in the same order as cached_col_names
+
+        :return: the column primals
+        :rtype: numpy.ndarray
+        """
+        return self._array(self.col_primals())
+
+    def row_primal_array(self):
+        """
+        Return a numpy array of the primals (activities), one for each row, in the same order as cached_row_names
+
+        :return: the row primals
+        :rtype: numpy.ndarray
+        """
+        return self._array(self.row_primals())
+
+    def row_dual_array(self):
+        """
+        Return a numpy array of the duals (shadow prices), one for each row. The dual is the change in the objective
+        for a unit increase in the bound on the row.
+
+        :return: the row duals
+        :rtype: numpy.ndarray
+        """
+        return self._array(self.row_duals())
+
+    def col_reduced_cost_array(self):
+        """
+        Return a numpy array of the reduced costs, one for each column. The reduced cost is the change in the
+        objective for a unit increase in the column activity away from the bound that it is at.
+
+        :return: the column reduced costs
+        :rtype: numpy.ndarray
+        """
+        return self._array(self.col_reduced_costs())
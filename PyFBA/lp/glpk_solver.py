@@ -1,7 +1,14 @@
 import sys
-import glpk
 
 from PyFBA import log_and_message
+from .backend import LPBackend
+from .instrumentation import instrumented
+from .options import LIMIT_STATUSES
+
+try:
+    import glpk
+except ImportError:
+    glpk = None
 
 """
 
@@ -10,207 +17,545 @@ Run linear programming using GLPK. This uses the updated pyGLPK library.
 This is a generic linear programming wrapper that I wrote that we can
 build upon for fba work, but it is not limited to fba.
 
+Each LPSession owns its own GLPK problem, so you can keep several models
+loaded at once (e.g. one per growth medium) and solve them independently,
+including from different threads. This is the default backend, see
+PyFBA/lp/sessions.py for how to choose a different one.
+
 Do not use the standard pyGLK. The only version that I could get to
-compile is https://github.com/bradfordboyle/pyglpk 
+compile is https://github.com/bradfordboyle/pyglpk
 
 
 """
 
-solver = glpk.LPX()
 
-
-def load(matrix, rowheaders=None, colheaders=None, verbose=False):
+class LPSession(LPBackend):
     """
-    Load the data matrix into the linear programming solver
-
-    :param matrix: the 2D array of data. It should not have row or column
-    headers, they can be specified separately
-    :type matrix: list of list
-    :param rowheaders: (optional) are the row identifiers
-    :type rowheaders: list
-    :param colheaders: (optional) are the column identifiers
-    :type colheaders: list
-    :param verbose: verbose turns on some debugging output. The higher the number the more output is generated
-    :type verbose: int
-    :return: void
-    :rtype: void
+    A linear programming session that owns its own GLPK problem.
 
+    :ivar solver: the glpk.LPX object that holds this problem
     """
-    global solver
-
-    solver.erase()
-
-    solver.obj.maximize = True
-
-    nrows = len(matrix)
-    ncols = len(matrix[0])
-
-    if verbose:
-        log_and_message(f"We are loading {nrows} rows and {ncols} columns", stderr=True)
-
-    solver.rows.add(nrows)
-    solver.cols.add(ncols)
 
-    # we need to flatten the 2D array before we add it to the lp object
-    temp = []
-    for i in range(len(matrix)):
-        for j in range(len(matrix[0])):
-            temp.append(matrix[i][j])
-
-    if verbose > 4:
-        log_and_message("Matrix: " + str(temp) + "\n")
-    solver.matrix = temp
-
-    # name the rows and columns
-    if rowheaders and len(rowheaders) == nrows:
-        for i in range(len(rowheaders)):
-            if len(rowheaders[i]) > 255:
-                if verbose:
+    name = 'glpk'
+
+    def __init__(self):
+        """
+        Create a new, empty, linear programming problem
+        """
+        if glpk is None:
+            raise ImportError("The GLPK backend needs pyglpk (https://github.com/bradfordboyle/pyglpk). Please install "
+                              "it, or use a different backend by setting PYFBA_LP_BACKEND")
+        self.solver = glpk.LPX()
+
+    def erase(self):
+        """
+        Remove everything from this problem
+        """
+        self.solver.erase()
+        self._names_changed()
+
+    @instrumented('load')
+    def load(self, matrix, rowheaders=None, colheaders=None, verbose=False):
+        """
+        Load the data matrix into the linear programming solver
+
+        :param matrix: the 2D array of data. It should not have row or column
+        headers, they can be specified separately
+        :type matrix: list of list
+        :param rowheaders: (optional) are the row identifiers
+        :type rowheaders: list
+        :param colheaders: (optional) are the column identifiers
+        :type colheaders: list
+        :param verbose: verbose turns on some debugging output. The higher the number the more output is generated
+        :type verbose: int
+        :return: void
+        :rtype: void
+
+        """
+
+        self.solver.erase()
+
+        self.solver.obj.maximize = True
+
+        nrows = len(matrix)
+        ncols = len(matrix[0])
+
+        if verbose:
+            log_and_message(f"We are loading {nrows} rows and {ncols} columns", stderr=True)
+
+        self.solver.rows.add(nrows)
+        self.solver.cols.add(ncols)
+
+        # we need to flatten the 2D array before we add it to the lp object
+        temp = []
+        for i in range(len(matrix)):
+            for j in range(len(matrix[0])):
+                temp.append(matrix[i][j])
+
+        if verbose > 4:
+            log_and_message("Matrix: " + str(temp) + "\n")
+        self.solver.matrix = temp
+
+        self._name_rows_and_cols(nrows, ncols, rowheaders, colheaders, verbose)
+
+    @instrumented('load')
+    def load_sparse(self, triplets, nrows, ncols, rowheaders=None, colheaders=None, verbose=False):
+        """
+        Load a sparse matrix into the linear programming solver. Only the non-zero
+        elements are passed to GLPK, so this is much faster than load() for a
+        stoichiometric matrix where almost every element is zero.
+
+        :param triplets: the non-zero elements of the matrix as (row index, column index, value) tuples
+        :type triplets: list of (int, int, float)
+        :param nrows: the number of rows in the matrix
+        :type nrows: int
+        :param ncols: the number of columns in the matrix
+        :type ncols: int
+        :param rowheaders: (optional) are the row identifiers
+        :type rowheaders: list
+        :param colheaders: (optional) are the column identifiers
+        :type colheaders: list
+        :param verbose: verbose turns on some debugging output. The higher the number the more output is generated
+        :type verbose: int
+        :return: void
+        :rtype: void
+        """
+
+        self.solver.erase()
+
+        self.solver.obj.maximize = True
+
+        if verbose:
+            log_and_message(f"We are loading {nrows} rows and {ncols} columns", stderr=True)
+
+        if nrows:
+            self.solver.rows.add(nrows)
+        if ncols:
+            self.solver.cols.add(ncols)
+
+        # GLPK does not store zeros, so there is no point in sending them
+        temp = []
+        for i, j, v in triplets:
+            if i < 0 or i >= nrows or j < 0 or j >= ncols:
+                raise ValueError(f"The element ({i}, {j}) is outside the matrix of {nrows} rows and {ncols} columns")
+            if v != 0:
+                temp.append((i, j, v))
+
+        if verbose > 4:
+            log_and_message(f"Matrix: {len(temp)} non-zero elements: " + str(temp) + "\n")
+        self.solver.matrix = temp
+
+        self._name_rows_and_cols(nrows, ncols, rowheaders, colheaders, verbose)
+
+    def _name_rows_and_cols(self, nrows, ncols, rowheaders=None, colheaders=None, verbose=False):
+        """
+        Name the rows and columns of the loaded matrix. GLPK only allows names up to 255 characters, so we truncate
+        anything longer than that.
+
+        :param nrows: the number of rows in the matrix
+        :type nrows: int
+        :param ncols: the number of columns in the matrix
+        :type ncols: int
+        :param rowheaders: (optional) are the row identifiers
+        :type rowheaders: list
+        :param colheaders: (optional) are the column identifiers
+        :type colheaders: list
+        :param verbose: verbose turns on some debugging output
+        :type verbose: int
+        :return: void
+        :rtype: void
+        """
+
+        self._names_changed()
+
+        # name the rows and columns
+        if rowheaders and len(rowheaders) == nrows:
+            for i in range(len(rowheaders)):
+                if len(rowheaders[i]) > 255:
+                    if verbose:
+                        log_and_message(f"WARNING ROW HEADER: {rowheaders[i]} truncated to 255 characters",
+                                        stderr=True)
+                    self.solver.rows[i].name = rowheaders[i][0:255]
+                else:
+                    self.solver.rows[i].name = rowheaders[i]
+        elif rowheaders:
+            raise ValueError("The size of row headers (" + str(len(rowheaders)) +
+                             ") does not match the expected number of rows (" + str(nrows) + "\n")
+
+        if colheaders and len(colheaders) == ncols:
+            for i in range(len(colheaders)):
+                if len(colheaders[i]) > 255:
+                    if verbose > 0:
+                        log_and_message(f"WARNING COL HEADER: {colheaders[i]} truncated to 255 characters",
+                                        stderr=True)
+                    self.solver.cols[i].name = colheaders[i][0:255]
+                else:
+                    self.solver.cols[i].name = colheaders[i]
+        elif colheaders:
+            raise ValueError("Warning: the size of col headers (" + str(len(colheaders)) +
+                             ") does not match the expected number of cols (" + str(ncols) + "\n")
+
+    @instrumented('bounds')
+    def row_bounds(self, bounds):
+        """
+        Set the bounds for the rows in the linear programming.
+        This should be an array of the same length as the number of rows,
+        and each element should be a tuple of (lower bound, upper bound)
+
+        :param bounds: The bounds as a single tuple for each of the rows
+        :type bounds: list of tuples
+        :return: void
+        :rtype: void
+
+        """
+
+        if len(bounds) != len(self.solver.rows):
+            raise ValueError("There must be the same number of bounds as rows bounds:" + str(bounds) + " rows: " +
+                             str(len(self.solver.rows)) + "\n")
+
+        for i in range(len(bounds)):
+            self.solver.rows[i].bounds = bounds[i]
+
+    @instrumented('bounds')
+    def col_bounds(self, bounds):
+        """
+        Set the bounds for the columns in the linear programming.
+        This should be an array of the same length as the number of columns,
+        and each element should be a tuple of (lower bound, upper bound)
+
+        :param bounds: The bounds as a single tuple for each of the columns
+        :type bounds: list of tuples
+        :return: void
+        :rtype: void
+        """
+
+        if len(bounds) != len(self.solver.cols):
+            raise ValueError("There must be the same number of bounds as cols")
+
+        for i in range(len(bounds)):
+            self.solver.cols[i].bounds = bounds[i]
+
+    @instrumented('bounds')
+    def update_col_bounds(self, changes):
+        """
+        Change the bounds for only some of the columns. Everything else in the problem (including the current basis)
+        is left alone, so the next solve starts from the previous solution.
+
+        :param changes: a dict of column index and the (lower bound, upper bound) tuple for that column
+        :type changes: dict of int and tuple
+        :return: void
+        :rtype: void
+        """
+
+        ncols = len(self.solver.cols)
+        for i in changes:
+            if i < 0 or i >= ncols:
+                raise ValueError(f"Column {i} is not in the problem, which has {ncols} columns")
+            self.solver.cols[i].bounds = changes[i]
+
+    @instrumented('bounds')
+    def update_row_bounds(self, changes):
+        """
+        Change the bounds for only some of the rows, leaving everything else in the problem alone.
+
+        :param changes: a dict of row index and the (lower bound, upper bound) tuple for that row
+        :type changes: dict of int and tuple
+        :return: void
+        :rtype: void
+        """
+
+        nrows = len(self.solver.rows)
+        for i in changes:
+            if i < 0 or i >= nrows:
+                raise ValueError(f"Row {i} is not in the problem, which has {nrows} rows")
+            self.solver.rows[i].bounds = changes[i]
+
+    @instrumented('load')
+    def add_rows(self, n, rowheaders=None, bounds=None, verbose=False):
+        """
+        Append new, empty, rows to a problem that is already loaded. Use add_cols to add the columns that
+        use these rows.
+
+        :param n: the number of rows to add
+        :type n: int
+        :param rowheaders: (optional) the identifiers of the new rows
+        :type rowheaders: list
+        :param bounds: (optional) a (lower bound, upper bound) tuple for each of the new rows
+        :type bounds: list of tuples
+        :param verbose: verbose turns on some debugging output
+        :type verbose: int
+        :return: the index of the first new row
+        :rtype: int
+        """
+
+        if rowheaders and len(rowheaders) != n:
+            raise ValueError(f"The size of row headers ({len(rowheaders)}) does not match the number of new rows ({n})")
+        if bounds and len(bounds) != n:
+            raise ValueError(f"There must be the same number of bounds ({len(bounds)}) as new rows ({n})")
+
+        first = len(self.solver.rows)
+        if not n:
+            return first
+        self.solver.rows.add(n)
+        self._names_changed()
+        for i in range(n):
+            if rowheaders:
+                if len(rowheaders[i]) > 255 and verbose:
                     log_and_message(f"WARNING ROW HEADER: {rowheaders[i]} truncated to 255 characters", stderr=True)
-                solver.rows[i].name = rowheaders[i][0:255]
-            else:
-                solver.rows[i].name = rowheaders[i]
-    elif rowheaders:
-        raise ValueError("The size of row headers (" + str(len(rowheaders)) +
-                         ") does not match the expected number of rows (" + str(nrows) + "\n")
-
-    if colheaders and len(colheaders) == ncols:
-        for i in range(len(colheaders)):
-            if len(colheaders[i]) > 255:
-                if verbose > 0:
-                    log_and_message(f"WARNING COL HEADER: {colheaders[i]} truncated to 255 characters", stderr=True)
-                solver.cols[i].name = colheaders[i][0:255]
-            else:
-                solver.cols[i].name = colheaders[i]
-    elif colheaders:
-        raise ValueError("Warning: the size of col headers (" + str(len(colheaders)) +
-                         ") does not match the expected number of cols (" + str(ncols) + "\n")
-
-
-def row_bounds(bounds):
-    """
-    Set the bounds for the rows in the linear programming. 
-    This should be an array of the same length as the number of rows, 
-    and each element should be a tuple of (lower bound, upper bound)
-
-    :param bounds: The bounds as a single tuple for each of the rows
-    :type bounds: list of tuples
-    :return: void
-    :rtype: void
-
-    """
-
-    global solver
-    if len(bounds) != len(solver.rows):
-        raise ValueError("There must be the same number of bounds as rows bounds:" + str(bounds) + " rows: " + str(len(
-            solver.rows)) + "\n")
-
-    for i in range(len(bounds)):
-        solver.rows[i].bounds = bounds[i]
-
-
-def col_bounds(bounds):
-    """
-    Set the bounds for the columns in the linear programming.
-    This should be an array of the same length as the number of columns,
-    and each element should be a tuple of (lower bound, upper bound)
-
-    :param bounds: The bounds as a single tuple for each of the columns
-    :type bounds: list of tuples
-    :return: void
-    :rtype: void
-    """
-
-    global solver
-    if len(bounds) != len(solver.cols):
-        raise ValueError("There must be the same number of bounds as cols")
-
-    for i in range(len(bounds)):
-        solver.cols[i].bounds = bounds[i]
-
-
-def objective_coefficients(coeff):
-    """
-    Set the objective coefficients. coeff should be an array of
-    coefficients
-
-    :param coeff: The objective cooefficient for the linear solver
-    :type coeff: list of float
-    :return: void
-    :rtype: void
-    """
-    global solver
-    solver.obj[:] = coeff
-
-
-def solve():
-    """
-    Solve the lp and return the status and the objective function
-    value
-
-    :return: The status and value of the solution
-    :rtype: str, float
-
-    """
-    solver.simplex()
-    return solver.status, solver.obj.value
-
-
-def col_primal_hash():
-    """
-    Return a hash of the column names and the primals (activities)
-    associated with those columns. This presumes that you have named
-    the columns
-
-    :return: A hash of the column names and their primals
-    :rtype: dict
-    """
-
-    d = {}
-    for c in solver.cols:
-        d[c.name] = c.primal
-    return d
-
-
-def col_primals():
-    """
-    Return an array of the primals (activities), one for each column
-
-    :return: A list of the column primals
-    :rtype: list
-    """
-
-    d = []
-    for c in solver.cols:
-        d.append(c.primal)
-    return d
-
-
-def row_primal_hash():
-    """ Retrieve a hash of the primals (activity) of the rows. This
-    presume that you have named the columns
-
-    :return: A hash of the row names and their primals
-    :rtype: dict
-    """
-
-    d = {}
-    for r in solver.rows:
-        d[r.name] = r.primal
-    return d
-
-
-def row_primals():
-    """
-    Return an array of the primals (activities), one for each column
-
-    :return: A list of the row primals
-    :rtype: list
-    """
-
-    d = []
-    for r in solver.rows:
-        d.append(r.primal)
-    return d
-
-
+                self.solver.rows[first + i].name = rowheaders[i][0:255]
+            if bounds:
+                self.solver.rows[first + i].bounds = bounds[i]
+        return first
+
+    @instrumented('load')
+    def add_cols(self, columns, colheaders=None, bounds=None, verbose=False):
+        """
+        Append new columns to a problem that is already loaded. Any rows that the columns use must already be
+        in the problem (see add_rows). The objective coefficient of the new columns is zero.
+
+        :param columns: the non-zero elements of each new column as a list of (row index, value) tuples
+        :type columns: list of list of (int, float)
+        :param colheaders: (optional) the identifiers of the new columns
+        :type colheaders: list
+        :param bounds: (optional) a (lower bound, upper bound) tuple for each of the new columns
+        :type bounds: list of tuples
+        :param verbose: verbose turns on some debugging output
+        :type verbose: int
+        :return: the index of the first new column
+        :rtype: int
+        """
+
+        n = len(columns)
+        if colheaders and len(colheaders) != n:
+            raise ValueError(f"The size of col headers ({len(colheaders)}) does not match the number of new cols ({n})")
+        if bounds and len(bounds) != n:
+            raise ValueError(f"There must be the same number of bounds ({len(bounds)}) as new cols ({n})")
+
+        nrows = len(self.solver.rows)
+        first = len(self.solver.cols)
+        if not n:
+            return first
+        self.solver.cols.add(n)
+        self._names_changed()
+        for j in range(n):
+            entries = []
+            for i, v in columns[j]:
+                if i < 0 or i >= nrows:
+                    raise ValueError(f"Row {i} is not in the problem, which has {nrows} rows")
+                if v != 0:
+                    entries.append((i, v))
+            self.solver.cols[first + j].matrix = entries
+            if colheaders:
+                if len(colheaders[j]) > 255 and verbose:
+                    log_and_message(f"WARNING COL HEADER: {colheaders[j]} truncated to 255 characters", stderr=True)
+                self.solver.cols[first + j].name = colheaders[j][0:255]
+            if bounds:
+                self.solver.cols[first + j].bounds = bounds[j]
+        return first
+
+    @instrumented('load')
+    def delete_rows(self, indices):
+        """
+        Delete some rows from the problem. The remaining rows are renumbered so that they stay in the same order.
+
+        :param indices: the indices of the rows to delete
+        :type indices: list of int
+        :return: void
+        :rtype: void
+        """
+
+        nrows = len(self.solver.rows)
+        # check every index before we delete anything, so a bad index does not leave the problem half deleted
+        for i in indices:
+            if i < 0 or i >= nrows:
+                raise ValueError(f"Row {i} is not in the problem, which has {nrows} rows")
+        for i in sorted(set(indices), reverse=True):
+            del self.solver.rows[i]
+        self._names_changed()
+
+    @instrumented('load')
+    def delete_cols(self, indices):
+        """
+        Delete some columns from the problem. The remaining columns are renumbered so that they stay in the same order.
+
+        :param indices: the indices of the columns to delete
+        :type indices: list of int
+        :return: void
+        :rtype: void
+        """
+
+        ncols = len(self.solver.cols)
+        for j in indices:
+            if j < 0 or j >= ncols:
+                raise ValueError(f"Column {j} is not in the problem, which has {ncols} columns")
+        for j in sorted(set(indices), reverse=True):
+            del self.solver.cols[j]
+        self._names_changed()
+
+    @instrumented('objective')
+    def objective_coefficients(self, coeff):
+        """
+        Set the objective coefficients. coeff should be an array of
+        coefficients
+
+        :param coeff: The objective cooefficient for the linear solver
+        :type coeff: list of float or numpy.ndarray
+        :return: void
+        :rtype: void
+        """
+        # pyglpk only accepts python floats
+        self.solver.obj[:] = [float(c) for c in coeff]
+
+    @instrumented('solve')
+    def solve(self, options=None):
+        """
+        Solve the lp and return the status and the objective function
+        value
+
+        :param options: the options for this solve. If not provided we use the session options, if they are set
+        :type options: PyFBA.lp.SolverOptions
+        :return: The status and value of the solution
+        :rtype: str, float
+
+        """
+
+        if options is None:
+            options = self.options
+        # not every build of pyglpk exposes the iteration count
+        iterations = getattr(self.solver, 'itcnt', None)
+        if options is None:
+            self.solver.simplex()
+            self._count_iterations(iterations)
+            return self.solver.status, self.solver.obj.value
+
+        if options.method == 'interior':
+            # GLPK's interior point method does not take any of the other options
+            result = self.solver.interior()
+        else:
+            kwargs = {'meth': glpk.LPX.DUALP if options.method == 'dual' else glpk.LPX.PRIMAL}
+            if options.presolve is not None:
+                kwargs['presolve'] = options.presolve
+            if options.iteration_limit is not None:
+                kwargs['it_lim'] = int(options.iteration_limit)
+            if options.time_limit is not None:
+                # GLPK wants milliseconds
+                kwargs['tm_lim'] = int(options.time_limit * 1000)
+            if options.primal_tolerance is not None:
+                kwargs['tol_bnd'] = options.primal_tolerance
+            if options.dual_tolerance is not None:
+                kwargs['tol_dj'] = options.dual_tolerance
+            result = self.solver.simplex(**kwargs)
+        self._count_iterations(iterations)
+
+        if result in LIMIT_STATUSES:
+            return result, self.solver.obj.value
+        return self.solver.status, self.solver.obj.value
+
+    def _count_iterations(self, before):
+        """
+        Work out how many iterations the last solve took. GLPK keeps a running total
+
+        :param before: the total before the solve, or None if we do not know it
+        :type before: int
+        """
+        after = getattr(self.solver, 'itcnt', None)
+        self.last_iterations = None if before is None or after is None else after - before
+
+    def dimensions(self):
+        """
+        The size of the loaded problem
+
+        :return: the number of rows, the number of columns, and the number of non-zero elements in the matrix
+        :rtype: (int, int, int)
+        """
+        return len(self.solver.rows), len(self.solver.cols), self.solver.nnz
+
+    def get_problem(self):
+        """
+        Return everything that defines the loaded problem. See LPBackend.get_problem
+
+        :return: the problem
+        :rtype: dict
+        """
+
+        triplets = []
+        for j, c in enumerate(self.solver.cols):
+            for i, v in c.matrix:
+                triplets.append((i, j, v))
+        ncols = len(self.solver.cols)
+        return {
+            'nrows': len(self.solver.rows),
+            'ncols': ncols,
+            'triplets': triplets,
+            'row_bounds': [r.bounds for r in self.solver.rows],
+            'col_bounds': [c.bounds for c in self.solver.cols],
+            'objective': [self.solver.obj[j] for j in range(ncols)],
+            'row_names': self.row_names(),
+            'col_names': self.col_names(),
+        }
+
+    def col_names(self):
+        """
+        The names of the columns
+
+        :return: A list of the column names
+        :rtype: list
+        """
+
+        return [c.name for c in self.solver.cols]
+
+    def row_names(self):
+        """
+        The names of the rows
+
+        :return: A list of the row names
+        :rtype: list
+        """
+
+        return [r.name for r in self.solver.rows]
+
+    def col_primals(self):
+        """
+        Return an array of the primals (activities), one for each column
+
+        :return: A list of the column primals
+        :rtype: list
+        """
+
+        d = []
+        for c in self.solver.cols:
+            d.append(c.primal)
+        return d
+
+    def row_primals(self):
+        """
+        Return an array of the primals (activities), one for each column
+
+        :return: A list of the row primals
+        :rtype: list
+        """
+
+        d = []
+        for r in self.solver.rows:
+            d.append(r.primal)
+        return d
+
+    def row_duals(self):
+        """
+        Return an array of the duals (shadow prices), one for each row
+
+        :return: A list of the row duals
+        :rtype: list
+        """
+
+        return [r.dual for r in self.solver.rows]
+
+    def col_reduced_costs(self):
+        """
+        Return an array of the reduced costs, one for each column. GLPK calls these the column duals
+
+        :return: A list of the column reduced costs
+        :rtype: list
+        """
+
+        return [c.dual for c in self.solver.cols]
@@ -0,0 +1,702 @@
+"""
+
+Run linear programming using the HiGHS solver through scipy.optimize.linprog(method="highs").
+
+HiGHS is often faster than GLPK on large models, but linprog does not keep the
+problem loaded between calls, so every solve starts from scratch (there is no
+warm start from the previous basis). We hold the problem as sparse
+(row, column, value) arrays and build the constraint matrix when we solve.
+
+This backend needs numpy and scipy (>= 1.6).
+
+"""
+
+from PyFBA import log_and_message
+from .backend import LPBackend
+from .instrumentation import instrumented
+from .options import ITERATION_LIMIT, TIME_LIMIT
+
+try:
+    import numpy as np
+    from scipy import sparse
+    from scipy.optimize import linprog
+except ImportError:
+    linprog = None
+
+"""
+The scipy status codes, translated to the GLPK status names that the rest of PyFBA uses
+"""
+HIGHS_STATUS = {0: 'opt', 1: ITERATION_LIMIT, 2: 'nofeas', 3: 'unbnd', 4: 'undef'}
+
+"""
+The linprog methods for each of our solver methods. linprog does not let us ask HiGHS for the primal simplex, so
+we let HiGHS choose.
+"""
+HIGHS_METHODS = {'primal': 'highs', 'dual': 'highs-ds', 'interior': 'highs-ipm'}
+
+
+def _linprog_options(options):
+    """
+    Convert our solver options to the method and options for linprog
+
+    :param options: the solver options
+    :type options: PyFBA.lp.SolverOptions
+    :return: the linprog method and the dict of linprog options
+    :rtype: (str, dict)
+    """
+
+    if options is None:
+        return 'highs', {}
+    kwargs = {}
+    if options.presolve is not None:
+        kwargs['presolve'] = options.presolve
+    if options.iteration_limit is not None:
+        kwargs['maxiter'] = int(options.iteration_limit)
+    if options.time_limit is not None:
+        kwargs['time_limit'] = float(options.time_limit)
+    if options.primal_tolerance is not None:
+        kwargs['primal_feasibility_tolerance'] = options.primal_tolerance
+    if options.dual_tolerance is not None:
+        kwargs['dual_feasibility_tolerance'] = options.dual_tolerance
+    return HIGHS_METHODS[options.method], kwargs
+
+
+def _bound(bounds):
+    """
+    Convert a (lower bound, upper bound) tuple where None means unbounded to a pair of floats
+
+    :param bounds: the lower and upper bound
+    :type bounds: tuple
+    :return: the lower and upper bound as floats
+    :rtype: (float, float)
+    """
+    lower, upper = bounds
+    if lower is None:
+        lower = -np.inf
+    if upper is None:
+        upper = np.inf
+    return float(lower), float(upper)
+
+
+class HiGHSSession(LPBackend):
+    """
+    A linear programming session that is solved with HiGHS.
+
+    New rows are unbounded and new columns are fixed at zero until you set their bounds, which is the same as GLPK.
+    """
+
+    name = 'highs'
+
+    def __init__(self):
+        """
+        Create a new, empty, linear programming problem
+        """
+        if linprog is None:
+            raise ImportError("The HiGHS backend needs numpy and scipy. Please install them, or use a different "
+                              "backend")
+        self.erase()
+
+    def erase(self):
+        """
+        Remove everything from this problem
+        """
+        self.nrows = 0
+        self.ncols = 0
+        self._rows = np.zeros(0, dtype=np.int64)
+        self._cols = np.zeros(0, dtype=np.int64)
+        self._vals = np.zeros(0)
+        self._row_names = []
+        self._col_names = []
+        self._row_lower = np.zeros(0)
+        self._row_upper = np.zeros(0)
+        self._col_lower = np.zeros(0)
+        self._col_upper = np.zeros(0)
+        self._obj = np.zeros(0)
+        self._names_changed()
+        self._clear_solution()
+
+    def _clear_solution(self):
+        """
+        Forget the last solution
+        """
+        self.status = 'undef'
+        self.value = 0.0
+        self._x = np.zeros(self.ncols)
+        self._row_activity = np.zeros(self.nrows)
+        self._row_dual = np.zeros(self.nrows)
+        self._col_dual = np.zeros(self.ncols)
+
+    @instrumented('load')
+    def load_sparse(self, triplets, nrows, ncols, rowheaders=None, colheaders=None, verbose=False):
+        """
+        Load a sparse matrix into the linear programming solver.
+
+        :param triplets: the non-zero elements of the matrix as (row index, column index, value) tuples
+        :type triplets: list of (int, int, float)
+        :param nrows: the number of rows in the matrix
+        :type nrows: int
+        :param ncols: the number of columns in the matrix
+        :type ncols: int
+        :param rowheaders: (optional) are the row identifiers
+        :type rowheaders: list
+        :param colheaders: (optional) are the column identifiers
+        :type colheaders: list
+        :param verbose: verbose turns on some debugging output. The higher the number the more output is generated
+        :type verbose: int
+        :return: void
+        :rtype: void
+        """
+
+        self.erase()
+
+        if verbose:
+            log_and_message(f"We are loading {nrows} rows and {ncols} columns", stderr=True)
+
+        rows = []
+        cols = []
+        vals = []
+        for i, j, v in triplets:
+            if i < 0 or i >= nrows or j < 0 or j >= ncols:
+                raise ValueError(f"The element ({i}, {j}) is outside the matrix of {nrows} rows and {ncols} columns")
+            if v != 0:
+                rows.append(i)
+                cols.append(j)
+                vals.append(v)
+
+        if rowheaders and len(rowheaders) != nrows:
+            raise ValueError("The size of row headers (" + str(len(rowheaders)) +
+                             ") does not match the expected number of rows (" + str(nrows) + "\n")
+        if colheaders and len(colheaders) != ncols:
+            raise ValueError("Warning: the size of col headers (" + str(len(colheaders)) +
+                             ") does not match the expected number of cols (" + str(ncols) + "\n")
+
+        self.nrows = nrows
+        self.ncols = ncols
+        self._rows = np.array(rows, dtype=np.int64)
+        self._cols = np.array(cols, dtype=np.int64)
+        self._vals = np.array(vals, dtype=float)
+        self._row_names = list(rowheaders) if rowheaders else ['' for i in range(nrows)]
+        self._col_names = list(colheaders) if colheaders else ['' for j in range(ncols)]
+        self._row_lower = np.full(nrows, -np.inf)
+        self._row_upper = np.full(nrows, np.inf)
+        self._col_lower = np.zeros(ncols)
+        self._col_upper = np.zeros(ncols)
+        self._obj = np.zeros(ncols)
+        self._clear_solution()
+
+    @instrumented('bounds')
+    def row_bounds(self, bounds):
+        """
+        Set the bounds for the rows in the linear programming.
+        This should be an array of the same length as the number of rows,
+        and each element should be a tuple of (lower bound, upper bound)
+
+        :param bounds: The bounds as a single tuple for each of the rows
+        :type bounds: list of tuples
+        :return: void
+        :rtype: void
+        """
+
+        if len(bounds) != self.nrows:
+            raise ValueError("There must be the same number of bounds as rows bounds:" + str(bounds) + " rows: " +
+                             str(self.nrows) + "\n")
+
+        for i in range(len(bounds)):
+            self._row_lower[i], self._row_upper[i] = _bound(bounds[i])
+
+    @instrumented('bounds')
+    def col_bounds(self, bounds):
+        """
+        Set the bounds for the columns in the linear programming.
+        This should be an array of the same length as the number of columns,
+        and each element should be a tuple of (lower bound, upper bound)
+
+        :param bounds: The bounds as a single tuple for each of the columns
+        :type bounds: list of tuples
+        :return: void
+        :rtype: void
+        """
+
+        if len(bounds) != self.ncols:
+            raise ValueError("There must be the same number of bounds as cols")
+
+        for j in range(len(bounds)):
+            self._col_lower[j], self._col_upper[j] = _bound(bounds[j])
+
+    @instrumented('bounds')
+    def update_col_bounds(self, changes):
+        """
+        Change the bounds for only some of the columns.
+
+        :param changes: a dict of column index and the (lower bound, upper bound) tuple for that column
+        :type changes: dict of int and tuple
+        :return: void
+        :rtype: void
+        """
+
+        for j in changes:
+            if j < 0 or j >= self.ncols:
+                raise ValueError(f"Column {j} is not in the problem, which has {self.ncols} columns")
+            self._col_lower[j], self._col_upper[j] = _bound(changes[j])
+
+    @instrumented('bounds')
+    def update_row_bounds(self, changes):
+        """
+        Change the bounds for only some of the rows.
+
+        :param changes: a dict of row index and the (lower bound, upper bound) tuple for that row
+        :type changes: dict of int and tuple
+        :return: void
+        :rtype: void
+        """
+
+        for i in changes:
+            if i < 0 or i >= self.nrows:
+                raise ValueError(f"Row {i} is not in the problem, which has {self.nrows} rows")
+            self._row_lower[i], self._row_upper[i] = _bound(changes[i])
+
+    @instrumented('bounds')
+    def set_col_bounds_array(self, lower, upper, indices=None):
+        """
+        Set the column bounds from arrays of lower and upper bounds in one step. See LPBackend.set_col_bounds_array
+
+        :param lower: the lower bounds
+        :type lower: numpy.ndarray or list of float
+        :param upper: the upper bounds
+        :type upper: numpy.ndarray or list of float
+        :param indices: (optional) the columns to change
+        :type indices: numpy.ndarray or list of int
+        :return: void
+        :rtype: void
+        """
+
+        self._set_bounds_array(self._col_lower, self._col_upper, self.ncols, 'cols', lower, upper, indices)
+
+    @instrumented('bounds')
+    def set_row_bounds_array(self, lower, upper, indices=None):
+        """
+        Set the row bounds from arrays of lower and upper bounds in one step. See LPBackend.set_row_bounds_array
+
+        :param lower: the lower bounds
+        :type lower: numpy.ndarray or list of float
+        :param upper: the upper bounds
+        :type upper: numpy.ndarray or list of float
+        :param indices: (optional) the rows to change
+        :type indices: numpy.ndarray or list of int
+        :return: void
+        :rtype: void
+        """
+
+        self._set_bounds_array(self._row_lower, self._row_upper, self.nrows, 'rows', lower, upper, indices)
+
+    @staticmethod
+    def _set_bounds_array(lower_bounds, upper_bounds, size, what, lower, upper, indices=None):
+        """
+        Copy arrays of lower and upper bounds into our bounds arrays, converting None and NaN to +/- infinity
+
+        :param lower_bounds: our array of lower bounds, which is changed in place
+        :type lower_bounds: numpy.ndarray
+        :param upper_bounds: our array of upper bounds, which is changed in place
+        :type upper_bounds: numpy.ndarray
+        :param size: the number of rows or columns
+        :type size: int
+        :param what: rows or cols, for the error messages
+        :type what: str
+        :param lower: the new lower bounds
+        :type lower: numpy.ndarray or list of float
+        :param upper: the new upper bounds
+        :type upper: numpy.ndarray or list of float
+        :param indices: (optional) the indices to change
+        :type indices: numpy.ndarray or list of int
+        :return: void
+        :rtype: void
+        """
+
+        # None becomes NaN when we make a float array
+        lower = np.array(lower, dtype=float)
+        upper = np.array(upper, dtype=float)
+        lower[np.isnan(lower)] = -np.inf
+        upper[np.isnan(upper)] = np.inf
+        if lower.shape != upper.shape:
+            raise ValueError(f"There are {len(lower)} lower bounds but {len(upper)} upper bounds")
+
+        if indices is None:
+            if len(lower) != size:
+                raise ValueError(f"There must be the same number of bounds ({len(lower)}) as {what} ({size})")
+            lower_bounds[:] = lower
+            upper_bounds[:] = upper
+            return
+
+        indices = np.asarray(indices, dtype=np.int64)
+        if len(indices) != len(lower):
+            raise ValueError(f"There are {len(indices)} indices but {len(lower)} bounds")
+        if len(indices) and (indices.min() < 0 or indices.max() >= size):
+            raise ValueError(f"Some of the indices are not in the problem, which has {size} {what}")
+        lower_bounds[indices] = lower
+        upper_bounds[indices] = upper
+
+    @instrumented('load')
+    def add_rows(self, n, rowheaders=None, bounds=None, verbose=False):
+        """
+        Append new, empty, rows to a problem that is already loaded. Use add_cols to add the columns that
+        use these rows.
+
+        :param n: the number of rows to add
+        :type n: int
+        :param rowheaders: (optional) the identifiers of the new rows
+        :type rowheaders: list
+        :param bounds: (optional) a (lower bound, upper bound) tuple for each of the new rows
+        :type bounds: list of tuples
+        :param verbose: verbose turns on some debugging output
+        :type verbose: int
+        :return: the index of the first new row
+        :rtype: int
+        """
+
+        if rowheaders and len(rowheaders) != n:
+            raise ValueError(f"The size of row headers ({len(rowheaders)}) does not match the number of new rows ({n})")
+        if bounds and len(bounds) != n:
+            raise ValueError(f"There must be the same number of bounds ({len(bounds)}) as new rows ({n})")
+
+        first = self.nrows
+        lower = np.full(n, -np.inf)
+        upper = np.full(n, np.inf)
+        if bounds:
+            for i in range(n):
+                lower[i], upper[i] = _bound(bounds[i])
+        self._row_lower = np.concatenate([self._row_lower, lower])
+        self._row_upper = np.concatenate([self._row_upper, upper])
+        self._row_names += list(rowheaders) if rowheaders else ['' for i in range(n)]
+        self.nrows += n
+        self._names_changed()
+        self._clear_solution()
+        return first
+
+    @instrumented('load')
+    def add_cols(self, columns, colheaders=None, bounds=None, verbose=False):
+        """
+        Append new columns to a problem that is already loaded. Any rows that the columns use must already be
+        in the problem (see add_rows). The objective coefficient of the new columns is zero.
+
+        :param columns: the non-zero elements of each new column as a list of (row index, value) tuples
+        :type columns: list of list of (int, float)
+        :param colheaders: (optional) the identifiers of the new columns
+        :type colheaders: list
+        :param bounds: (optional) a (lower bound, upper bound) tuple for each of the new columns
+        :type bounds: list of tuples
+        :param verbose: verbose turns on some debugging output
+        :type verbose: int
+        :return: the index of the first new column
+        :rtype: int
+        """
+
+        n = len(columns)
+        if colheaders and len(colheaders) != n:
+            raise ValueError(f"The size of col headers ({len(colheaders)}) does not match the number of new cols ({n})")
+        if bounds and len(bounds) != n:
+            raise ValueError(f"There must be the same number of bounds ({len(bounds)}) as new cols ({n})")
+
+        first = self.ncols
+        rows = []
+        cols = []
+        vals = []
+        for j in range(n):
+            for i, v in columns[j]:
+                if i < 0 or i >= self.nrows:
+                    raise ValueError(f"Row {i} is not in the problem, which has {self.nrows} rows")
+                if v != 0:
+                    rows.append(i)
+                    cols.append(first + j)
+                    vals.append(v)
+
+        lower = np.zeros(n)
+        upper = np.zeros(n)
+        if bounds:
+            for j in range(n):
+                lower[j], upper[j] = _bound(bounds[j])
+
+        self._rows = np.concatenate([self._rows, np.array(rows, dtype=np.int64)])
+        self._cols = np.concatenate([self._cols, np.array(cols, dtype=np.int64)])
+        self._vals = np.concatenate([self._vals, np.array(vals, dtype=float)])
+        self._col_lower = np.concatenate([self._col_lower, lower])
+        self._col_upper = np.concatenate([self._col_upper, upper])
+        self._obj = np.concatenate([self._obj, np.zeros(n)])
+        self._col_names += list(colheaders) if colheaders else ['' for j in range(n)]
+        self.ncols += n
+        self._names_changed()
+        self._clear_solution()
+        return first
+
+    @instrumented('load')
+    def delete_rows(self, indices):
+        """
+        Delete some rows from the problem. The remaining rows are renumbered so that they stay in the same order.
+
+        :param indices: the indices of the rows to delete
+        :type indices: list of int
+        :return: void
+        :rtype: void
+        """
+
+        for i in indices:
+            if i < 0 or i >= self.nrows:
+                raise ValueError(f"Row {i} is not in the problem, which has {self.nrows} rows")
+        keep = np.ones(self.nrows, dtype=bool)
+        keep[list(indices)] = False
+        newindex = np.cumsum(keep) - 1
+        elements = keep[self._rows]
+        self._rows = newindex[self._rows[elements]]
+        self._cols = self._cols[elements]
+        self._vals = self._vals[elements]
+        self._row_lower = self._row_lower[keep]
+        self._row_upper = self._row_upper[keep]
+        self._row_names = [n for n, k in zip(self._row_names, keep) if k]
+        self.nrows = int(keep.sum())
+        self._names_changed()
+        self._clear_solution()
+
+    @instrumented('load')
+    def delete_cols(self, indices):
+        """
+        Delete some columns from the problem. The remaining columns are renumbered so that they stay in the same order.
+
+        :param indices: the indices of the columns to delete
+        :type indices: list of int
+        :return: void
+        :rtype: void
+        """
+
+        for j in indices:
+            if j < 0 or j >= self.ncols:
+                raise ValueError(f"Column {j} is not in the problem, which has {self.ncols} columns")
+        keep = np.ones(self.ncols, dtype=bool)
+        keep[list(indices)] = False
+        newindex = np.cumsum(keep) - 1
+        elements = keep[self._cols]
+        self._rows = self._rows[elements]
+        self._cols = newindex[self._cols[elements]]
+        self._vals = self._vals[elements]
+        self._col_lower = self._col_lower[keep]
+        self._col_upper = self._col_upper[keep]
+        self._obj = self._obj[keep]
+        self._col_names = [n for n, k in zip(self._col_names, keep) if k]
+        self.ncols = int(keep.sum())
+        self._names_changed()
+        self._clear_solution()
+
+    @instrumented('objective')
+    def objective_coefficients(self, coeff):
+        """
+        Set the objective coefficients. coeff should be an array of
+        coefficients
+
+        :param coeff: The objective cooefficient for the linear solver
+        :type coeff: list of float
+        :return: void
+        :rtype: void
+        """
+
+        if len(coeff) != self.ncols:
+            raise ValueError(f"There must be the same number of objective coefficients ({len(coeff)}) " +
+                             f"as cols ({self.ncols})")
+        self._obj = np.array(coeff, dtype=float)
+
+    def matrix(self):
+        """
+        The constraint matrix as a scipy.sparse.csr_matrix
+
+        :rtype: scipy.sparse.csr_matrix
+        """
+        return sparse.csr_matrix((self._vals, (self._rows, self._cols)), shape=(self.nrows, self.ncols))
+
+    @instrumented('solve')
+    def solve(self, options=None):
+        """
+        Solve the lp and return the status and the objective function
+        value
+
+        :param options: the options for this solve. If not provided we use the session options, if they are set
+        :type options: PyFBA.lp.SolverOptions
+        :return: The status and value of the solution
+        :rtype: str, float
+
+        """
+
+        if not self.ncols:
+            self._clear_solution()
+            self.last_iterations = 0
+            return self.status, self.value
+
+        a = self.matrix()
+        # linprog only has equality and <= constraints, so we split the ranged rows
+        fixed = self._row_lower == self._row_upper
+        has_upper = ~fixed & np.isfinite(self._row_upper)
+        has_lower = ~fixed & np.isfinite(self._row_lower)
+
+        a_eq = None
+        b_eq = None
+        if fixed.any():
+            a_eq = a[fixed]
+            b_eq = self._row_lower[fixed]
+        a_ub = None
+        b_ub = None
+        if has_upper.any() or has_lower.any():
+            a_ub = sparse.vstack([a[has_upper], -a[has_lower]]).tocsr()
+            b_ub = np.concatenate([self._row_upper[has_upper], -self._row_lower[has_lower]])
+
+        if options is None:
+            options = self.options
+        method, kwargs = _linprog_options(options)
+
+        # linprog minimises, and we always maximise
+        res = linprog(-self._obj, A_ub=a_ub, b_ub=b_ub, A_eq=a_eq, b_eq=b_eq,
+                      bounds=np.column_stack([self._col_lower, self._col_upper]), method=method, options=kwargs)
+
+        self.status = HIGHS_STATUS.get(res.status, 'undef')
+        self.last_iterations = int(res.nit)
+        if res.status == 1 and 'time' in res.message.lower():
+            # linprog uses the same status for the iteration and time limits
+            self.status = TIME_LIMIT
+        if res.status == 0:
+            # adding 0.0 turns -0.0 into 0.0
+            self.value = float(-res.fun) + 0.0
+            self._x = np.array(res.x)
+            self._row_activity = a.dot(self._x)
+            # the marginals are the sensitivity of the minimised (negated) objective, so we flip them back. Rows with
+            # a lower bound were negated, so they flip twice. Columns only have one non-zero marginal at a time.
+            self._row_dual = np.zeros(self.nrows)
+            self._row_dual[fixed] = -res.eqlin.marginals
+            nupper = int(has_upper.sum())
+            self._row_dual[has_upper] -= res.ineqlin.marginals[:nupper]
+            self._row_dual[has_lower] += res.ineqlin.marginals[nupper:]
+            self._row_dual += 0.0
+            self._col_dual = 0.0 - (res.lower.marginals + res.upper.marginals)
+        else:
+            self.value = 0.0
+            self._x = np.zeros(self.ncols)
+            self._row_activity = np.zeros(self.nrows)
+            self._row_dual = np.zeros(self.nrows)
+            self._col_dual = np.zeros(self.ncols)
+        return self.status, self.value
+
+    def dimensions(self):
+        """
+        The size of the loaded problem
+
+        :return: the number of rows, the number of columns, and the number of non-zero elements in the matrix
+        :rtype: (int, int, int)
+        """
+        return self.nrows, self.ncols, len(self._vals)
+
+    def get_problem(self):
+        """
+        Return everything that defines the loaded problem. See LPBackend.get_problem
+
+        :return: the problem
+        :rtype: dict
+        """
+
+        def bounds(lower, upper):
+            return [(None if np.isinf(lo) else float(lo), None if np.isinf(up) else float(up))
+                    for lo, up in zip(lower, upper)]
+
+        return {
+            'nrows': self.nrows,
+            'ncols': self.ncols,
+            'triplets': [(int(i), int(j), float(v)) for i, j, v in zip(self._rows, self._cols, self._vals)],
+            'row_bounds': bounds(self._row_lower, self._row_upper),
+            'col_bounds': bounds(self._col_lower, self._col_upper),
+            'objective': [float(c) for c in self._obj],
+            'row_names': self.row_names(),
+            'col_names': self.col_names(),
+        }
+
+    def col_names(self):
+        """
+        The names of the columns
+
+        :return: A list of the column names
+        :rtype: list
+        """
+        return list(self._col_names)
+
+    def row_names(self):
+        """
+        The names of the rows
+
+        :return: A list of the row names
+        :rtype: list
+        """
+        return list(self._row_names)
+
+    def col_primals(self):
+        """
+        Return an array of the primals (activities), one for each column
+
+        :return: A list of the column primals
+        :rtype: list
+        """
+        return [float(x) for x in self._x]
+
+    def col_primal_array(self):
+        """
+        Return a numpy array of the primals (activities), one for each column
+
+        :return: the column primals
+        :rtype: numpy.ndarray
+        """
+        return self._x.copy()
+
+    def row_primal_array(self):
+        """
+        Return a numpy array of the primals (activities), one for each row
+
+        :return: the row primals
+        :rtype: numpy.ndarray
+        """
+        return self._row_activity.copy()
+
+    def row_dual_array(self):
+        """
+        Return a numpy array of the duals (shadow prices), one for each row
+
+        :return: the row duals
+        :rtype: numpy.ndarray
+        """
+        return self._row_dual.copy()
+
+    def col_reduced_cost_array(self):
+        """
+        Return a numpy array of the reduced costs, one for each column
+
+        :return: the column reduced costs
+        :rtype: numpy.ndarray
+        """
+        return self._col_dual.copy()
+
+    def row_primals(self):
+        """
+        Return an array of the primals (activities), one for each row
+
+        :return: A list of the row primals
+        :rtype: list
+        """
+        return [float(x) for x in self._row_activity]
+
+    def row_duals(self):
+        """
+        Return an array of the duals (shadow prices), one for each row
+
+        :return: A list of the row duals
+        :rtype: list
+        """
+        return [float(x) for x in self._row_dual]
+
+    def col_reduced_costs(self):
+        """
+        Return an array of the reduced costs, one for each column
+
+        :return: A list of the column reduced costs
+        :rtype: list
+        """
+        return [float(x) for x in self._col_dual]
@@ -0,0 +1,254 @@
+"""
+Optional instrumentation of the linear programming solver.
+
+When instrumentation is switched on we record, for every call that loads a problem, sets bounds, or solves it, the
+wall time, the size of the problem, and (for solves) the number of simplex iterations and the final status. The
+records are collected in a SolverStats object that you can summarise, or write out as JSON or CSV. e.g.
+
+    stats = PyFBA.lp.enable_instrumentation()
+    ... run your gapfill ...
+    print(stats.summary())
+    stats.to_csv('solver_stats.csv')
+
+You can also switch it on for a whole run by setting the environment variable PYFBA_LP_STATS to a file name. The
+stats are written to that file (CSV if the name ends .csv, otherwise JSON) when python exits.
+
+Instrumentation is off by default, and then costs one test per call.
+
+"""
+
+import atexit
+import csv
+import functools
+import json
+import os
+import threading
+import time
+
+from PyFBA import log_and_message
+
+STATS_ENVIRONMENT_VARIABLE = 'PYFBA_LP_STATS'
+
+"""
+The columns that we record for every call
+"""
+FIELDS = ['backend', 'category', 'method', 'seconds', 'nrows', 'ncols', 'nnz', 'iterations', 'status']
+
+_stats = None
+# the stats and the file to write them to when python exits, and whether we have registered the function that does it
+_export = None
+_export_registered = False
+
+
+class SolverStats:
+    """
+    A collection of timing records for the linear programming calls.
+
+    :ivar records: a list of dicts, one per call, with the keys in FIELDS
+    """
+
+    def __init__(self):
+        """
+        Start a new, empty, collection
+        """
+        self.records = []
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.records)
+
+    def record(self, **kwargs):
+        """
+        Add a record. Anything in FIELDS that is not provided is None
+
+        :return: void
+        :rtype: void
+        """
+        rec = {f: kwargs.get(f) for f in FIELDS}
+        with self._lock:
+            self.records.append(rec)
+
+    def reset(self):
+        """
+        Forget all the records
+        """
+        with self._lock:
+            self.records = []
+
+    def summary(self):
+        """
+        Summarise the records by category (load, bounds, objective, solve)
+
+        :return: a dict of category and a dict of calls, total_seconds, mean_seconds, max_seconds, and iterations
+        :rtype: dict
+        """
+
+        summary = {}
+        for rec in list(self.records):
+            s = summary.setdefault(rec['category'], {'calls': 0, 'total_seconds': 0.0, 'max_seconds': 0.0,
+                                                     'iterations': 0})
+            s['calls'] += 1
+            s['total_seconds'] += rec['seconds']
+            s['max_seconds'] = max(s['max_seconds'], rec['seconds'])
+            if rec['iterations']:
+                s['iterations'] += rec['iterations']
+        for s in summary.values():
+            s['mean_seconds'] = s['total_seconds'] / s['calls']
+        return summary
+
+    def status_histogram(self):
+        """
+        Count how many solves finished with each status
+
+        :return: a dict of status and the number of solves
+        :rtype: dict
+        """
+
+        histogram = {}
+        for rec in list(self.records):
+            if rec['category'] == 'solve':
+                histogram[rec['status']] = histogram.get(rec['status'], 0) + 1
+        return histogram
+
+    def to_json(self, filename):
+        """
+        Write the summary, the status histogram, and all the records to a JSON file
+
+        :param filename: the file to write
+        :type filename: str
+        :return: void
+        :rtype: void
+        """
+
+        from PyFBA import __version__
+        with open(filename, 'w') as out:
+            json.dump({'pyfba_version': __version__, 'summary': self.summary(),
+                       'status_histogram': self.status_histogram(), 'records': list(self.records)}, out, indent=1)
+
+    def to_csv(self, filename):
+        """
+        Write all the records to a CSV file, one row per call
+
+        :param filename: the file to write
+        :type filename: str
+        :return: void
+        :rtype: void
+        """
+
+        with open(filename, 'w', newline='') as out:
+            writer = csv.DictWriter(out, fieldnames=FIELDS)
+            writer.writeheader()
+            writer.writerows(list(self.records))
+
+    def export(self, filename):
+        """
+        Write the stats as CSV if the filename ends .csv, otherwise as JSON
+
+        :param filename: the file to write
+        :type filename: str
+        :return: void
+        :rtype: void
+        """
+
+        if filename.lower().endswith('.csv'):
+            self.to_csv(filename)
+        else:
+            self.to_json(filename)
+
+
+def enable_instrumentation(export=None):
+    """
+    Start recording the linear programming calls. If we are already recording we keep the same stats.
+
+    :param export: (optional) a file to write the stats to when python exits. The stats are only written once, to the
+    last file that we were given
+    :type export: str
+    :return: the stats object that the records are added to
+    :rtype: SolverStats
+    """
+
+    global _stats, _export, _export_registered
+    if _stats is None:
+        _stats = SolverStats()
+    if export:
+        _export = (_stats, export)
+        if not _export_registered:
+            atexit.register(_export_at_exit)
+            _export_registered = True
+    return _stats
+
+
+def disable_instrumentation():
+    """
+    Stop recording the linear programming calls
+
+    :return: the stats that were recorded, or None if we were not recording
+    :rtype: SolverStats
+    """
+
+    global _stats
+    stats = _stats
+    _stats = None
+    return stats
+
+
+def solver_stats():
+    """
+    The stats that we are recording
+
+    :return: the stats, or None if instrumentation is not enabled
+    :rtype: SolverStats
+    """
+    return _stats
+
+
+def _export_at_exit():
+    """
+    Write the stats to the export file when python exits
+    """
+    if _export is None:
+        return
+    stats, filename = _export
+    try:
+        stats.export(filename)
+    except OSError as e:
+        log_and_message(f"Could not write the solver stats to {filename}: {e}", stderr=True, loglevel="WARNING")
+
+
+def instrumented(category):
+    """
+    A decorator for the methods of a linear programming backend that records each call when instrumentation is
+    enabled. Calls made from inside another instrumented call (e.g. load calling load_sparse) are only counted once.
+
+    :param category: what the method does: load, bounds, objective, or solve
+    :type category: str
+    :return: the decorator
+    """
+
+    def decorate(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            stats = _stats
+            if stats is None or getattr(self, '_instrumenting', False):
+                return method(self, *args, **kwargs)
+            self._instrumenting = True
+            start = time.perf_counter()
+            try:
+                result = method(self, *args, **kwargs)
+            finally:
+                self._instrumenting = False
+            seconds = time.perf_counter() - start
+            nrows, ncols, nnz = self.dimensions()
+            rec = {'backend': self.name, 'category': category, 'method': method.__name__, 'seconds': seconds,
+                   'nrows': nrows, 'ncols': ncols, 'nnz': nnz}
+            if category == 'solve':
+                rec['iterations'] = self.last_iterations
+                rec['status'] = result[0]
+            stats.record(**rec)
+            return result
+        return wrapper
+    return decorate
+
+
+if os.environ.get(STATS_ENVIRONMENT_VARIABLE):
+    enable_instrumentation(export=os.environ[STATS_ENVIRONMENT_VARIABLE])
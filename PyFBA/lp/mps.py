@@ -0,0 +1,281 @@
+"""
+Read and write linear programming problems in free MPS format.
+
+Free MPS is understood by GLPK, HiGHS, CPLEX, Gurobi, and most other solvers, so a problem that we write out can be
+inspected or solved elsewhere, and we can load it back into any of our backends without rebuilding it.
+
+Our row and column names (e.g. "cpd00001: H2O (location: c)") contain spaces, which MPS does not allow, so we
+call the rows R1, R2, ... and the columns C1, C2, ... in the MPS sections and record the real names in comment lines
+at the top of the file. Other readers ignore the comments.
+
+A problem is a dict with the keys:
+    nrows, ncols: the size of the matrix
+    triplets: the non-zero elements as (row index, column index, value) tuples
+    row_bounds, col_bounds: a (lower bound, upper bound) tuple for each row and column. None means unbounded
+    objective: the objective coefficient for each column. We always maximise
+    row_names, col_names: the names of the rows and columns
+
+"""
+
+import math
+
+OBJECTIVE_ROW = 'obj'
+
+
+def _number(x):
+    """
+    Format a number so that it reads back exactly
+
+    :param x: the number
+    :type x: float
+    :rtype: str
+    """
+    x = float(x)
+    if x == int(x) and abs(x) < 1e15:
+        return str(int(x))
+    return repr(x)
+
+
+def _is_unbounded(x):
+    """
+    Is this bound None or infinite?
+
+    :param x: the bound
+    :type x: float
+    :rtype: bool
+    """
+    return x is None or math.isinf(x)
+
+
+def write_mps(filename, problem):
+    """
+    Write a problem to a free MPS file
+
+    :param filename: the file to write
+    :type filename: str
+    :param problem: the problem (see the description at the top of this file)
+    :type problem: dict
+    :return: void
+    :rtype: void
+    """
+
+    nrows = problem['nrows']
+    ncols = problem['ncols']
+    columns = [[] for j in range(ncols)]
+    for i, j, v in problem['triplets']:
+        if v != 0:
+            columns[j].append((i, v))
+
+    with open(filename, 'w') as out:
+        out.write(f"* PyFBA linear programming problem with {nrows} rows and {ncols} columns\n")
+        for i, name in enumerate(problem['row_names']):
+            out.write(f"* ROWNAME R{i + 1} {name}\n")
+        for j, name in enumerate(problem['col_names']):
+            out.write(f"* COLNAME C{j + 1} {name}\n")
+
+        out.write("NAME PyFBA\nOBJSENSE\n    MAX\nROWS\n")
+        out.write(f" N {OBJECTIVE_ROW}\n")
+        rhs = []
+        ranges = []
+        for i, (lower, upper) in enumerate(problem['row_bounds']):
+            if _is_unbounded(lower) and _is_unbounded(upper):
+                # a second N row is a free row
+                out.write(f" N R{i + 1}\n")
+            elif _is_unbounded(lower):
+                out.write(f" L R{i + 1}\n")
+                rhs.append((i, upper))
+            elif _is_unbounded(upper):
+                out.write(f" G R{i + 1}\n")
+                rhs.append((i, lower))
+            elif lower == upper:
+                out.write(f" E R{i + 1}\n")
+                rhs.append((i, lower))
+            else:
+                # a ranged row is lower <= row <= upper, written as row <= upper with a range of upper - lower
+                out.write(f" L R{i + 1}\n")
+                rhs.append((i, upper))
+                ranges.append((i, upper - lower))
+
+        out.write("COLUMNS\n")
+        for j in range(ncols):
+            # every column needs at least one entry, so we always write the objective
+            out.write(f" C{j + 1} {OBJECTIVE_ROW} {_number(problem['objective'][j])}\n")
+            for i, v in columns[j]:
+                out.write(f" C{j + 1} R{i + 1} {_number(v)}\n")
+
+        out.write("RHS\n")
+        for i, v in rhs:
+            if v != 0:
+                out.write(f" RHS R{i + 1} {_number(v)}\n")
+        if ranges:
+            out.write("RANGES\n")
+            for i, v in ranges:
+                out.write(f" RNG R{i + 1} {_number(v)}\n")
+
+        out.write("BOUNDS\n")
+        for j, (lower, upper) in enumerate(problem['col_bounds']):
+            if _is_unbounded(lower) and _is_unbounded(upper):
+                out.write(f" FR BND C{j + 1}\n")
+                continue
+            if not _is_unbounded(lower) and not _is_unbounded(upper) and lower == upper:
+                out.write(f" FX BND C{j + 1} {_number(lower)}\n")
+                continue
+            if _is_unbounded(lower):
+                out.write(f" MI BND C{j + 1}\n")
+            else:
+                out.write(f" LO BND C{j + 1} {_number(lower)}\n")
+            if _is_unbounded(upper):
+                out.write(f" PL BND C{j + 1}\n")
+            else:
+                out.write(f" UP BND C{j + 1} {_number(upper)}\n")
+        out.write("ENDATA\n")
+
+
+def read_mps(filename):
+    """
+    Read a free MPS file. This reads the files that we write, and most other free MPS files for linear
+    problems. If the file does not have an OBJSENSE section we assume that the objective is maximised.
+
+    :param filename: the file to read
+    :type filename: str
+    :return: the problem (see the description at the top of this file)
+    :rtype: dict
+    """
+
+    names = {}
+    row_index = {}
+    row_types = []
+    row_order = []
+    col_index = {}
+    col_order = []
+    triplets = []
+    objective = {}
+    rhs = {}
+    ranges = {}
+    col_lower = {}
+    col_upper = {}
+    objective_row = None
+    minimise = False
+    section = None
+
+    with open(filename, 'r') as f:
+        for line in f:
+            if line.startswith('*'):
+                p = line.rstrip("\n").split(' ', 3)
+                if len(p) >= 3 and p[1] in ('ROWNAME', 'COLNAME'):
+                    names[p[2]] = p[3] if len(p) > 3 else ''
+                continue
+            if not line.strip():
+                continue
+            p = line.split()
+            if not line[0].isspace():
+                section = p[0]
+                if section == 'OBJSENSE' and len(p) > 1:
+                    minimise = p[1].upper() in ('MIN', 'MINIMIZE')
+                if section == 'ENDATA':
+                    break
+                continue
+
+            if section == 'OBJSENSE':
+                minimise = p[0].upper() in ('MIN', 'MINIMIZE')
+            elif section == 'ROWS':
+                rtype, name = p[0].upper(), p[1]
+                if rtype == 'N' and objective_row is None:
+                    objective_row = name
+                    continue
+                if rtype not in ('N', 'E', 'L', 'G'):
+                    raise ValueError(f"Row {name} in {filename} has an unknown type {rtype}")
+                row_index[name] = len(row_order)
+                row_order.append(name)
+                row_types.append(rtype)
+            elif section == 'COLUMNS':
+                if 'MARKER' in p:
+                    raise ValueError(f"{filename} has integer markers, but we can only read linear problems")
+                name = p[0]
+                if name not in col_index:
+                    col_index[name] = len(col_order)
+                    col_order.append(name)
+                for k in range(1, len(p) - 1, 2):
+                    row, v = p[k], float(p[k + 1])
+                    if row == objective_row:
+                        objective[col_index[name]] = v
+                    elif row in row_index:
+                        triplets.append((row_index[row], col_index[name], v))
+                    else:
+                        raise ValueError(f"Column {name} in {filename} uses row {row} that is not in ROWS")
+            elif section in ('RHS', 'RANGES'):
+                # the set name is optional
+                if len(p) % 2:
+                    p = p[1:]
+                for k in range(0, len(p) - 1, 2):
+                    row, v = p[k], float(p[k + 1])
+                    if row == objective_row:
+                        continue
+                    if row not in row_index:
+                        raise ValueError(f"{section} in {filename} uses row {row} that is not in ROWS")
+                    if section == 'RHS':
+                        rhs[row_index[row]] = v
+                    else:
+                        ranges[row_index[row]] = v
+            elif section == 'BOUNDS':
+                btype = p[0].upper()
+                # the bound set name is optional
+                if btype in ('FR', 'MI', 'PL', 'BV'):
+                    name = p[-1]
+                    value = None
+                else:
+                    name = p[-2]
+                    value = float(p[-1])
+                if name not in col_index:
+                    raise ValueError(f"BOUNDS in {filename} uses column {name} that is not in COLUMNS")
+                j = col_index[name]
+                if btype == 'LO':
+                    col_lower[j] = value
+                elif btype == 'UP':
+                    col_upper[j] = value
+                elif btype == 'FX':
+                    col_lower[j] = value
+                    col_upper[j] = value
+                elif btype == 'FR':
+                    col_lower[j] = None
+                    col_upper[j] = None
+                elif btype == 'MI':
+                    col_lower[j] = None
+                elif btype == 'PL':
+                    col_upper[j] = None
+                else:
+                    raise ValueError(f"Column {name} in {filename} has a bound of type {btype} that we can not use")
+
+    row_bounds = []
+    for i, rtype in enumerate(row_types):
+        b = rhs.get(i, 0.0)
+        r = ranges.get(i)
+        if rtype == 'N':
+            row_bounds.append((None, None))
+        elif rtype == 'L':
+            row_bounds.append((None, b) if r is None else (b - abs(r), b))
+        elif rtype == 'G':
+            row_bounds.append((b, None) if r is None else (b, b + abs(r)))
+        elif r is None or r == 0:
+            row_bounds.append((b, b))
+        elif r > 0:
+            row_bounds.append((b, b + r))
+        else:
+            row_bounds.append((b + r, b))
+
+    ncols = len(col_order)
+    col_bounds = [(col_lower.get(j, 0.0), col_upper.get(j)) for j in range(ncols)]
+    obj = [objective.get(j, 0.0) for j in range(ncols)]
+    if minimise:
+        obj = [0.0 - c for c in obj]
+
+    return {
+        'nrows': len(row_order),
+        'ncols': ncols,
+        'triplets': triplets,
+        'row_bounds': row_bounds,
+        'col_bounds': col_bounds,
+        'objective': obj,
+        'row_names': [names.get(r, r) for r in row_order],
+        'col_names': [names.get(c, c) for c in col_order],
+    }
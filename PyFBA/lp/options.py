@@ -0,0 +1,77 @@
+"""
+Options that control how the linear programming solver runs.
+
+By default we run the solver with its own defaults. Use a SolverOptions object to turn presolve on or off, cap the
+number of iterations or the time that a solve can take, change the feasibility tolerances, or choose between primal
+simplex, dual simplex, and the interior point method. e.g.
+
+    options = PyFBA.lp.SolverOptions(time_limit=10, method='dual')
+    status, value, growth = PyFBA.fba.run_fba(modeldata, reactions, media, biomass, options=options)
+
+If a solve stops because it hit the iteration or time limit, the status is 'itlim' or 'tmlim' rather than one of the
+usual status names, so you can tell a stalled solve from a model that does not grow.
+
+"""
+
+"""
+The methods that we know about
+"""
+METHODS = ('primal', 'dual', 'interior')
+
+"""
+The statuses that solve() returns if the solver stopped before it finished
+"""
+ITERATION_LIMIT = 'itlim'
+TIME_LIMIT = 'tmlim'
+LIMIT_STATUSES = (ITERATION_LIMIT, TIME_LIMIT)
+
+
+class SolverOptions:
+    """
+    The options for a linear programming solve. Anything that is None is left at the solver's default.
+
+    :ivar method: primal (primal simplex), dual (dual simplex), or interior (interior point)
+    :ivar presolve: whether to run the presolver
+    :ivar iteration_limit: the maximum number of simplex iterations
+    :ivar time_limit: the maximum time for each solve, in seconds
+    :ivar primal_tolerance: the tolerance for primal feasibility (how far a row or column can be outside its bounds)
+    :ivar dual_tolerance: the tolerance for dual feasibility (how far a reduced cost can have the wrong sign)
+    """
+
+    def __init__(self, method='primal', presolve=None, iteration_limit=None, time_limit=None,
+                 primal_tolerance=None, dual_tolerance=None):
+        """
+        Create a new set of options.
+
+        :param method: primal (primal simplex, the default), dual (dual simplex), or interior (interior point)
+        :type method: str
+        :param presolve: whether to run the presolver. None leaves it at the solver's default
+        :type presolve: bool
+        :param iteration_limit: the maximum number of simplex iterations
+        :type iteration_limit: int
+        :param time_limit: the maximum time for each solve, in seconds
+        :type time_limit: float
+        :param primal_tolerance: the tolerance for primal feasibility
+        :type primal_tolerance: float
+        :param dual_tolerance: the tolerance for dual feasibility
+        :type dual_tolerance: float
+        """
+
+        if method not in METHODS:
+            raise ValueError(f"Solver method {method} is not known. We only know about: " + ", ".join(METHODS))
+        if iteration_limit is not None and iteration_limit < 0:
+            raise ValueError(f"The iteration limit ({iteration_limit}) can not be negative")
+        if time_limit is not None and time_limit < 0:
+            raise ValueError(f"The time limit ({time_limit}) can not be negative")
+
+        self.method = method
+        self.presolve = presolve
+        self.iteration_limit = iteration_limit
+        self.time_limit = time_limit
+        self.primal_tolerance = primal_tolerance
+        self.dual_tolerance = dual_tolerance
+
+    def __repr__(self):
+        return (f"SolverOptions(method={self.method!r}, presolve={self.presolve}, "
+                f"iteration_limit={self.iteration_limit}, time_limit={self.time_limit}, "
+                f"primal_tolerance={self.primal_tolerance}, dual_tolerance={self.dual_tolerance})")
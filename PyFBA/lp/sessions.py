@@ -0,0 +1,157 @@
+"""
+
+Choose the linear programming backend, and keep a default session for each backend.
+
+There are currently two backends:
+    glpk:  GLPK through pyglpk (the default)
+    highs: HiGHS through scipy.optimize.linprog
+
+You can choose the backend for a single call (e.g. PyFBA.fba.run_fba(..., backend='highs')) or for everything by
+setting the environment variable PYFBA_LP_BACKEND, e.g.
+
+    export PYFBA_LP_BACKEND=highs
+
+The module level functions (load, solve, etc.) are a thin wrapper around the default session
+of the default backend so that existing code keeps working.
+
+"""
+
+import os
+
+from .glpk_solver import LPSession
+from .highs_solver import HiGHSSession
+
+BACKEND_ENVIRONMENT_VARIABLE = 'PYFBA_LP_BACKEND'
+
+backends = {
+    'glpk': LPSession,
+    'highs': HiGHSSession,
+}
+
+_default_sessions = {}
+
+
+def default_backend():
+    """
+    The name of the default backend. This is PYFBA_LP_BACKEND if it is set, otherwise glpk
+
+    :return: the name of the backend
+    :rtype: str
+    """
+
+    name = os.environ.get(BACKEND_ENVIRONMENT_VARIABLE, 'glpk').strip().lower()
+    if name not in backends:
+        raise ValueError(f"{BACKEND_ENVIRONMENT_VARIABLE} is {name} but we only know about the backends: " +
+                         ", ".join(backends))
+    return name
+
+
+def new_session(backend=None):
+    """
+    Create a new, empty, session
+
+    :param backend: the name of the backend to use. If not provided we use the default backend
+    :type backend: str
+    :return: a new session
+    :rtype: PyFBA.lp.backend.LPBackend
+    """
+
+    if backend is None:
+        backend = default_backend()
+    if backend not in backends:
+        raise ValueError(f"Backend {backend} is not known. We only know about the backends: " + ", ".join(backends))
+    return backends[backend]()
+
+
+def default_session(backend=None):
+    """
+    Get the default session for a backend. This is created the first time that you ask for it
+
+    :param backend: the name of the backend. If not provided we use the default backend
+    :type backend: str
+    :return: the default session
+    :rtype: PyFBA.lp.backend.LPBackend
+    """
+
+    if backend is None:
+        backend = default_backend()
+    if backend not in _default_sessions:
+        _default_sessions[backend] = new_session(backend)
+    return _default_sessions[backend]
+
+
+def load(matrix, rowheaders=None, colheaders=None, verbose=False):
+    """
+    Load the data matrix into the default session. See LPSession.load
+    """
+    default_session().load(matrix, rowheaders, colheaders, verbose)
+
+
+def load_sparse(triplets, nrows, ncols, rowheaders=None, colheaders=None, verbose=False):
+    """
+    Load a sparse matrix of (row, column, value) triplets into the default session. See LPSession.load_sparse
+    """
+    default_session().load_sparse(triplets, nrows, ncols, rowheaders, colheaders, verbose)
+
+
+def load_csr(indptr, indices, data, ncols, rowheaders=None, colheaders=None, verbose=False):
+    """
+    Load a compressed sparse row matrix into the default session. See LPBackend.load_csr
+    """
+    default_session().load_csr(indptr, indices, data, ncols, rowheaders, colheaders, verbose)
+
+
+def row_bounds(bounds):
+    """
+    Set the bounds for the rows in the default session. See LPSession.row_bounds
+    """
+    default_session().row_bounds(bounds)
+
+
+def col_bounds(bounds):
+    """
+    Set the bounds for the columns in the default session. See LPSession.col_bounds
+    """
+    default_session().col_bounds(bounds)
+
+
+def objective_coefficients(coeff):
+    """
+    Set the objective coefficients in the default session. See LPSession.objective_coefficients
+    """
+    default_session().objective_coefficients(coeff)
+
+
+def solve(options=None):
+    """
+    Solve the default session and return the status and the objective function value. See LPSession.solve
+    """
+    return default_session().solve(options)
+
+
+def col_primal_hash():
+    """
+    Return a hash of the column names and primals of the default session. See LPSession.col_primal_hash
+    """
+    return default_session().col_primal_hash()
+
+
+def col_primals():
+    """
+    Return a list of the column primals of the default session. See LPSession.col_primals
+    """
+    return default_session().col_primals()
+
+
+def row_primal_hash():
+    """
+    Return a hash of the row names and primals of the default session. See LPSession.row_primal_hash
+    """
+    return default_session().row_primal_hash()
+
+
+def row_primals():
+    """
+    Return a list of the row primals of the default session. See LPSession.row_primals
+    """
+    return default_session().row_primals()
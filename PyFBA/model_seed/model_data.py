@@ -1,6 +1,8 @@
 """
 
 """
+import threading
+import uuid
 from typing import Dict, Set
 
 import PyFBA
@@ -17,6 +19,8 @@ class ModelData:
      :ivar compounds: a dict of compound id -> compound objects
      :ivar reactions: a dict of organism type -> dict(reaction id -> reaction objects).
      :ivar enzymes:a dict of enzyme id -> enzyme objects
+     :ivar token: a unique id for this object, which changes when it is copied or the universal matrix is rebuilt. The
+     model cache uses it to tell models from different ModelData objects apart
 
      """
     compounds: Set[PyFBA.metabolism.Compound]
@@ -37,10 +41,34 @@ class ModelData:
         self.compounds_by_name = {}
         self.last_compound_by_id_sz = 0
         self.last_compound_by_name_sz = 0
+        self._universal_matrix = None
+        self._universal_matrix_sz = 0
+        self._universal_matrix_lock = threading.Lock()
+        self._boundary_templates = None
+        self.token = uuid.uuid4().hex
+
+    def __getstate__(self):
+        """
+        A lock can not be pickled or copied, so we leave it out and make a new one
+        """
+        state = self.__dict__.copy()
+        del state['_universal_matrix_lock']
+        # the templates are cheap to make again, and pickling reactions loses their compounds
+        state['_boundary_templates'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._universal_matrix_lock = threading.Lock()
+        # a copy can change without the original changing, so it is a different model
+        self.token = uuid.uuid4().hex
 
     def reset(self):
         self.compounds = set()
         self.reactions = {}
+        self._universal_matrix = None
+        self._boundary_templates = None
+        self.token = uuid.uuid4().hex
         self.enzymes = None
         self.complexes = None
         self.roles = None
@@ -56,6 +84,70 @@ class ModelData:
         self.last_compound_by_id_sz = len(self.compounds)
         self.last_compound_by_name_sz = len(self.compounds)
 
+    def universal_matrix(self, rebuild=False, verbose=False):
+        """
+        The sparse stoichiometric matrix for all the reactions. This is compiled the first time you ask for it, and
+        any reactions that have been added since are compiled the next time. See PyFBA.fba.universal_matrix
+
+        :param rebuild: compile the whole matrix again, e.g. if you have changed a reaction in place
+        :type rebuild: bool
+        :param verbose: more output
+        :type verbose: bool
+        :return: the matrix
+        :rtype: PyFBA.fba.UniversalMatrix
+        """
+
+        # several pure FBAs may share this object, so only one of them compiles the matrix
+        with self._universal_matrix_lock:
+            if rebuild or self._universal_matrix is None:
+                self._universal_matrix = PyFBA.fba.UniversalMatrix(self.reactions, verbose=verbose)
+                if rebuild:
+                    # the reactions have been changed in place, so any models that we have compiled are out of date
+                    self.token = uuid.uuid4().hex
+            elif len(self.reactions) != self._universal_matrix_sz:
+                self._universal_matrix.add_reactions(self.reactions)
+            self._universal_matrix_sz = len(self.reactions)
+            return self._universal_matrix
+
+    def compound_table(self):
+        """
+        The interning table that gives every compound (with its location) a dense integer id. These are the row numbers
+        of the universal matrix, and you can intern other compounds (e.g. from the media) too. The ids are the same
+        until the universal matrix is rebuilt. See PyFBA.fba.interning
+
+        :return: the table
+        :rtype: PyFBA.fba.interning.InternTable
+        """
+        return self.universal_matrix().compound_table
+
+    def reaction_table(self):
+        """
+        The interning table that gives every reaction id in the universal matrix a dense integer id. These are the
+        column numbers of the universal matrix, so only the universal matrix adds reactions to this table. The ids are
+        the same until the universal matrix is rebuilt. See PyFBA.fba.interning
+
+        :return: the table
+        :rtype: PyFBA.fba.interning.InternTable
+        """
+        return self.universal_matrix().reaction_table
+
+    def boundary_templates(self, verbose=False):
+        """
+        The template uptake and secretion reactions for every external compound in the universal matrix. These are
+        made the first time you ask for them, and templates for other compounds (e.g. from an SBML file) are added as
+        they are needed. See PyFBA.fba.external_reactions
+
+        :param verbose: more output
+        :type verbose: bool
+        :return: a dict of compound and template reaction
+        :rtype: dict
+        """
+
+        if self._boundary_templates is None:
+            um = self.universal_matrix(verbose=verbose)
+            self._boundary_templates = PyFBA.fba.boundary_templates(um.compounds)
+        return self._boundary_templates
+
     def get_compound_by_name(self, name) -> PyFBA.metabolism.Compound:
         """
         Retrieve a compound by its name. We use self.last_compound_by_name_sz to see if compounds has changed
@@ -1,8 +1,13 @@
 import os
+import pickle
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 import unittest
 
 import sys
 
+import numpy as np
+
 import PyFBA
 
 test_file_loc = os.path.dirname(os.path.realpath(__file__))
@@ -16,6 +21,25 @@ class TestFBA(unittest.TestCase):
         This is run before everything else
         """
 
+    def growth_fixture(self):
+        """
+        The reactions in reaction_list.txt, the ArgonneLB media, and the gram negative biomass equation: a model that
+        grows. Each call makes new objects, so a test can change them.
+
+        :rtype: set, set, PyFBA.metabolism.Reaction
+        """
+        reactions2run = set()
+        with open(os.path.join(test_file_loc, 'reaction_list.txt'), 'r') as f:
+            for lf in f:
+                if lf.startswith('#') or "biomass" in lf.lower():
+                    continue
+                r = lf.strip()
+                if r in self.__class__.modeldata.reactions:
+                    reactions2run.add(r)
+        media = PyFBA.parse.pyfba_media('ArgonneLB', self.__class__.modeldata)
+        biomass = PyFBA.metabolism.biomass_equation('gram_negative')
+        return reactions2run, media, biomass
+
     def test_external_reactions(self):
         """Testing the fba external reactions"""
         compounds = self.__class__.modeldata.compounds
@@ -33,6 +57,31 @@ class TestFBA(unittest.TestCase):
         emptyset = PyFBA.fba.remove_uptake_and_secretion_reactions(upsec)
         self.assertEqual(len(emptyset), 0)
 
+    def test_boundary_templates(self):
+        """Test making the uptake and secretion reactions from templates"""
+        templates = self.__class__.modeldata.boundary_templates()
+        self.assertTrue(templates)
+        self.assertTrue(all(c.location == 'e' or c.name == 'Biomass' for c in templates))
+        cpds = set(list(templates)[0:10])
+        media = set(list(cpds)[0:3])
+        upsec = PyFBA.fba.uptake_and_secretion_reactions(cpds, media, start=5, link_compounds=False,
+                                                         templates=templates)
+        self.assertEqual(len(upsec), 10)
+        self.assertEqual(set(upsec), {f"upsr_{i}" for i in range(5, 15)})
+        for r in upsec.values():
+            left = next(iter(r.left_compounds))
+            self.assertIn(left, cpds)
+            self.assertEqual(next(iter(r.right_compounds)).location, 'b')
+            self.assertEqual(r.lower_bound, -1000 if left in media else 0)
+            # the reactions do not share any state with the template
+            self.assertIsNot(r.left_compounds, templates[left].left_compounds)
+            self.assertIsNone(templates[left].lower_bound)
+
+        # compounds without a template get one
+        templates = {}
+        PyFBA.fba.uptake_and_secretion_reactions(cpds, set(), templates=templates)
+        self.assertEqual(set(templates), cpds)
+
     def test_create_sm(self):
         """Test the stoichiometric matrix"""
 
@@ -50,23 +99,549 @@ class TestFBA(unittest.TestCase):
         self.assertGreaterEqual(len(upsr), 1)
         self.assertLessEqual(len(upsr), 35000)
 
+    def test_universal_matrix(self):
+        """Test that the universal matrix has the same entries as the reactions"""
+        um = self.__class__.modeldata.universal_matrix()
+        reactions = [r for r in sorted(self.__class__.modeldata.reactions)[0:50] if r in um.rxnindex]
+        self.assertGreater(len(reactions), 10)
+        rows, cols, vals = um.column_slice(reactions)
+        for k, r in enumerate(reactions):
+            entries = {um.compounds[rows[e]]: vals[e] for e in range(len(rows)) if cols[e] == k}
+            rxn = self.__class__.modeldata.reactions[r]
+            self.assertEqual(entries, PyFBA.fba.universal_matrix.reaction_entries(rxn))
+        # uptake and secretion reactions are never compiled
+        self.assertFalse(any(r.startswith('upsr') for r in um.rxnindex))
+
+    def test_interning(self):
+        """Test the interning tables of compounds and reactions"""
+        table = PyFBA.fba.InternTable(['a', 'b'])
+        self.assertEqual(table.intern('c'), 2)
+        self.assertEqual(table.intern('a'), 0)
+        self.assertEqual(table.intern_all(['b', 'c', 'd']).tolist(), [1, 2, 3])
+        self.assertEqual(table.get('e'), -1)
+        self.assertNotIn('e', table)
+        bits = table.bitset(['a', 'd', 'e'])
+        self.assertEqual(bits.tolist(), [True, False, False, True])
+        self.assertEqual(table.from_bitset(bits), ['a', 'd'])
+
+        modeldata = self.__class__.modeldata
+        compounds = modeldata.compound_table()
+        reactions = modeldata.reaction_table()
+        um = modeldata.universal_matrix()
+        r = um.reactions[0]
+        self.assertEqual(reactions.get(r), 0)
+        rows, cols, vals = um.column_slice([r])
+        self.assertEqual(set(compounds.lookup(rows.tolist())), modeldata.reactions[r].all_compounds())
+
+    def test_reaction_bounds_array(self):
+        """Test that the vectorised bounds are the same as the bounds for each reaction"""
+        modeldata = self.__class__.modeldata
+        media = self.__class__.media
+        biomass = PyFBA.metabolism.biomass_equation('gram_negative')
+        reactions2run = set(sorted(modeldata.reactions)[0:200])
+        cp, rc, upsr = PyFBA.fba.create_stoichiometric_matrix(reactions2run, modeldata, media, biomass)
+        lower, upper = PyFBA.fba.reaction_bounds_array(modeldata, rc, media)
+        rbvals = PyFBA.fba.calculate_reaction_bounds(modeldata.reactions, rc, media)
+        self.assertEqual(list(zip(lower.tolist(), upper.tolist())), [rbvals[r] for r in rc])
+        PyFBA.fba.remove_uptake_and_secretion_reactions(modeldata.reactions)
+
+        # only the uptake and secretion reactions for compounds that move in or out of the media change
+        by_compound = PyFBA.fba.uptake_secretion_index(upsr)
+        in_media = [c for c in by_compound if c in media]
+        self.assertTrue(in_media)
+        changes = PyFBA.fba.media_bounds_delta(by_compound, media, set(media) - {in_media[0]})
+        self.assertEqual(changes, {r: (0.0, 1000.0) for r in by_compound[in_media[0]]})
+        self.assertEqual(PyFBA.fba.media_bounds_delta(by_compound, media, media), {})
+
+    def test_bounds_changed_in_place(self):
+        """Test that changing the bounds of a reaction in place after a run changes the next run"""
+        modeldata = self.__class__.modeldata
+        reactions2run, media, biomass = self.growth_fixture()
+        cache = PyFBA.fba.ModelCache()
+        wild_type = PyFBA.fba.run_fba(modeldata, reactions2run, media, biomass, pure=True, cache=cache)
+        top = sorted(reactions2run, key=lambda r: -abs(wild_type.flux(r)))[0:20]
+        original = {r: (modeldata.reactions[r].lower_bound, modeldata.reactions[r].upper_bound) for r in top}
+        try:
+            for r in top:
+                modeldata.reactions[r].lower_bound = modeldata.reactions[r].upper_bound = 0
+            for kwargs in ({'pure': True}, {'pure': True, 'cache': cache}, {}):
+                result = PyFBA.fba.run_fba(modeldata, reactions2run, media, biomass, **kwargs)
+                PyFBA.fba.remove_uptake_and_secretion_reactions(modeldata.reactions)
+                self.assertLess(result.value, wild_type.value)
+                self.assertEqual([result.flux(r) for r in top], [0] * len(top))
+                self.assertEqual((modeldata.reactions[top[0]].lower_bound, modeldata.reactions[top[0]].upper_bound),
+                                 (0, 0))
+        finally:
+            for r, (lower, upper) in original.items():
+                modeldata.reactions[r].lower_bound, modeldata.reactions[r].upper_bound = lower, upper
+
     def test_run_fba(self):
         """Test running the fba. We build a run a complete FBA based on reaction_list.txt"""
         self.assertTrue(os.path.exists(os.path.join(test_file_loc, 'reaction_list.txt')))
-        reactions2run = set()
-        with open(os.path.join(test_file_loc, 'reaction_list.txt'), 'r') as f:
-            for lf in f:
-                if lf.startswith('#'):
-                    continue
-                if "biomass" in lf.lower():
-                    continue
-                r = lf.strip()
-                if r in self.__class__.modeldata.reactions:
-                    reactions2run.add(r)
-        media = PyFBA.parse.pyfba_media('ArgonneLB', self.__class__.modeldata)
-        biomass = PyFBA.metabolism.biomass_equation('gram_negative')
+        reactions2run, media, biomass = self.growth_fixture()
         status, value, growth = PyFBA.fba.run_fba(self.__class__.modeldata, reactions2run, media, biomass,
                                                   verbose=False)
         self.assertTrue(growth)
         value = float('%0.3f' % value)
         self.assertGreaterEqual(value, 200)
+
+    def test_run_fba_options(self):
+        """Test that hitting the iteration limit stops the fba without growth"""
+        reactions2run, media, biomass = self.growth_fixture()
+        options = PyFBA.lp.SolverOptions(iteration_limit=1, presolve=False)
+        status, value, growth = PyFBA.fba.run_fba(self.__class__.modeldata, reactions2run, media, biomass,
+                                                  options=options)
+        self.assertEqual(status, 'itlim')
+        self.assertFalse(growth)
+
+    def test_snapshot(self):
+        """Test saving the fba problem and loading it the next time we run the same fba"""
+        reactions2run, media, biomass = self.growth_fixture()
+        key = PyFBA.fba.lp_snapshot.snapshot_key(self.__class__.modeldata, reactions2run, media, biomass)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            status, value, growth = PyFBA.fba.run_fba(self.__class__.modeldata, reactions2run, media, biomass,
+                                                      snapshot_dir=tmpdir)
+            self.assertTrue(growth)
+            self.assertTrue(os.path.exists(PyFBA.fba.lp_snapshot.snapshot_file(tmpdir, key)))
+            # building the problem adds the uptake and secretion reactions to modeldata
+            self.assertTrue(any(r.startswith('upsr') for r in self.__class__.modeldata.reactions))
+            PyFBA.fba.remove_uptake_and_secretion_reactions(self.__class__.modeldata.reactions)
+            # running the fba does not change the key, so the second time we load the snapshot
+            self.assertEqual(key, PyFBA.fba.lp_snapshot.snapshot_key(self.__class__.modeldata, reactions2run,
+                                                                     media, biomass))
+            session = PyFBA.lp.new_session()
+            self.assertTrue(PyFBA.fba.lp_snapshot.load_snapshot(tmpdir, key, session))
+            status, snapshot_value, snapshot_growth = PyFBA.fba.run_fba(self.__class__.modeldata, reactions2run,
+                                                                        media, biomass, snapshot_dir=tmpdir,
+                                                                        session=session)
+            self.assertTrue(snapshot_growth)
+            self.assertAlmostEqual(value, snapshot_value, places=3)
+            # loading the snapshot does not build the problem, so it does not change modeldata
+            self.assertFalse(any(r.startswith('upsr') for r in self.__class__.modeldata.reactions))
+            self.assertIn('BIOMASS_EQN', PyFBA.fba.reaction_fluxes(session=session))
+
+            # with a cache too, a cache miss loads the snapshot rather than building the model and saving it again
+            mtime = os.path.getmtime(PyFBA.fba.lp_snapshot.snapshot_file(tmpdir, key))
+            cache = PyFBA.fba.ModelCache()
+            status, cached_value, cached_growth = PyFBA.fba.run_fba(self.__class__.modeldata, reactions2run, media,
+                                                                    biomass, snapshot_dir=tmpdir, cache=cache,
+                                                                    session=PyFBA.lp.new_session())
+            self.assertAlmostEqual(value, cached_value, places=3)
+            self.assertEqual(cache.misses, 1)
+            self.assertEqual(len(cache), 0)
+            self.assertEqual(mtime, os.path.getmtime(PyFBA.fba.lp_snapshot.snapshot_file(tmpdir, key)))
+
+        # a different media gives a different key
+        self.assertNotEqual(key, PyFBA.fba.lp_snapshot.snapshot_key(self.__class__.modeldata, reactions2run,
+                                                                    set(), biomass))
+        # and so does changing the bounds of a reaction in place
+        rxn = self.__class__.modeldata.reactions[sorted(reactions2run)[0]]
+        bounds = rxn.lower_bound, rxn.upper_bound
+        rxn.lower_bound = rxn.upper_bound = 0
+        try:
+            self.assertNotEqual(key, PyFBA.fba.lp_snapshot.snapshot_key(self.__class__.modeldata, reactions2run,
+                                                                        media, biomass))
+        finally:
+            rxn.lower_bound, rxn.upper_bound = bounds
+        self.assertEqual(key, PyFBA.fba.lp_snapshot.snapshot_key(self.__class__.modeldata, reactions2run, media,
+                                                                 biomass))
+
+    def test_model_cache(self):
+        """Test that running the same fba again loads the compiled model from the cache"""
+        reactions2run, media, biomass = self.growth_fixture()
+        cache = PyFBA.fba.ModelCache(maxsize=1)
+        status, value, growth = PyFBA.fba.run_fba(self.__class__.modeldata, reactions2run, media, biomass,
+                                                  cache=cache)
+        self.assertTrue(growth)
+        self.assertEqual(cache.stats(), {'hits': 0, 'misses': 1, 'size': 1, 'maxsize': 1})
+        PyFBA.fba.remove_uptake_and_secretion_reactions(self.__class__.modeldata.reactions)
+        status, cached_value, cached_growth = PyFBA.fba.run_fba(self.__class__.modeldata, reactions2run, media,
+                                                                biomass, cache=cache)
+        self.assertTrue(cached_growth)
+        self.assertAlmostEqual(value, cached_value, places=3)
+        self.assertEqual(cache.hits, 1)
+        # the uptake and secretion reactions are put back
+        self.assertTrue(any(r.startswith('upsr') for r in self.__class__.modeldata.reactions))
+
+        # a different media is a miss, and pushes the first model out of the cache
+        PyFBA.fba.run_fba(self.__class__.modeldata, reactions2run, set(), biomass, cache=cache)
+        self.assertEqual(cache.misses, 2)
+        self.assertEqual(len(cache), 1)
+        self.assertNotIn(PyFBA.fba.model_cache.model_fingerprint(self.__class__.modeldata, reactions2run, media,
+                                                                 biomass), cache)
+        with self.assertRaises(ValueError):
+            cache.maxsize = -1
+
+        # the fingerprint changes for a different (or copied, or rebuilt) ModelData, even with the same reactions
+        first = PyFBA.model_seed.ModelData()
+        fingerprint = PyFBA.fba.model_cache.model_fingerprint(first, set(), media, biomass)
+        copied = pickle.loads(pickle.dumps(first))
+        self.assertNotEqual(PyFBA.fba.model_cache.model_fingerprint(copied, set(), media, biomass), fingerprint)
+        self.assertNotEqual(PyFBA.fba.model_cache.model_fingerprint(PyFBA.model_seed.ModelData(), set(), media,
+                                                                    biomass), fingerprint)
+        self.assertEqual(PyFBA.fba.model_cache.model_fingerprint(first, set(), media, biomass), fingerprint)
+        first.universal_matrix(rebuild=True)
+        self.assertNotEqual(PyFBA.fba.model_cache.model_fingerprint(first, set(), media, biomass), fingerprint)
+
+    def test_pure_run_fba(self):
+        """Test that a pure fba does not change modeldata, and that pure fbas can run in threads"""
+        reactions2run, media, biomass = self.growth_fixture()
+        reactions = self.__class__.modeldata.reactions
+        PyFBA.fba.remove_uptake_and_secretion_reactions(reactions)
+        before = {r: (reactions[r].lower_bound, reactions[r].upper_bound) for r in reactions}
+
+        context = PyFBA.fba.FBAContext()
+        status, value, growth = PyFBA.fba.run_fba(self.__class__.modeldata, reactions2run, media, biomass,
+                                                  context=context)
+        self.assertTrue(growth)
+        self.assertEqual(before, {r: (reactions[r].lower_bound, reactions[r].upper_bound) for r in reactions})
+        self.assertTrue(context.uptake_secretion)
+        self.assertEqual(context.rc[-1], 'BIOMASS_EQN')
+        upsr = next(iter(context.uptake_secretion))
+        self.assertIn(upsr, context.reactions)
+        self.assertNotIn(upsr, reactions)
+        self.assertEqual(context.upper_bound(upsr), 1000)
+        self.assertAlmostEqual(context.fluxes()['BIOMASS_EQN'], value, places=3)
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            results = list(executor.map(
+                lambda m: PyFBA.fba.run_fba(self.__class__.modeldata, reactions2run, m, biomass, pure=True),
+                [media, media]))
+        for status, thread_value, thread_growth in results:
+            self.assertAlmostEqual(value, thread_value, places=3)
+        self.assertEqual(before, {r: (reactions[r].lower_bound, reactions[r].upper_bound) for r in reactions})
+
+    def test_fba_result(self):
+        """Test that the fba result keeps the solution after the session has moved on"""
+        reactions2run, media, biomass = self.growth_fixture()
+        session = PyFBA.lp.new_session()
+        result = PyFBA.fba.run_fba(self.__class__.modeldata, reactions2run, media, biomass, session=session,
+                                   pure=True)
+        status, value, growth = result
+        self.assertTrue(growth)
+        self.assertEqual(result.value, value)
+        self.assertIs(result.col_names, session.cached_col_names())
+        self.assertAlmostEqual(result.flux('BIOMASS_EQN'), value, places=3)
+        self.assertEqual(result.fluxes, session.col_primal_hash())
+        self.assertEqual(len(result.shadow_prices), len(session.cached_row_names()))
+        self.assertEqual(result.fingerprint, PyFBA.fba.model_cache.model_fingerprint(
+            self.__class__.modeldata, reactions2run, media, biomass))
+        self.assertGreaterEqual(result.seconds, 0)
+
+        # the second result shares the names, and the first one still has its own fluxes
+        second = PyFBA.fba.run_fba(self.__class__.modeldata, reactions2run, set(), biomass, session=session,
+                                   pure=True)
+        self.assertFalse(second.growth)
+        self.assertAlmostEqual(result.flux('BIOMASS_EQN'), value, places=3)
+
+        copied = pickle.loads(pickle.dumps(result))
+        self.assertEqual(tuple(copied), tuple(result))
+        self.assertEqual(copied.fingerprint, result.fingerprint)
+        self.assertEqual(copied.fluxes, result.fluxes)
+
+    def test_run_fba_batch(self):
+        """Test that running one model on several media gives the same answers as running each medium"""
+        reactions2run, _, biomass = self.growth_fixture()
+        media = [PyFBA.parse.pyfba_media(m, self.__class__.modeldata)
+                 for m in ['MOPS_NoC_D-Glucose', 'ArgonneLB', 'MOPS_NoC_Citric_Acid']]
+        media.append(set())
+        results = PyFBA.fba.run_fba_batch(self.__class__.modeldata, reactions2run, media, biomass)
+        self.assertEqual(len(results), len(media))
+        self.assertFalse(any(r.startswith('upsr') for r in self.__class__.modeldata.reactions))
+        for m, result in zip(media, results):
+            status, value, growth = PyFBA.fba.run_fba(self.__class__.modeldata, reactions2run, m, biomass)
+            PyFBA.fba.remove_uptake_and_secretion_reactions(self.__class__.modeldata.reactions)
+            self.assertEqual(result.growth, growth)
+            self.assertAlmostEqual(result.value, value, places=3)
+        self.assertTrue(results[1].growth)
+        self.assertEqual(PyFBA.fba.run_fba_batch(self.__class__.modeldata, reactions2run, [], biomass), [])
+
+    def test_calculate_precision_recall(self):
+        """Test that the precision and recall counts are the same as running the fba on each medium"""
+        modeldata = self.__class__.modeldata
+        reactions2run, media, biomass = self.growth_fixture()
+        growth_media = [media, PyFBA.parse.pyfba_media('MOPS_NoC_D-Glucose', modeldata)]
+        no_growth_media = [set(), PyFBA.parse.pyfba_media('MOPS_NoC_Citric_Acid', modeldata)]
+        growths = []
+        for m in growth_media + no_growth_media:
+            status, value, growth = PyFBA.fba.run_fba(modeldata, reactions2run, m, biomass)
+            PyFBA.fba.remove_uptake_and_secretion_reactions(modeldata.reactions)
+            growths.append(growth)
+        expected = PyFBA.gapfill.reaction_minimization._count_growth(growths, len(growth_media))
+        self.assertEqual(expected['tp'] + expected['fn'], len(growth_media))
+        for feasibility in [False, True]:
+            for cache in [None, PyFBA.fba.ModelCache()]:
+                counts = PyFBA.gapfill.calculate_precision_recall(growth_media, no_growth_media, modeldata,
+                                                                  reactions2run, biomass, cache=cache,
+                                                                  feasibility=feasibility)
+                self.assertEqual(counts, expected)
+        self.assertFalse(any(r.startswith('upsr') for r in modeldata.reactions))
+
+    def test_feasibility(self):
+        """Test that the feasibility mode agrees with the fba about growth"""
+        reactions2run, media, biomass = self.growth_fixture()
+        for m in [media, set()]:
+            status, value, growth = PyFBA.fba.run_fba(self.__class__.modeldata, reactions2run, m, biomass, pure=True)
+            status, feasible_value, feasible_growth = PyFBA.fba.run_fba(self.__class__.modeldata, reactions2run, m,
+                                                                        biomass, pure=True, feasibility=True)
+            self.assertIs(feasible_growth, growth)
+            if growth:
+                self.assertGreater(feasible_value, PyFBA.fba.feasibility.GROWTH_THRESHOLD)
+                self.assertLessEqual(feasible_value, value + 1e-6)
+        self.assertIsNone(PyFBA.fba.feasibility.growth_state('itlim'))
+
+        # a model whose biomass flux can only reach the threshold does not grow, in either mode
+        model = PyFBA.fba.WarmStartModel(self.__class__.modeldata, reactions2run, media, biomass, pure=True)
+        for cap in [1.0, 1.01]:
+            model.rbvals['BIOMASS_EQN'] = (0.0, cap)
+            model.session.set_col_bounds_array([0.0], [cap], [model.index['BIOMASS_EQN']])
+            status, value, growth = model.run()
+            self.assertAlmostEqual(value, cap, places=6)
+            self.assertIs(model.run(feasibility=True).growth, growth)
+            self.assertIs(growth, cap > 1)
+        # and the same when the network, rather than the bounds of the biomass equation, limits the flux
+        session = PyFBA.lp.new_session()
+        session.load_sparse([(0, 0, 1.0), (0, 1, -1.0)], 1, 2, ['c'], ['uptake', 'BIOMASS_EQN'])
+        session.row_bounds([(0, 0)])
+        for cap in [1.0, 1.01]:
+            session.col_bounds([(0, cap), (0, 1000.0)])
+            session.objective_coefficients([0, 1])
+            status, value = session.solve()
+            self.assertAlmostEqual(value, cap, places=6)
+            result = PyFBA.fba.feasibility.solve_feasibility(session, 1, (0.0, 1000.0))
+            self.assertIs(result.growth, value > 1)
+
+        # the warm start model goes back to maximising the biomass afterwards
+        model = PyFBA.fba.WarmStartModel(self.__class__.modeldata, reactions2run, media, biomass)
+        self.assertTrue(model.run(feasibility=True).growth)
+        status, value, growth = model.run()
+        status, expected, growth = PyFBA.fba.run_fba(self.__class__.modeldata, reactions2run, media, biomass,
+                                                     pure=True)
+        self.assertAlmostEqual(value, expected, places=3)
+        PyFBA.fba.remove_uptake_and_secretion_reactions(self.__class__.modeldata.reactions)
+
+    def test_flux_variability(self):
+        """Test the flux variability, with and without the prepass and the worker processes"""
+        reactions2run, media, biomass = self.growth_fixture()
+        status, value, growth = PyFBA.fba.run_fba(self.__class__.modeldata, reactions2run, media, biomass, pure=True)
+        reactions = sorted(reactions2run)[0:10] + ['BIOMASS_EQN']
+        # by default all the solves are done in this process
+        rc, minimum, maximum = PyFBA.fba.flux_variability(self.__class__.modeldata, reactions2run, media, biomass,
+                                                          fraction_of_optimum=0.9, reactions=reactions,
+                                                          prepass=False)
+        self.assertEqual(rc, reactions)
+        self.assertFalse(np.isnan(minimum).any() or np.isnan(maximum).any())
+        self.assertTrue((minimum <= maximum + 1e-6).all())
+        self.assertAlmostEqual(minimum[-1], 0.9 * value, places=3)
+        self.assertAlmostEqual(maximum[-1], value, places=3)
+        for prepass, workers in [(True, 0), (True, 2)]:
+            rc, pmin, pmax = PyFBA.fba.flux_variability(self.__class__.modeldata, reactions2run, media, biomass,
+                                                        fraction_of_optimum=0.9, reactions=reactions,
+                                                        prepass=prepass, workers=workers)
+            np.testing.assert_allclose(pmin, minimum, atol=1e-6)
+            np.testing.assert_allclose(pmax, maximum, atol=1e-6)
+        with self.assertRaises(ValueError):
+            PyFBA.fba.flux_variability(self.__class__.modeldata, reactions2run, media, biomass, reactions=['nope'])
+
+    def test_knockouts(self):
+        """Test that the knockout screens give the same answers as running each knockout"""
+        reactions2run, media, biomass = self.growth_fixture()
+        reactions = sorted(reactions2run)[0:8]
+        bounds = {r: (self.__class__.modeldata.reactions[r].lower_bound,
+                      self.__class__.modeldata.reactions[r].upper_bound) for r in reactions2run}
+        wild_type, singles, doubles = PyFBA.fba.double_knockouts(self.__class__.modeldata, reactions2run, media,
+                                                                 biomass, reactions=reactions, workers=0)
+        self.assertTrue(wild_type.growth)
+        # the screen is pure, so it does not add reactions to modeldata or change their bounds
+        self.assertFalse(any(r.startswith('upsr') for r in self.__class__.modeldata.reactions))
+        self.assertEqual({r: (self.__class__.modeldata.reactions[r].lower_bound,
+                              self.__class__.modeldata.reactions[r].upper_bound) for r in reactions2run}, bounds)
+        self.assertEqual(list(singles), reactions)
+        for r in reactions:
+            status, value, growth = PyFBA.fba.run_fba(self.__class__.modeldata, reactions2run - {r}, media, biomass,
+                                                      pure=True)
+            self.assertEqual(singles[r].growth, growth)
+            self.assertAlmostEqual(singles[r].value, value, places=3)
+        viable = [r for r in reactions if singles[r].growth]
+        self.assertEqual(len(doubles), len(viable) * (len(viable) - 1) // 2)
+        for (a, b), result in doubles.items():
+            status, value, growth = PyFBA.fba.run_fba(self.__class__.modeldata, reactions2run - {a, b}, media,
+                                                      biomass, pure=True)
+            self.assertEqual(result.growth, growth)
+            self.assertAlmostEqual(result.value, value, places=3)
+
+        # the single knockouts do not keep their solutions by default, so those pairs are solved rather than skipped.
+        # By default the screen does not start any worker processes
+        with PyFBA.fba.KnockoutScreen(self.__class__.modeldata, reactions2run, media, biomass) as screen:
+            self.assertEqual(screen.workers, 0)
+            stripped = screen.double_knockouts(screen.single_knockouts(reactions))
+        self.assertEqual(list(stripped), list(doubles))
+        for p, result in stripped.items():
+            self.assertEqual(result.growth, doubles[p].growth)
+            self.assertAlmostEqual(result.value, doubles[p].value, places=3)
+
+        # the worker processes give the same answers
+        wild_type, parallel = PyFBA.fba.single_knockouts(self.__class__.modeldata, reactions2run, media, biomass,
+                                                         reactions=reactions, skip_zero_flux=False, workers=2)
+        self.assertEqual([tuple(parallel[r])[2] for r in reactions], [singles[r].growth for r in reactions])
+        with self.assertRaises(ValueError):
+            PyFBA.fba.single_knockouts(self.__class__.modeldata, reactions2run, media, biomass, reactions=['nope'],
+                                       workers=0)
+
+    def test_reachability(self):
+        """Test that we only skip the solve when the model can not grow"""
+        modeldata = self.__class__.modeldata
+        reactions2run, media, biomass = self.growth_fixture()
+        reachability = PyFBA.fba.reachability
+        self.assertEqual(reachability.unreachable_biomass(modeldata, reactions2run, media, biomass), [])
+        made = reachability.producible(modeldata, reactions2run, media, biomass)
+        self.assertTrue(all(made[modeldata.compound_table().get(c)] for c in media))
+        result = PyFBA.fba.run_fba(modeldata, reactions2run, media, biomass, pure=True, reachability=True)
+        self.assertTrue(result.growth)
+
+        # knock out the first reaction that leaves a biomass compound that we can not make
+        r = next(r for r in sorted(reactions2run)
+                 if reachability.unreachable_biomass(modeldata, reactions2run - {r}, media, biomass))
+        status, value, growth = PyFBA.fba.run_fba(modeldata, reactions2run - {r}, media, biomass, pure=True)
+        self.assertFalse(growth)
+        self.assertEqual(tuple(PyFBA.fba.run_fba(modeldata, reactions2run - {r}, media, biomass, reachability=True)),
+                         (status, 0.0, False))
+        self.assertFalse(any(r.startswith('upsr') for r in modeldata.reactions))
+        results = PyFBA.fba.run_fba_batch(modeldata, reactions2run - {r}, [media, media], biomass, feasibility=True,
+                                          reachability=True)
+        self.assertEqual([tuple(x) for x in results], [('nofeas', 0.0, False)] * 2)
+
+    def test_dead_end_presolve(self):
+        """Test that removing the dead ends does not change the answer"""
+        modeldata = self.__class__.modeldata
+        reactions2run, media, biomass = self.growth_fixture()
+        expected = PyFBA.fba.run_fba(modeldata, reactions2run, media, biomass, pure=True)
+        presolve = PyFBA.fba.DeadEndPresolve()
+        result = PyFBA.fba.run_fba(modeldata, reactions2run, media, biomass, pure=True, presolve=presolve)
+        self.assertTrue(presolve.removed_reactions)
+        self.assertTrue(presolve.removed_compounds)
+        self.assertNotIn('BIOMASS_EQN', presolve.removed_reactions)
+        self.assertEqual(result.growth, expected.growth)
+        self.assertAlmostEqual(result.value, expected.value, places=3)
+        # we still have the flux of every reaction, and the reactions that we removed can not carry any flux
+        self.assertEqual(result.col_names, expected.col_names)
+        for r in presolve.removed_reactions:
+            self.assertEqual(result.flux(r), 0)
+            self.assertAlmostEqual(expected.flux(r), 0, places=6)
+
+        # the presolve of a cached model is copied to the new presolve
+        cache = PyFBA.fba.ModelCache()
+        PyFBA.fba.run_fba(modeldata, reactions2run, media, biomass, pure=True, cache=cache,
+                          presolve=PyFBA.fba.DeadEndPresolve())
+        again = PyFBA.fba.DeadEndPresolve()
+        result = PyFBA.fba.run_fba(modeldata, reactions2run, media, biomass, pure=True, cache=cache, presolve=again)
+        self.assertEqual(cache.stats()['hits'], 1)
+        self.assertEqual(again.removed_reactions, presolve.removed_reactions)
+        self.assertAlmostEqual(result.value, expected.value, places=3)
+
+        # one presolve can be used for different models with a cache. The cache keeps its own copy
+        cache = PyFBA.fba.ModelCache()
+        reused = PyFBA.fba.DeadEndPresolve()
+        smaller = reactions2run - set(sorted(reactions2run)[0:50])
+        first = PyFBA.fba.run_fba(modeldata, reactions2run, media, biomass, pure=True, cache=cache, presolve=reused)
+        second = PyFBA.fba.run_fba(modeldata, smaller, media, biomass, pure=True, cache=cache, presolve=reused)
+        self.assertNotEqual(len(reused.reactions), len(presolve.reactions))
+        again = PyFBA.fba.run_fba(modeldata, reactions2run, media, biomass, pure=True, cache=cache, presolve=reused)
+        self.assertEqual(cache.stats()['hits'], 1)
+        self.assertEqual(reused.removed_reactions, presolve.removed_reactions)
+        self.assertEqual(again.col_names, first.col_names)
+        self.assertAlmostEqual(again.value, first.value, places=3)
+        self.assertNotEqual(second.col_names, first.col_names)
+        with self.assertRaises(ValueError):
+            PyFBA.fba.run_fba(modeldata, reactions2run, media, biomass, pure=True, snapshot_dir=tempfile.gettempdir(),
+                              presolve=PyFBA.fba.DeadEndPresolve())
+
+    def test_gene_knockouts(self):
+        """Test that each gene deletion knocks out the right reactions, and that each signature is only solved once"""
+        modeldata = self.__class__.modeldata
+        reactions2run, media, biomass = self.growth_fixture()
+        roles = sorted({ro for r in reactions2run for c in modeldata.reactions[r].enzymes if c in modeldata.enzymes
+                        for ro in modeldata.enzymes[c].roles})
+        # one peg for each role
+        assigned = {f'fig|83333.1.peg.{i}': {ro} for i, ro in enumerate(roles)}
+        index = PyFBA.fba.GeneReactionIndex(modeldata, reactions2run, assigned)
+        peg = next(p for p in sorted(assigned) if index.signature({p}))
+        # and a second copy of a gene that knocks out reactions on its own
+        assigned['fig|83333.1.peg.copy'] = set(assigned[peg])
+        with PyFBA.fba.GeneKnockoutScreen(modeldata, reactions2run, media, biomass, assigned, workers=0) as screen:
+            index = screen.index
+            self.assertEqual(index.signature({peg}), frozenset())
+            self.assertTrue(index.signature({peg, 'fig|83333.1.peg.copy'}))
+            # the subunits of a complex have the same signature
+            cid = next(c for c in sorted(index.complex_reactions)
+                       if len({r for r in modeldata.enzymes[c].roles if r in index.role_complexes}) > 1)
+            subunits = [p for p in assigned if assigned[p] & modeldata.enzymes[cid].roles]
+            self.assertEqual(len({index.signature({p}) for p in subunits}), 1)
+
+            genes = index.genes()[::20]
+            results = screen.single_knockouts(genes)
+            self.assertEqual(list(results), genes)
+            self.assertLessEqual(len(screen.results), len({index.signature({g}) for g in genes}) + 1)
+            for g in genes[::4]:
+                status, value, growth = PyFBA.fba.run_fba(modeldata, reactions2run - index.signature({g}), media,
+                                                          biomass, pure=True)
+                self.assertEqual(results[g].growth, growth)
+                self.assertAlmostEqual(results[g].value, value, places=3)
+        self.assertFalse(any(r.startswith('upsr') for r in modeldata.reactions))
+
+    def test_fba_executor(self):
+        """Test that the worker processes give the same answers, in the same order, as running the fbas here"""
+        reactions2run, media, biomass = self.growth_fixture()
+        jobs = [(reactions2run, media), (reactions2run, set()), (set(sorted(reactions2run)[::2]), media)]
+        # by default the jobs are run in this process
+        with PyFBA.fba.FBAExecutor(self.__class__.modeldata, biomass) as executor:
+            self.assertEqual(executor.workers, 0)
+            expected = [tuple(r) for r in executor.map(jobs)]
+        self.assertEqual([r[2] for r in expected], [True, False, False])
+        with PyFBA.fba.FBAExecutor(self.__class__.modeldata, biomass, workers=2) as executor:
+            results = executor.map(jobs, keep_solution=True)
+        self.assertEqual([r.growth for r in results], [r[2] for r in expected])
+        for result, (status, value, growth) in zip(results, expected):
+            self.assertAlmostEqual(result.value, value, places=3)
+        self.assertAlmostEqual(results[0].flux('BIOMASS_EQN'), expected[0][1], places=3)
+        with self.assertRaises(ValueError):
+            executor.map(jobs)
+
+    def test_warm_start(self):
+        """Test that switching reactions off in a warm start model gives the same answer as rebuilding the model"""
+        reactions2run, media, biomass = self.growth_fixture()
+        model = PyFBA.fba.WarmStartModel(self.__class__.modeldata, reactions2run, media, biomass)
+        status, value, growth = model.run()
+        self.assertTrue(growth)
+
+        # remove half the reactions, and we should get the same answer as a complete fba
+        half = set(sorted(reactions2run)[::2])
+        status, warm_value, warm_growth = model.run(half)
+        status, value, growth = PyFBA.fba.run_fba(self.__class__.modeldata, half, media, biomass)
+        self.assertEqual(warm_growth, growth)
+        self.assertAlmostEqual(warm_value, value, places=3)
+
+        # and we can switch them all back on again
+        model.restore()
+        status, value, growth = model.run()
+        self.assertTrue(growth)
+        self.assertRaises(ValueError, model.set_reactions, {'not_a_reaction'})
+
+    def test_warm_start_media(self):
+        """Test that changing the media of a warm start model only changes the uptake and secretion bounds"""
+        reactions2run, media, biomass = self.growth_fixture()
+        model = PyFBA.fba.WarmStartModel(self.__class__.modeldata, reactions2run, media, biomass)
+        status, value, growth = model.run()
+        self.assertTrue(growth)
+
+        # without any media nothing can grow
+        self.assertGreater(model.set_media(set()), 0)
+        status, empty_value, empty_growth = model.run()
+        self.assertFalse(empty_growth)
+
+        # and changing it back gives the same answer as before
+        model.set_media(media)
+        self.assertEqual(model.set_media(media), 0)
+        status, warm_value, warm_growth = model.run()
+        self.assertTrue(warm_growth)
+        self.assertAlmostEqual(warm_value, value, places=3)
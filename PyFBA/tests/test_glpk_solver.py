@@ -110,6 +110,37 @@ class TestGLPKSolver(unittest.TestCase):
         self.assertEqual(status, 'opt')
 
 
+    def test_sparse_solve(self):
+        """Test loading the matrix as (row, column, value) triplets gives the same solution as the dense matrix"""
+        triplets = [(0, 0, 1.0), (0, 1, 1.0), (0, 2, 1.0),
+                    (1, 0, 10.0), (1, 1, 4.0), (1, 2, 5.0),
+                    (2, 0, 2.0), (2, 1, 2.0), (2, 2, 6.0)]
+        lp.load_sparse(triplets, 3, 3, ['a', 'b', 'c'], ['x', 'y', 'z'])
+        lp.objective_coefficients([ 10.0, 6.0, 4.0 ])
+        lp.row_bounds([(None, 100.0), (None, 600.0), (None, 300.0)])
+        lp.col_bounds([(0, None), (0, None), (0, None)])
+        status, result = lp.solve()
+        r = "%0.3f" % result
+        self.assertEqual(r, "733.333")
+        self.assertEqual(status, 'opt')
+
+        # an element outside the matrix should fail
+        self.assertRaises(ValueError, lp.load_sparse, [(3, 0, 1.0)], 3, 3)
+
+    def test_csr_solve(self):
+        """Test loading the matrix in compressed sparse row format"""
+        indptr = [0, 3, 6, 9]
+        indices = [0, 1, 2, 0, 1, 2, 0, 1, 2]
+        data = [1.0, 1.0, 1.0, 10.0, 4.0, 5.0, 2.0, 2.0, 6.0]
+        lp.load_csr(indptr, indices, data, 3)
+        lp.objective_coefficients([ 10.0, 6.0, 4.0 ])
+        lp.row_bounds([(None, 100.0), (None, 600.0), (None, 300.0)])
+        lp.col_bounds([(0, None), (0, None), (0, None)])
+        status, result = lp.solve()
+        r = "%0.3f" % result
+        self.assertEqual(r, "733.333")
+        self.assertEqual(status, 'opt')
+
     def test_primal_hash(self):
         """Test getting the primals back as a hash"""
         mat = [
@@ -149,14 +180,54 @@ class TestGLPKSolver(unittest.TestCase):
         col_res = lp.col_primals()
         assertDeepAlmostEqual(self, col_pri, col_res, places=5)
         #self.assertEqual(col_pri, col_res)
-        
-
-
-
-
-
-
-
-        
-
 
+    def test_sessions(self):
+        """Test that two sessions hold independent problems"""
+        first = lp.new_session()
+        second = lp.new_session()
+        first.load([[ 1.0, 1.0, 1.0], [10.0, 4.0, 5.0], [ 2.0, 2.0, 6.0]], ['a', 'b', 'c'], ['x', 'y', 'z'])
+        first.objective_coefficients([ 10.0, 6.0, 4.0 ])
+        first.row_bounds([(None, 100.0), (None, 600.0), (None, 300.0)])
+        first.col_bounds([(0, None), (0, None), (0, None)])
+
+        second.load([[1.0, 1.0]], ['a'], ['x', 'y'])
+        second.objective_coefficients([1.0, 2.0])
+        second.row_bounds([(None, 10.0)])
+        second.col_bounds([(0, None), (0, None)])
+
+        status, result = first.solve()
+        self.assertEqual("%0.3f" % result, "733.333")
+        status, result = second.solve()
+        self.assertEqual("%0.3f" % result, "20.000")
+        # solving the second problem does not change the first
+        assertDeepAlmostEqual(self, [33.333333333333336, 66.66666666666666, 0.0], first.col_primals(), places=5)
+        assertDeepAlmostEqual(self, {'x': 0.0, 'y': 10.0}, second.col_primal_hash(), places=5)
+
+    def test_add_and_delete(self):
+        """Test adding rows and columns to a loaded problem, and deleting them again"""
+        session = lp.new_session()
+        session.load([[ 1.0, 1.0], [10.0, 4.0], [ 2.0, 2.0]], ['a', 'b', 'c'], ['x', 'y'])
+        session.row_bounds([(None, 100.0), (None, 600.0), (None, 300.0)])
+        session.col_bounds([(0, None), (0, None)])
+
+        # add the third column to get the same problem as test_solve
+        self.assertEqual(session.add_cols([[(0, 1.0), (1, 5.0), (2, 6.0)]], ['z'], [(0, None)]), 2)
+        session.objective_coefficients([ 10.0, 6.0, 4.0 ])
+        status, result = session.solve()
+        self.assertEqual("%0.3f" % result, "733.333")
+
+        # add a row that limits z, and a column that is only in the new row
+        self.assertEqual(session.add_rows(1, ['d'], [(None, 10.0)]), 3)
+        session.add_cols([[(3, 1.0)]], ['w'], [(0, None)])
+        self.assertEqual(len(session.col_primals()), 4)
+        self.assertEqual(len(session.row_primals()), 4)
+        self.assertRaises(ValueError, session.add_cols, [[(7, 1.0)]])
+
+        # and delete them again
+        session.delete_cols([3])
+        session.delete_rows([3])
+        self.assertEqual(len(session.col_primals()), 3)
+        self.assertEqual(len(session.row_primals()), 3)
+        status, result = session.solve()
+        self.assertEqual("%0.3f" % result, "733.333")
+        self.assertRaises(ValueError, session.delete_cols, [3])
@@ -0,0 +1,232 @@
+import csv
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+from PyFBA.tests.assertDeepAlmostEqual import assertDeepAlmostEqual
+from PyFBA import lp
+from PyFBA.lp import instrumentation
+
+"""
+Test that every linear programming backend gives the same answers.
+
+"""
+
+
+class TestLPBackends(unittest.TestCase):
+
+    def new_sessions(self):
+        """Create a session for each backend that is installed"""
+        sessions = {}
+        for name in lp.backends:
+            try:
+                sessions[name] = lp.new_session(name)
+            except ImportError:
+                continue
+        if not sessions:
+            self.skipTest("No linear programming backends are installed")
+        return sessions
+
+    def test_unknown_backend(self):
+        """Test asking for a backend that does not exist"""
+        self.assertRaises(ValueError, lp.new_session, 'not_a_solver')
+
+    def test_solve(self):
+        """Test the complete linear programing solution, using the example from the documentation"""
+        for name, session in self.new_sessions().items():
+            session.load_sparse([(0, 0, 1.0), (0, 1, 1.0), (0, 2, 1.0),
+                                 (1, 0, 10.0), (1, 1, 4.0), (1, 2, 5.0),
+                                 (2, 0, 2.0), (2, 1, 2.0), (2, 2, 6.0)], 3, 3, ['a', 'b', 'c'], ['x', 'y', 'z'])
+            session.objective_coefficients([10.0, 6.0, 4.0])
+            session.row_bounds([(None, 100.0), (None, 600.0), (None, 300.0)])
+            session.col_bounds([(0, None), (0, None), (0, None)])
+            status, result = session.solve()
+            self.assertEqual(status, 'opt', f"{name} did not find the optimal solution")
+            self.assertEqual("%0.3f" % result, "733.333", f"{name} did not find the optimal solution")
+            assertDeepAlmostEqual(self, {'x': 33.333333333333336, 'y': 66.66666666666666, 'z': 0.0},
+                                  session.col_primal_hash(), places=5)
+            assertDeepAlmostEqual(self, [100.0, 600.0, 200.0], session.row_primals(), places=5)
+
+    def test_arrays(self):
+        """Test the primals, duals, and reduced costs as arrays, using the example from the documentation"""
+        for name, session in self.new_sessions().items():
+            session.load_sparse([(0, 0, 1.0), (0, 1, 1.0), (0, 2, 1.0),
+                                 (1, 0, 10.0), (1, 1, 4.0), (1, 2, 5.0),
+                                 (2, 0, 2.0), (2, 1, 2.0), (2, 2, 6.0)], 3, 3, ['a', 'b', 'c'], ['x', 'y', 'z'])
+            session.objective_coefficients([10.0, 6.0, 4.0])
+            session.row_bounds([(None, 100.0), (None, 600.0), (None, 300.0)])
+            session.col_bounds([(0, None), (0, None), (0, None)])
+            session.solve()
+            self.assertEqual(session.cached_col_names(), ('x', 'y', 'z'))
+            self.assertEqual(session.cached_row_names(), ('a', 'b', 'c'))
+            assertDeepAlmostEqual(self, [33.333333, 66.666667, 0.0], list(session.col_primal_array()), places=5)
+            assertDeepAlmostEqual(self, [100.0, 600.0, 200.0], list(session.row_primal_array()), places=5)
+            assertDeepAlmostEqual(self, [3.333333, 0.666667, 0.0], list(session.row_dual_array()), places=5)
+            assertDeepAlmostEqual(self, [0.0, 0.0, -2.666667], list(session.col_reduced_cost_array()), places=5)
+
+            # the cached names change when the columns change
+            session.delete_cols([0])
+            self.assertEqual(session.cached_col_names(), ('y', 'z'))
+
+            # a bad index does not delete anything
+            self.assertRaises(ValueError, session.delete_cols, [0, -1])
+            self.assertRaises(ValueError, session.delete_rows, [0, -1])
+            self.assertEqual(session.dimensions()[0:2], (3, 2))
+            self.assertEqual(session.cached_col_names(), ('y', 'z'))
+
+    def test_fixed_rows(self):
+        """Test rows with equal lower and upper bounds, as we use for the stoichiometric matrix"""
+        for name, session in self.new_sessions().items():
+            # x -> y -> z where we can take up x and the objective is z
+            session.load([[1.0, -1.0, 0.0, 0.0], [0.0, 1.0, -1.0, 0.0], [0.0, 0.0, 1.0, -1.0]])
+            session.objective_coefficients([0.0, 0.0, 0.0, 1.0])
+            session.row_bounds([(0, 0), (0, 0), (0, 0)])
+            session.col_bounds([(0, 10), (0, 1000), (0, 1000), (0, 1000)])
+            status, result = session.solve()
+            self.assertEqual("%0.3f" % result, "10.000", f"{name} did not find the optimal solution")
+
+            # now we can not take up x
+            session.update_col_bounds({0: (0, 0)})
+            status, result = session.solve()
+            self.assertEqual("%0.3f" % result, "0.000", f"{name} did not find the optimal solution")
+
+    def test_bulk_bounds(self):
+        """Test setting the bounds from arrays, from a sparse delta, and by name"""
+        for name, session in self.new_sessions().items():
+            session.load([[1.0, -1.0, 0.0, 0.0], [0.0, 1.0, -1.0, 0.0], [0.0, 0.0, 1.0, -1.0]], ['x', 'y', 'z'],
+                         ['in', 'xy', 'yz', 'out'])
+            session.objective_coefficients([0.0, 0.0, 0.0, 1.0])
+            session.set_row_bounds_array([0, 0, 0], [0, 0, 0])
+            session.set_col_bounds_array([0, 0, 0, 0], [10, 1000, 1000, float('inf')])
+            status, result = session.solve()
+            self.assertEqual("%0.3f" % result, "10.000", f"{name} did not find the optimal solution")
+
+            # only change the uptake and one internal reaction
+            session.set_col_bounds_array([0, 0], [20, 5], [0, 2])
+            status, result = session.solve()
+            self.assertEqual("%0.3f" % result, "5.000", f"{name} did not find the optimal solution")
+
+            session.update_named_col_bounds({'yz': (0, None)})
+            status, result = session.solve()
+            self.assertEqual("%0.3f" % result, "20.000", f"{name} did not find the optimal solution")
+            self.assertEqual(session.col_index()['out'], 3)
+
+            # the name cache is updated when we add columns
+            session.add_cols([[(0, 1.0)]], ['in2'], [(0, 7)])
+            session.objective_coefficients([0.0, 0.0, 0.0, 1.0, 0.0])
+            session.update_named_col_bounds({'in': (0, 0)})
+            status, result = session.solve()
+            self.assertEqual("%0.3f" % result, "7.000", f"{name} did not find the optimal solution")
+
+            self.assertRaises(ValueError, session.update_named_col_bounds, {'not_a_column': (0, 0)})
+            self.assertRaises(ValueError, session.set_col_bounds_array, [0, 0], [1])
+            self.assertRaises(ValueError, session.set_col_bounds_array, [0], [1], [0, 1])
+
+    def test_options(self):
+        """Test solving with each method, and stopping at the iteration limit"""
+        self.assertRaises(ValueError, lp.SolverOptions, method='not_a_method')
+        self.assertRaises(ValueError, lp.SolverOptions, time_limit=-1)
+        for name, session in self.new_sessions().items():
+            session.load_sparse([(0, 0, 1.0), (0, 1, 1.0), (0, 2, 1.0),
+                                 (1, 0, 10.0), (1, 1, 4.0), (1, 2, 5.0),
+                                 (2, 0, 2.0), (2, 1, 2.0), (2, 2, 6.0)], 3, 3, ['a', 'b', 'c'], ['x', 'y', 'z'])
+            session.objective_coefficients([10.0, 6.0, 4.0])
+            session.row_bounds([(None, 100.0), (None, 600.0), (None, 300.0)])
+            session.col_bounds([(0, None), (0, None), (0, None)])
+            for method in ['primal', 'dual', 'interior']:
+                status, result = session.solve(lp.SolverOptions(method=method, presolve=False))
+                self.assertEqual(status, 'opt', f"{name} did not find the optimal solution with {method}")
+                self.assertEqual("%0.3f" % result, "733.333", f"{name} did not find the optimal solution")
+
+            # the options can also belong to the session
+            session.options = lp.SolverOptions(iteration_limit=1, presolve=False)
+            status, result = session.solve()
+            self.assertEqual(status, 'itlim', f"{name} did not stop at the iteration limit")
+            session.options = None
+            status, result = session.solve()
+            self.assertEqual(status, 'opt', f"{name} did not find the optimal solution")
+
+    def test_mps(self):
+        """Test writing a problem to an MPS file and reading it into every backend"""
+        sessions = self.new_sessions()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            for name, session in sessions.items():
+                session.load_sparse([(0, 0, 1.0), (0, 1, 1.0), (0, 2, 1.0),
+                                     (1, 0, 10.0), (1, 1, 4.0), (1, 2, 5.0),
+                                     (2, 0, 2.0), (2, 1, 2.0), (2, 2, 6.0)], 3, 3,
+                                    ['row a', 'row b', 'row c'], ['x 1', 'y 2', 'z 3'])
+                session.objective_coefficients([10.0, 6.0, 4.0])
+                session.row_bounds([(None, 100.0), (-5, 600.0), (None, None)])
+                session.col_bounds([(0, None), (None, 50), (1.5, 1.5)])
+                mpsfile = os.path.join(tmpdir, f"{name}.mps")
+                session.write_mps(mpsfile)
+                status, result = session.solve()
+
+                for other_name, other in self.new_sessions().items():
+                    other.read_mps(mpsfile)
+                    self.assertEqual(other.col_names(), ['x 1', 'y 2', 'z 3'])
+                    self.assertEqual(other.row_names(), ['row a', 'row b', 'row c'])
+                    status, other_result = other.solve()
+                    self.assertAlmostEqual(result, other_result, places=5,
+                                           msg=f"{other_name} did not read the problem that {name} wrote")
+
+    def test_instrumentation(self):
+        """Test recording the time and iterations for each call"""
+        self.assertIsNone(lp.solver_stats())
+        stats = lp.enable_instrumentation()
+        try:
+            for name, session in self.new_sessions().items():
+                session.load([[1.0, 1.0, 1.0], [10.0, 4.0, 5.0], [2.0, 2.0, 6.0]], ['a', 'b', 'c'], ['x', 'y', 'z'])
+                session.objective_coefficients([10.0, 6.0, 4.0])
+                session.row_bounds([(None, 100.0), (None, 600.0), (None, 300.0)])
+                session.col_bounds([(0, None), (0, None), (0, None)])
+                session.solve()
+            summary = stats.summary()
+            nsessions = len(self.new_sessions())
+            # load calls load_sparse for some backends, but we only count it once
+            self.assertEqual(summary['load']['calls'], nsessions)
+            self.assertEqual(summary['bounds']['calls'], 2 * nsessions)
+            self.assertEqual(summary['solve']['calls'], nsessions)
+            self.assertEqual(stats.status_histogram(), {'opt': nsessions})
+            solve = [r for r in stats.records if r['category'] == 'solve'][0]
+            self.assertEqual((solve['nrows'], solve['ncols'], solve['nnz']), (3, 3, 9))
+
+            with tempfile.TemporaryDirectory() as tmpdir:
+                stats.export(os.path.join(tmpdir, 'stats.json'))
+                with open(os.path.join(tmpdir, 'stats.json'), 'r') as f:
+                    self.assertEqual(json.load(f)['status_histogram'], {'opt': nsessions})
+                stats.export(os.path.join(tmpdir, 'stats.csv'))
+                with open(os.path.join(tmpdir, 'stats.csv'), 'r') as f:
+                    self.assertEqual(len(list(csv.DictReader(f))), len(stats))
+        finally:
+            lp.disable_instrumentation()
+        self.assertIsNone(lp.solver_stats())
+
+    def test_instrumentation_export(self):
+        """Test that the stats are written once when python exits, to the last file that we were given"""
+        saved = instrumentation._export, instrumentation._export_registered
+        try:
+            with tempfile.TemporaryDirectory() as tmpdir:
+                first, second = os.path.join(tmpdir, 'first.json'), os.path.join(tmpdir, 'second.csv')
+                with mock.patch('atexit.register') as register:
+                    stats = lp.enable_instrumentation(export=first)
+                    self.assertIs(lp.enable_instrumentation(export=first), stats)
+                    lp.enable_instrumentation(export=second)
+                self.assertLessEqual(register.call_count, 1)
+                instrumentation._export_at_exit()
+                self.assertFalse(os.path.exists(first))
+                self.assertTrue(os.path.exists(second))
+        finally:
+            lp.disable_instrumentation()
+            instrumentation._export, instrumentation._export_registered = saved
+
+    def test_infeasible(self):
+        """Test a problem without a solution"""
+        for name, session in self.new_sessions().items():
+            session.load([[1.0]])
+            session.objective_coefficients([1.0])
+            session.row_bounds([(5, 5)])
+            session.col_bounds([(0, 1)])
+            status, result = session.solve()
+            self.assertNotEqual(status, 'opt', f"{name} should not have found a solution")
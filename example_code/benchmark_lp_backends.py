@@ -0,0 +1,50 @@
+r"""
+Time the FBA of a model with each of the linear programming backends that are installed.
+
+e.g.
+python3 example_code/benchmark_lp_backends.py -r example_data/Citrobacter/Citrobacter_sedlakii_reactions.txt \
+    -m ArgonneLB
+"""
+import os
+import sys
+import time
+import argparse
+
+import PyFBA
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare the linear programming backends on a model")
+    parser.add_argument('-r', help='reactions file', required=True)
+    parser.add_argument('-m', help='media name or file', default='ArgonneLB')
+    parser.add_argument('-n', help='number of times to run each backend (default=5)', type=int, default=5)
+    parser.add_argument('-v', help='verbose output', action='store_true')
+    args = parser.parse_args()
+
+    modeldata = PyFBA.parse.model_seed.parse_model_seed_data('gramnegative', verbose=args.v)
+    reactions_to_run = set()
+    with open(args.r, 'r') as f:
+        for l in f:
+            if l.startswith('#') or "biomass" in l.lower():
+                continue
+            r = l.strip()
+            if r in modeldata.reactions:
+                reactions_to_run.add(r)
+
+    if os.path.exists(args.m):
+        media = PyFBA.parse.read_media_file(args.m)
+    else:
+        media = PyFBA.parse.pyfba_media(args.m, modeldata)
+    biomass_eqn = PyFBA.metabolism.biomass_equation('gramnegative')
+
+    print("Backend\tStatus\tFlux\tSeconds per run")
+    for backend in PyFBA.lp.backends:
+        try:
+            PyFBA.lp.new_session(backend)
+        except ImportError as e:
+            sys.stderr.write(f"Skipped {backend}: {e}\n")
+            continue
+        start = time.time()
+        for i in range(args.n):
+            status, value, growth = PyFBA.fba.run_fba(modeldata, reactions_to_run, media, biomass_eqn,
+                                                      backend=backend)
+        print(f"{backend}\t{status}\t{value}\t{(time.time() - start) / args.n:.3f}")
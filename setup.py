@@ -55,10 +55,14 @@ setup(
         "jupyter",
         "lxml",
         "nose",
+        "numpy",
         "python-libsbml",
         'importlib_resources; python_version < "3.7"',
         'glpk'
     ],
+    extras_require={
+        'highs': ['scipy'],
+    },
     test_suite = 'nose.collector',
     description='A Python implementation of flux balance analysis',
     tests_require = ['nose'],